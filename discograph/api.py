@@ -2,17 +2,40 @@ import logging
 
 from flask import Blueprint
 from flask import jsonify
+from flask import make_response
 from flask import request
 
 import discograph.utils
 from discograph import exceptions, database, decorators
 from discograph.library import EntityType
+from discograph.library.cache import cache_manager
 
 log = logging.getLogger(__name__)
 
 blueprint = Blueprint("api", __name__, template_folder="templates")
 
 
+def cached_response(entry):
+    """
+    Responds with the JSON of a single-flight cache entry, in the best of
+    its encodings the client accepts, without decoding it.
+    """
+    if entry is None:
+        raise exceptions.APIError(message="No Data", status_code=404)
+    if request.if_none_match.contains(entry["etag"]):
+        response = make_response("", 304)
+    else:
+        encodings = [_ for _ in cache_manager.ENCODINGS if _ in entry]
+        encoding = request.accept_encodings.best_match(encodings)
+        response = make_response(entry[encoding] if encoding else entry["json"])
+        response.mimetype = "application/json"
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(entry["etag"])
+    return response
+
+
 @blueprint.route("/<entity_type>/relations/<entity_id>")
 @decorators.limit(max_requests=60, period=60)
 def route__api__entity_type__relations__entity_id(entity_type, entity_id):
@@ -32,9 +55,7 @@ def route__api__entity_type__relations__entity_id(entity_type, entity_id):
     return jsonify(data)
 
 
-@blueprint.route("/<entity_type>/network/<entity_id>")
-@decorators.limit(max_requests=60, period=60)
-def route__api__entity_type__network__entity_id(entity_type, entity_id):
+def parse_network_args(entity_type, entity_id):
     log.debug(f"entityType: {entity_type}")
     entity_type = EntityType[entity_type.upper()]
     if entity_type not in (EntityType.ARTIST, EntityType.LABEL):
@@ -42,27 +63,51 @@ def route__api__entity_type__network__entity_id(entity_type, entity_id):
     if not entity_id.isnumeric():
         raise exceptions.APIError(message="Bad Entity Id", status_code=400)
     entity_id = int(entity_id)
+    page_size = request.args.get("page_size")
+    if page_size is not None:
+        if not page_size.isnumeric() or not int(page_size):
+            raise exceptions.APIError(message="Bad Page Size", status_code=400)
+        page_size = int(page_size)
     parsed_args = discograph.utils.parse_request_args(request.args)
     original_roles, original_year = parsed_args
     # noinspection PyUnresolvedReferences
     on_mobile = request.MOBILE
-    data = database.db_helper.get_network(
-        entity_id,
+    return (
         entity_type,
-        on_mobile=on_mobile,
-        roles=original_roles,
+        entity_id,
+        dict(on_mobile=on_mobile, roles=original_roles, page_size=page_size),
     )
-    if data is None:
-        raise exceptions.APIError(message="No Data", status_code=404)
-    return jsonify(data)
+
+
+@blueprint.route("/<entity_type>/network/<entity_id>")
+@decorators.limit(max_requests=60, period=60)
+def route__api__entity_type__network__entity_id(entity_type, entity_id):
+    entity_type, entity_id, network_args = parse_network_args(entity_type, entity_id)
+    entry = database.db_helper.get_network(
+        entity_id, entity_type, encoded=True, **network_args
+    )
+    return cached_response(entry)
+
+
+@blueprint.route("/<entity_type>/network/<entity_id>/page/<page>")
+@decorators.limit(max_requests=120, period=60)
+def route__api__entity_type__network__entity_id__page(entity_type, entity_id, page):
+    entity_type, entity_id, network_args = parse_network_args(entity_type, entity_id)
+    if not page.isnumeric():
+        raise exceptions.APIError(message="Bad Page", status_code=400)
+    page = int(page)
+    entry = database.db_helper.get_network_page(
+        entity_id, entity_type, page, encoded=True, **network_args
+    )
+    return cached_response(entry)
 
 
 @blueprint.route("/search/<search_string>")
 @decorators.limit(max_requests=120, period=60)
 def route__api__search(search_string):
     log.debug(f"search_string: {search_string}")
-    data = database.db_helper.search_entities(search_string)
-    return jsonify(data)
+    entry = database.db_helper.search_entities(search_string, encoded=True)
+    return cached_response(entry)
 
 
 @blueprint.route("/random")
@@ -36,6 +36,11 @@ class CacheType(enum.Enum):
     REDIS = 3
 
 
+class XmlParserType(enum.Enum):
+    ELEMENTTREE = 1
+    LXML = 2
+
+
 class Configuration(object):
     pass
 
@@ -52,7 +57,23 @@ class PostgresProductionConfiguration(Configuration):
     POSTGRES_DATABASE_NAME = os.getenv("DISCOGRAPH_DATABASE_NAME")
     APPLICATION_ROOT = "https://discograph.azurewebsites.net/"
     THREADING_MODEL = ThreadingModel.PROCESS
-    CACHE_TYPE = CacheType.FILESYSTEM
+    CACHE_TYPE = (
+        CacheType.REDIS if os.getenv("DISCOGRAPH_REDIS_URL") else CacheType.FILESYSTEM
+    )
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 64
+    REDIS_URL = os.getenv("DISCOGRAPH_REDIS_URL")
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = os.getenv("DISCOGRAPH_REDIS_MAX_MEMORY")
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = True
+    RELATION_SHUFFLE = True
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 5000
+    POSTGRES_NETWORK_FUNCTION = True
 
 
 class PostgresDevelopmentConfiguration(Configuration):
@@ -66,6 +87,20 @@ class PostgresDevelopmentConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.PROCESS
     CACHE_TYPE = CacheType.FILESYSTEM
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = os.getenv("DISCOGRAPH_REDIS_URL")
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = os.getenv("DISCOGRAPH_REDIS_MAX_MEMORY")
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = True
+    RELATION_SHUFFLE = True
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 100
+    POSTGRES_NETWORK_FUNCTION = True
 
 
 class PostgresTestConfiguration(Configuration):
@@ -79,6 +114,20 @@ class PostgresTestConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.PROCESS
     CACHE_TYPE = CacheType.MEMORY
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = None
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = None
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = True
+    RELATION_SHUFFLE = True
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 0
+    POSTGRES_NETWORK_FUNCTION = True
 
 
 class SqliteDevelopmentConfiguration(Configuration):
@@ -92,6 +141,19 @@ class SqliteDevelopmentConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.THREAD
     CACHE_TYPE = CacheType.FILESYSTEM
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = os.getenv("DISCOGRAPH_REDIS_URL")
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = os.getenv("DISCOGRAPH_REDIS_MAX_MEMORY")
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = False
+    RELATION_SHUFFLE = False
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 100
 
 
 class SqliteTestConfiguration(Configuration):
@@ -105,6 +167,19 @@ class SqliteTestConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.THREAD
     CACHE_TYPE = CacheType.MEMORY
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = None
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = None
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = False
+    RELATION_SHUFFLE = False
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 0
 
 
 class CockroachDevelopmentConfiguration(Configuration):
@@ -116,6 +191,19 @@ class CockroachDevelopmentConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.PROCESS
     CACHE_TYPE = CacheType.FILESYSTEM
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = os.getenv("DISCOGRAPH_REDIS_URL")
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = os.getenv("DISCOGRAPH_REDIS_MAX_MEMORY")
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = True
+    RELATION_SHUFFLE = True
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 100
 
 
 class CockroachTestConfiguration(Configuration):
@@ -127,3 +215,16 @@ class CockroachTestConfiguration(Configuration):
     APPLICATION_ROOT = "http://localhost"
     THREADING_MODEL = ThreadingModel.PROCESS
     CACHE_TYPE = CacheType.MEMORY
+    CACHE_SOFT_TIMEOUT = 60 * 60 * 24
+    CACHE_HARD_TIMEOUT = 60 * 60 * 24 * 7
+    L1_CACHE_SIZE = 1024 * 1024 * 16
+    REDIS_URL = None
+    REDIS_MAX_CONNECTIONS = 32
+    REDIS_MAX_MEMORY = None
+    XML_PARSER = XmlParserType.LXML
+    XML_SHARDED_PARSE = True
+    RELATION_SHUFFLE = True
+    INCREMENTAL_BOOTSTRAP = False
+    BOOTSTRAP_RESUME = False
+    RELATION_GRAPH_PATH = None
+    PRECOMPUTED_NETWORK_COUNT = 0
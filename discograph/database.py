@@ -17,6 +17,8 @@ from discograph.config import DatabaseType, ThreadingModel
 from discograph.library.bootstrapper import Bootstrapper
 from discograph.library.database_helper import DatabaseHelper
 from discograph.library.discogs_model import database_proxy
+from discograph.library.models.precomputed_network import PrecomputedNetwork
+from discograph.library.relation_graph import RelationGraph
 
 log = logging.getLogger(__name__)
 
@@ -37,6 +39,13 @@ def setup_database(config, bootstrap=True):
     global bootstrap_database
     global threading_model
 
+    Bootstrapper.xml_parser = config["XML_PARSER"]
+    Bootstrapper.sharded_parse = config["XML_SHARDED_PARSE"]
+    Bootstrapper.relation_shuffle = config["RELATION_SHUFFLE"]
+    Bootstrapper.resume = config["BOOTSTRAP_RESUME"]
+    Bootstrapper.relation_graph_path = config["RELATION_GRAPH_PATH"]
+    Bootstrapper.precomputed_network_count = config["PRECOMPUTED_NETWORK_COUNT"]
+
     # Based on configuration, use a different database.
     if config["DATABASE"] == DatabaseType.POSTGRES:
         from discograph.library.postgres.postgres_helper import PostgresHelper
@@ -140,7 +149,10 @@ def setup_database(config, bootstrap=True):
         if bootstrap:
             from discograph.library.postgres.postgres_bootstrapper import PostgresBootstrapper
 
-            PostgresBootstrapper.bootstrap_models()
+            if config["INCREMENTAL_BOOTSTRAP"]:
+                PostgresBootstrapper.update_models()
+            else:
+                PostgresBootstrapper.bootstrap_models()
 
         db_logger = logging.getLogger("peewee")
         db_logger.addHandler(logging.StreamHandler(stream=sys.stdout))
@@ -148,6 +160,13 @@ def setup_database(config, bootstrap=True):
 
         check_postgres_connection(config, database)
 
+        from discograph.library.postgres.postgres_relation_grapher import PostgresRelationGrapher
+
+        PostgresRelationGrapher.network_function = config["POSTGRES_NETWORK_FUNCTION"]
+        if PostgresRelationGrapher.network_function:
+            with database.connection_context():
+                PostgresRelationGrapher.create_network_function()
+
     elif config["DATABASE"] == DatabaseType.SQLITE:
         from discograph.library.sqlite.sqlite_helper import SqliteHelper
 
@@ -182,7 +201,10 @@ def setup_database(config, bootstrap=True):
         if bootstrap:
             from discograph.library.sqlite.sqlite_bootstrapper import SqliteBootstrapper
 
-            SqliteBootstrapper.bootstrap_models()
+            if config["INCREMENTAL_BOOTSTRAP"]:
+                SqliteBootstrapper.update_models()
+            else:
+                SqliteBootstrapper.bootstrap_models()
     elif config["DATABASE"] == DatabaseType.COCKROACH:
         from discograph.library.cockroach.cockroach_helper import CockroachHelper
 
@@ -227,7 +249,18 @@ def setup_database(config, bootstrap=True):
         if bootstrap:
             from discograph.library.cockroach.cockroach_bootstrapper import CockroachBootstrapper
 
-            CockroachBootstrapper.bootstrap_models()
+            if config["INCREMENTAL_BOOTSTRAP"]:
+                CockroachBootstrapper.update_models()
+            else:
+                CockroachBootstrapper.bootstrap_models()
+
+    # get_network looks networks up here before running a search.
+    with database_proxy.connection_context():
+        PrecomputedNetwork.create_table(True)
+
+    graph_path = Bootstrapper.relation_graph_path
+    if graph_path and os.path.isdir(graph_path):
+        RelationGraph.loaded = RelationGraph.load(graph_path)
 
 
 def shutdown_database():
@@ -245,6 +278,7 @@ def shutdown_database():
         postgres_db = None
     if bootstrap_database is not None:
         bootstrap_database = None
+    RelationGraph.loaded = None
 
 
 def check_postgres_connection(config, database):
@@ -0,0 +1,161 @@
+import contextlib
+import logging
+import multiprocessing
+import queue
+import traceback
+
+import discograph.database
+
+log = logging.getLogger(__name__)
+
+
+class BootstrapPool(object):
+    """
+    Long-lived worker processes shared by every bootstrap pass.
+
+    Each worker opens one bootstrap database connection when it starts and
+    keeps it for its lifetime, pulling ``(function, args)`` tasks from a
+    bounded queue. ``submit`` blocks while the queue is full, so a producer
+    never gets more than a few tasks ahead of the workers, and small tasks
+    are picked up by whichever worker is free, so slow ranges do not leave
+    the other workers idle at the end of a pass.
+    """
+
+    # Tasks queued per worker before submit blocks.
+    QUEUE_DEPTH = 2
+
+    POLL_INTERVAL = 30
+
+    # The pool bootstrap passes run on, while one is open.
+    current = None
+
+    # INITIALIZER
+
+    def __init__(self, processes=None):
+        self.processes = processes or discograph.database.get_concurrency_count()
+        self.tasks = multiprocessing.Queue(self.processes * self.QUEUE_DEPTH)
+        self.results = multiprocessing.Queue()
+        self.workers = []
+        self.submitted = 0
+        self.received = 0
+        self.failures = []
+        self.values = []
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(abort=exc_type is not None)
+
+    # PRIVATE METHODS
+
+    def _check_workers(self):
+        dead = [_.name for _ in self.workers if not _.is_alive()]
+        if dead:
+            raise RuntimeError(f"bootstrap pool workers {dead} exited")
+
+    def _collect(self, timeout=None):
+        try:
+            ok, value = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        self.received += 1
+        if ok:
+            self.values.append(value)
+        else:
+            self.failures.append(value)
+        return True
+
+    @staticmethod
+    def _work(tasks, results):
+        from discograph.database import bootstrap_database
+        from discograph.library.discogs_model import DiscogsModel, database_proxy
+
+        proc_name = multiprocessing.current_process().name
+        if bootstrap_database:
+            database_proxy.initialize(bootstrap_database)
+        count = 0
+        with DiscogsModel.connection_context():
+            for function, args in iter(tasks.get, None):
+                try:
+                    results.put((True, function(*args)))
+                except Exception:
+                    log.exception(f"[{proc_name}] error in {function.__name__}")
+                    results.put((False, traceback.format_exc()))
+                count += 1
+        log.debug(f"[{proc_name}] ran {count} tasks")
+
+    # PUBLIC METHODS
+
+    @classmethod
+    @contextlib.contextmanager
+    def acquire(cls, fork=False):
+        """
+        Yields the open pool, or opens one for the duration of the block.
+
+        With ``fork``, a new pool is opened even if one is open, so its
+        workers inherit state the parent built after the open pool started.
+        """
+        if cls.current is not None and not fork:
+            yield cls.current
+            return
+        outer = cls.current
+        with cls() as pool:
+            cls.current = pool
+            try:
+                yield pool
+            finally:
+                cls.current = outer
+
+    def close(self, abort=False):
+        if abort:
+            for worker in self.workers:
+                worker.terminate()
+        else:
+            for _ in self.workers:
+                self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        log.debug(f"bootstrap pool closed {len(self.workers)} workers")
+        self.workers.clear()
+
+    def start(self):
+        for _ in range(self.processes):
+            worker = multiprocessing.Process(
+                target=self._work, args=(self.tasks, self.results)
+            )
+            worker.start()
+            self.workers.append(worker)
+        log.debug(f"bootstrap pool started {len(self.workers)} workers")
+
+    def submit(self, function, *args):
+        while True:
+            try:
+                self.tasks.put((function, args), timeout=self.POLL_INTERVAL)
+                break
+            except queue.Full:
+                self._check_workers()
+        self.submitted += 1
+        while self._collect(timeout=0):
+            pass
+
+    def wait(self, report=None):
+        """
+        Waits for every submitted task and returns their results, raising if
+        any of them failed.
+        """
+        while self.received < self.submitted:
+            if not self._collect(timeout=self.POLL_INTERVAL):
+                self._check_workers()
+                if report is not None:
+                    report()
+        values, failures = self.values, self.failures
+        self.values, self.failures = [], []
+        if failures:
+            raise RuntimeError(
+                f"{len(failures)} bootstrap tasks failed:\n" + "\n".join(failures)
+            )
+        return values
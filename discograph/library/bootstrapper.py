@@ -1,12 +1,16 @@
 import datetime
 import glob
 import gzip
+import io
 import logging
 import os
 import re
 from xml.dom import minidom
 from xml.etree import ElementTree
 
+from lxml import etree
+
+from discograph.config import XmlParserType
 
 log = logging.getLogger(__name__)
 
@@ -18,6 +22,13 @@ class Bootstrapper(object):
     date_no_dashes_regex = re.compile(r"^(\d{4})(\d{2})(\d{2})$")
     year_regex = re.compile(r"^\d\d\d\d$")
     is_test = False
+    xml_parser = XmlParserType.ELEMENTTREE
+    sharded_parse = False
+    shard_size = 1024 * 1024 * 16
+    relation_shuffle = False
+    resume = False
+    relation_graph_path = None
+    precomputed_network_count = 0
 
     # PUBLIC METHODS
 
@@ -111,7 +122,16 @@ class Bootstrapper(object):
         return iterator
 
     @staticmethod
-    def iterparse(source, tag):
+    def iterparse(source, tag, xml_parser=None):
+        xml_parser = xml_parser or Bootstrapper.xml_parser
+        if xml_parser == XmlParserType.LXML:
+            return Bootstrapper.iterparse_lxml(source, tag)
+        elif xml_parser == XmlParserType.ELEMENTTREE:
+            return Bootstrapper.iterparse_elementtree(source, tag)
+        raise ValueError(f"Invalid XML_PARSER: {xml_parser}")
+
+    @staticmethod
+    def iterparse_elementtree(source, tag):
         context = ElementTree.iterparse(source, events=("start", "end"))
         context = iter(context)
         _, root = next(context)
@@ -126,6 +146,77 @@ class Bootstrapper(object):
                         yield element
                         root.clear()
 
+    @staticmethod
+    def iterparse_lxml(source, tag):
+        # Only "end" events for the wanted tag reach Python, everything else
+        # stays inside libxml2.
+        context = etree.iterparse(source, events=("end",), tag=tag, huge_tree=True)
+        for _, element in context:
+            parent = element.getparent()
+            if parent is None or parent.getparent() is not None:
+                # Nested element sharing the tag, e.g. a label's sublabels.
+                continue
+            yield element
+            # Drop the already processed siblings so the tree stays small.
+            while element.getprevious() is not None:
+                del parent[0]
+
+    @staticmethod
+    def iterparse_shard(shard, tag, xml_parser=None):
+        source = io.BytesIO(b"<shard>" + shard + b"</shard>")
+        return Bootstrapper.iterparse(source, tag, xml_parser)
+
+    @staticmethod
+    def iter_shards(source, tag, shard_size=None, block_size=1024 * 1024):
+        """
+        Splits the decompressed XML stream into byte strings of at least
+        shard_size bytes, each one ending on a top-level element boundary.
+        """
+        shard_size = shard_size or Bootstrapper.shard_size
+        pattern = re.compile(rb"<(/?)" + re.escape(tag.encode()) + rb"[\s/>]")
+        buffer = bytearray()
+        position = 0
+        depth = 0
+        shard_start = None
+        shard_stop = None
+        eof = False
+        while not eof:
+            block = source.read(block_size)
+            if block:
+                buffer += block
+            else:
+                eof = True
+            while True:
+                match = pattern.search(buffer, position)
+                if match is None:
+                    # Rescan a possibly incomplete tag once more data arrives.
+                    position = max(position, len(buffer) - len(tag) - 2)
+                    break
+                tag_stop = buffer.find(b">", match.end() - 1)
+                if tag_stop == -1:
+                    position = match.start()
+                    break
+                position = tag_stop + 1
+                if match.group(1):
+                    depth -= 1
+                elif buffer[tag_stop - 1] != ord("/"):
+                    if depth == 0 and shard_start is None:
+                        shard_start = match.start()
+                    depth += 1
+                    continue
+                elif depth == 0 and shard_start is None:
+                    shard_start = match.start()
+                if depth:
+                    continue
+                shard_stop = position
+                if shard_size <= shard_stop - shard_start:
+                    yield bytes(buffer[shard_start:shard_stop])
+                    del buffer[:shard_stop]
+                    position -= shard_stop
+                    shard_start = shard_stop = None
+        if shard_start is not None and shard_stop is not None:
+            yield bytes(buffer[shard_start:shard_stop])
+
     @staticmethod
     def prettify(element):
         string = ElementTree.tostring(element, "utf-8")
@@ -1,20 +1,82 @@
+import collections
+import concurrent.futures
+import contextlib
+import gzip
+import hashlib
+import json
 import logging
 import os
 import tempfile
+import threading
+import time
+import uuid
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
 from flask_caching import BaseCache, SimpleCache
 from flask_caching.backends.filesystemcache import FileSystemCache
-import fakeredis
 
 from discograph.config import CacheType
+from discograph.library.cache.lru_cache import LruCache
+from discograph.library.cache.redis_cache import CompressedRedisCache, Precompressed
 
 log = logging.getLogger(__name__)
 
 cache: BaseCache | None = None
 
+# In-process tier in front of ``cache`` for single-flight values, holding
+# their JSON and encodings, and the values once decoded, and hits and
+# misses per tier.
+l1_cache: LruCache | None = None
+counters = collections.Counter()
+_counters_lock = threading.Lock()
+
+# Seconds until a single-flight value is stale and is refreshed in the
+# background, and until it expires from the cache.
+soft_timeout = 60 * 60 * 24
+hard_timeout = 60 * 60 * 24 * 7
+
+# Content encodings single-flight values are stored in, best first.
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Bytes of decoded Python objects per byte of their compact JSON, about 9
+# for networks, for the l1 cache to count the ``data`` it holds.
+DECODED_SIZE_RATIO = 10
+
+# Runs the background refreshes of stale values.
+refresh_executor: concurrent.futures.ThreadPoolExecutor | None = None
+REFRESH_WORKERS = 2
+
+# Seconds a single-flight lock is held before it expires, in case its holder
+# died, how long other requests wait on it and how often they poll for it.
+SINGLE_FLIGHT_LOCK_TIMEOUT = 60
+SINGLE_FLIGHT_WAIT = 60
+SINGLE_FLIGHT_POLL = 0.05
+
+# Shared cache key of the version single-flight keys are cached under,
+# changed by invalidate(), and seconds a process reuses the version it read.
+VERSION_KEY = "discograph:version"
+VERSION_CHECK_INTERVAL = 10
+_version = [None, 0.0]
+
+# Per-key locks and their user counts, coalescing requests within a process.
+_local_locks: dict[str, list] = {}
+_local_locks_lock = threading.Lock()
+
 
 def setup_cache(config):
-    global cache
+    global cache, hard_timeout, l1_cache, refresh_executor, soft_timeout
+
+    soft_timeout = config["CACHE_SOFT_TIMEOUT"]
+    hard_timeout = config["CACHE_HARD_TIMEOUT"]
+    refresh_executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=REFRESH_WORKERS, thread_name_prefix="cache-refresh"
+    )
+    l1_cache = LruCache(config["L1_CACHE_SIZE"])
+    counters.clear()
+    _version[:] = [None, 0.0]
 
     # Based on configuration, use a different cache setup.
     match config["CACHE_TYPE"]:
@@ -36,17 +98,238 @@ def setup_cache(config):
             log.info("Using filesystem cache")
 
         case CacheType.REDIS:
-            cache = fakeredis.FakeRedis()
-            # cache = RedisCache()
+            cache = CompressedRedisCache.from_config(config, hard_timeout)
             log.info("Using Redis cache")
 
         case _:
             raise ValueError("Invalid CACHE_TYPE in configuration")
 
 
+@contextlib.contextmanager
+def _local_lock(key):
+    with _local_locks_lock:
+        entry = _local_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _local_locks_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _local_locks[key]
+
+
+def _count(name):
+    with _counters_lock:
+        counters[name] += 1
+
+
+def _data(entry):
+    # Decoded from the JSON on first use and kept with the l1 entry.
+    if "data" not in entry:
+        entry["data"] = json.loads(entry["json"])
+    return entry["data"]
+
+
+def _decode(entry):
+    # Returns the value of a shared cache entry.
+    return json.loads(gzip.decompress(entry["gzip"]))
+
+
+def _encode(data, stale_at):
+    # Returns the shared cache entry of a value: its ETag, its encodings and
+    # when it goes stale. Its compact JSON is the gzip encoding decompressed.
+    # The encodings are compressed already, so the entry is stored as is.
+    body = json.dumps(data, separators=(",", ":"), sort_keys=True)
+    body = body.encode()
+    entry = Precompressed(etag=hashlib.sha256(body).hexdigest(), stale_at=stale_at)
+    entry["gzip"] = gzip.compress(body, mtime=0)
+    if brotli is not None:
+        entry["br"] = brotli.compress(body)
+    return entry
+
+
+def _get_entry(cache_key):
+    # Fresh values come from the l1 cache, stale ones from the shared cache,
+    # where another worker may have refreshed them.
+    entry = l1_cache.get(cache_key)
+    if entry is not None and time.time() < entry["stale_at"]:
+        _count("l1 hits")
+        return entry
+    _count("l1 misses")
+    entry = cache.get(cache_key)
+    if entry is None:
+        _count("l2 misses")
+        return None
+    _count("l2 hits")
+    return _remember(cache_key, entry)
+
+
+def _refresh(cache_key, compute, lock_key, token):
+    try:
+        data = compute()
+        if data is not None:
+            _store(cache_key, data)
+    except Exception:
+        log.exception(f"refresh of {cache_key} failed")
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _remember(cache_key, entry, data=None):
+    if "etag" not in entry:
+        # Cached by an earlier version, with the value itself.
+        data = entry["data"]
+        entry = _encode(data, entry["stale_at"])
+    entry = dict(entry, json=gzip.decompress(entry["gzip"]))
+    if data is not None:
+        entry["data"] = data
+    size = sum(len(entry[_]) for _ in ("json",) + ENCODINGS if _ in entry)
+    size += len(entry["json"]) * DECODED_SIZE_RATIO
+    l1_cache.set(cache_key, entry, size)
+    return entry
+
+
+def _store(cache_key, data):
+    entry = _encode(data, time.time() + soft_timeout)
+    cache.set(cache_key, entry, timeout=hard_timeout)
+    return _remember(cache_key, entry, data)
+
+
+def _versioned(cache_key):
+    # Keys are unchanged until the first invalidate() call.
+    now = time.monotonic()
+    if now >= _version[1]:
+        _version[:] = [cache.get(VERSION_KEY), now + VERSION_CHECK_INTERVAL]
+    if _version[0] is None:
+        return cache_key
+    return f"{cache_key}:v{_version[0]}"
+
+
+def delete(cache_key):
+    cache_key = _versioned(cache_key)
+    l1_cache.delete(cache_key)
+    cache.delete(cache_key)
+
+
+def get_encoded(cache_key):
+    """
+    Returns the l1 cache entry of the single-flight value of ``cache_key``,
+    or None. Entries hold the value's compact, key-sorted ``json``, that
+    JSON's strong ``etag`` and its bytes in each of the ``ENCODINGS``.
+    """
+    return l1_cache.get(_versioned(cache_key))
+
+
+def get_json(cache_key):
+    """
+    Returns the compact, key-sorted JSON of the single-flight value of
+    ``cache_key`` held in the l1 cache, or None.
+    """
+    entry = l1_cache.get(_versioned(cache_key))
+    if entry is None:
+        return None
+    return entry["json"]
+
+
+def invalidate():
+    """
+    Makes every single-flight value cached so far unreachable, for other
+    processes sharing the cache within ``VERSION_CHECK_INTERVAL`` seconds.
+    The values themselves expire from the caches in their own time.
+    """
+    if cache is None:
+        return
+    version = uuid.uuid4().hex
+    cache.set(VERSION_KEY, version, timeout=0)
+    _version[:] = [version, time.monotonic() + VERSION_CHECK_INTERVAL]
+    l1_cache.clear()
+    log.info(f"cache version {version}")
+
+
+def single_flight(cache_key, compute):
+    """
+    Returns the cached value of ``cache_key``, or caches and returns
+    ``compute()``, running ``compute`` once for concurrent misses.
+
+    Values are cached for ``hard_timeout`` seconds with the time they go
+    stale, ``soft_timeout`` seconds on. A stale value is returned as is and
+    one request queues a background refresh of it.
+
+    Values are cached as their JSON compressed with each of the
+    ``ENCODINGS``, and decoded when first read. They are read from the
+    in-process l1 cache, then from the shared cache, and are kept in the l1
+    cache until they go stale.
+
+    Requests for a missing key are serialized by a lock within the process,
+    and across processes by a lock key added to the cache backend. A request
+    that finds the lock taken waits for the value to be cached, then
+    computes it itself if the lock is released without one (a ``None``
+    value is not cached) or after ``SINGLE_FLIGHT_WAIT`` seconds.
+
+    Keys are cached under the version set by the last ``invalidate()``.
+    """
+    entry = single_flight_encoded(cache_key, compute)
+    if entry is None:
+        return None
+    return _data(entry)
+
+
+def single_flight_encoded(cache_key, compute):
+    """
+    Like ``single_flight``, but returns the l1 cache entry of the value, as
+    ``get_encoded`` does, or None if ``compute()`` returned None. Hits are
+    never decoded.
+    """
+    cache_key = _versioned(cache_key)
+    entry = _get_entry(cache_key)
+    if entry is not None:
+        if entry["stale_at"] <= time.time():
+            lock_key = f"{cache_key}:refresh"
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+                log.debug(f"refreshing stale {cache_key}")
+                refresh_executor.submit(_refresh, cache_key, compute, lock_key, token)
+        return entry
+    with _local_lock(cache_key):
+        entry = _get_entry(cache_key)
+        if entry is not None:
+            return entry
+        lock_key = f"{cache_key}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + SINGLE_FLIGHT_WAIT
+        locked = cache.add(lock_key, token, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT)
+        while not locked and time.monotonic() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL)
+            entry = _get_entry(cache_key)
+            if entry is not None:
+                return entry
+            locked = cache.add(lock_key, token, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT)
+        if not locked:
+            log.warning(f"single flight: timed out waiting for {lock_key}")
+        try:
+            data = compute()
+            if data is not None:
+                entry = _store(cache_key, data)
+        finally:
+            if locked and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        return entry
+
+
 def shutdown_cache():
-    global cache
-    if cache is not None:
+    global cache, l1_cache, refresh_executor
+    if refresh_executor is not None:
+        refresh_executor.shutdown()
+    refresh_executor = None
+    l1_cache = None
+    log.info(f"cache counters: {dict(counters)}")
+    if isinstance(cache, CompressedRedisCache):
+        # Shared with the other workers, so left as is.
+        cache.disconnect()
+    elif cache is not None:
         cache.clear()
     cache = None
     log.info("Shutdown cache")
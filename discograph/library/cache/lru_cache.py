@@ -0,0 +1,62 @@
+import collections
+import threading
+
+
+class LruCache(object):
+    """
+    In-process least recently used cache, bounded by the total size in
+    bytes its values are given when set.
+    """
+
+    # INITIALIZER
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    # SPECIAL METHODS
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    # PUBLIC METHODS
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def delete(self, key):
+        with self.lock:
+            item = self.items.pop(key, None)
+            if item is not None:
+                self.size -= item[1]
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            self.items.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, size):
+        """
+        Caches ``value``, evicting the least recently used values to fit
+        it. Returns False, caching nothing, if it is larger than the cache.
+        """
+        self.delete(key)
+        if size > self.max_size:
+            return False
+        with self.lock:
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.items.popitem(last=False)
+                self.size -= evicted_size
+        return True
@@ -0,0 +1,104 @@
+import gzip
+import logging
+import pickle
+
+import fakeredis
+import redis
+from cachelib.serializers import RedisSerializer
+from flask_caching.backends.rediscache import RedisCache
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+log = logging.getLogger(__name__)
+
+
+class Precompressed(dict):
+    """
+    A cache value whose payload is already compressed, stored as its pickle
+    without compressing it again.
+    """
+
+
+class CompressedRedisSerializer(RedisSerializer):
+    """
+    Pickles values like ``RedisSerializer`` and compresses pickles of at
+    least ``MIN_COMPRESSED_SIZE`` bytes with zstd, when available, or gzip.
+    The first byte of a payload marks how it was encoded, so workers with
+    and without zstd share one cache. ``Precompressed`` values are never
+    compressed.
+    """
+
+    MIN_COMPRESSED_SIZE = 1024
+
+    GZIP_MARKER = b"g"
+    ZSTD_MARKER = b"z"
+
+    def dumps(self, value, protocol=pickle.HIGHEST_PROTOCOL):
+        dump = pickle.dumps(value, protocol)
+        if len(dump) < self.MIN_COMPRESSED_SIZE or isinstance(value, Precompressed):
+            return b"!" + dump
+        if zstd is not None:
+            return self.ZSTD_MARKER + zstd.compress(dump)
+        return self.GZIP_MARKER + gzip.compress(dump, mtime=0)
+
+    def loads(self, value):
+        if value is None:
+            return None
+        marker, dump = value[:1], value[1:]
+        if marker == self.ZSTD_MARKER:
+            if zstd is None:
+                log.warning("zstd payload in cache but zstd is not installed")
+                return None
+            return pickle.loads(zstd.decompress(dump))
+        if marker == self.GZIP_MARKER:
+            return pickle.loads(gzip.decompress(dump))
+        return super(CompressedRedisSerializer, self).loads(value)
+
+
+class CompressedRedisCache(RedisCache):
+    """
+    Redis cache shared by every worker and instance, with compressed values.
+
+    ``from_config`` connects through a connection pool to ``REDIS_URL``,
+    which takes any RESP-compatible server, and bounds the server's memory
+    to ``REDIS_MAX_MEMORY`` with least recently used eviction. Without a
+    URL it falls back to an in-process fakeredis server.
+    """
+
+    EVICTION_POLICY = "allkeys-lru"
+
+    serializer = CompressedRedisSerializer()
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def from_config(cls, config, default_timeout):
+        redis_url = config["REDIS_URL"]
+        if not redis_url:
+            log.info("No REDIS_URL, using an in-process fakeredis server")
+            return cls(host=fakeredis.FakeRedis(), default_timeout=default_timeout)
+        pool = redis.ConnectionPool.from_url(
+            redis_url, max_connections=config["REDIS_MAX_CONNECTIONS"]
+        )
+        client = redis.Redis(connection_pool=pool)
+        if config["REDIS_MAX_MEMORY"]:
+            cls.set_eviction(client, config["REDIS_MAX_MEMORY"])
+        return cls(host=client, default_timeout=default_timeout)
+
+    def disconnect(self):
+        self._write_client.connection_pool.disconnect()
+
+    @classmethod
+    def set_eviction(cls, client, max_memory):
+        # Managed servers often disable CONFIG, and are configured up front.
+        try:
+            client.config_set("maxmemory", max_memory)
+            client.config_set("maxmemory-policy", cls.EVICTION_POLICY)
+        except redis.RedisError as e:
+            log.warning(f"could not configure redis eviction: {e}")
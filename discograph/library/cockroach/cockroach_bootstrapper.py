@@ -1,8 +1,15 @@
 import logging
 
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.incremental_bootstrapper import IncrementalBootstrapper
 from discograph.library.cockroach.cockroach_entity import CockroachEntity
+from discograph.library.cockroach.cockroach_helper import CockroachHelper
 from discograph.library.cockroach.cockroach_relation import CockroachRelation
 from discograph.library.cockroach.cockroach_release import CockroachRelease
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.models.precomputed_network import PrecomputedNetwork
+from discograph.library.relation_graph import RelationGraph
 
 log = logging.getLogger(__name__)
 
@@ -11,9 +18,9 @@ class CockroachBootstrapper:
     @classmethod
     def bootstrap_models(cls):
         log.debug("bootstrap cockroach models")
-        CockroachEntity.drop_table(True)
-        CockroachRelease.drop_table(True)
-        CockroachRelation.drop_table(True)
+        if not Bootstrapper.resume:
+            BootstrapJournal.drop_table(True)
+        BootstrapJournal.create_table(True)
 
         # log.debug("entity add index 1")
         # entity_idx1 = CockroachEntity.index(CockroachEntity.entity_type, CockroachEntity.name)
@@ -25,26 +32,64 @@ class CockroachBootstrapper:
         # entity_idx3 = CockroachEntity.index(CockroachEntity.search_content)
         # CockroachEntity.add_index(entity_idx3)
 
-        CockroachEntity.create_table(True)
-        CockroachRelease.create_table(True)
-        CockroachRelation.create_table(True)
+        # One worker pool, and one connection per worker, for all passes.
+        with BootstrapPool.acquire():
+            BootstrapJournal.run_stage("entity pass 1", cls.load_model, CockroachEntity)
+            BootstrapJournal.run_stage(
+                "release pass 1", cls.load_model, CockroachRelease
+            )
+            BootstrapJournal.run_stage(
+                "entity pass 2", CockroachEntity.bootstrap_pass_two
+            )
+            BootstrapJournal.run_stage(
+                "release pass 2", CockroachRelease.bootstrap_pass_two
+            )
+            BootstrapJournal.run_stage(
+                "relation pass 1", cls.load_model, CockroachRelation
+            )
+            BootstrapJournal.run_stage(
+                "entity pass 3", CockroachEntity.bootstrap_pass_three
+            )
+            if Bootstrapper.relation_graph_path:
+                BootstrapJournal.run_stage(
+                    "relation graph",
+                    RelationGraph.build,
+                    CockroachEntity,
+                    CockroachRelation,
+                    Bootstrapper.relation_graph_path,
+                )
+            BootstrapJournal.run_stage(
+                "precomputed networks",
+                PrecomputedNetwork.precompute,
+                CockroachHelper,
+                CockroachEntity,
+                Bootstrapper.precomputed_network_count,
+            )
+            # Every stage is done, so the next bootstrap starts afresh even
+            # with resume on.
+            BootstrapJournal.clear()
 
-        log.debug("entity pass 1")
-        CockroachEntity.bootstrap_pass_one()
-
-        log.debug("release pass 1")
-        CockroachRelease.bootstrap_pass_one()
-
-        log.debug("entity pass 2")
-        CockroachEntity.bootstrap_pass_two()
-
-        log.debug("release pass 2")
-        CockroachRelease.bootstrap_pass_two()
-
-        log.debug("relation pass 1")
-        CockroachRelation.bootstrap_pass_one()
+        log.debug("bootstrap done.")
 
-        log.debug("entity pass 3")
-        CockroachEntity.bootstrap_pass_three()
+    @classmethod
+    def load_model(cls, model_class):
+        # A resumed stage keeps the rows its journaled chunks already wrote.
+        if not BootstrapJournal.has_progress():
+            model_class.drop_table(True)
+        model_class.create_table(True)
+        model_class.bootstrap_pass_one()
 
-        log.debug("bootstrap done.")
+    @classmethod
+    def update_models(cls):
+        log.info("incremental bootstrap cockroach models")
+        stats = IncrementalBootstrapper(
+            CockroachEntity, CockroachRelease, CockroachRelation
+        )()
+        if Bootstrapper.relation_graph_path:
+            RelationGraph.build(
+                CockroachEntity, CockroachRelation, Bootstrapper.relation_graph_path
+            )
+        PrecomputedNetwork.precompute(
+            CockroachHelper, CockroachEntity, Bootstrapper.precomputed_network_count
+        )
+        return stats
@@ -13,6 +13,8 @@ from discograph.library.models.entity import Entity
 
 
 class CockroachEntity(Entity):
+    _json_object_agg = "jsonb_object_agg"
+
     def __format__(self, format_specification=""):
         return json.dumps(
             model_to_dict(
@@ -20,6 +22,7 @@ class CockroachEntity(Entity):
                 exclude=[
                     CockroachEntity.random,
                     CockroachEntity.relation_counts,
+                    CockroachEntity.role_counts,
                     CockroachEntity.search_content,
                 ],
             ),
@@ -34,6 +37,7 @@ class CockroachEntity(Entity):
     entity_type = EnumField(index=False, choices=EntityType)
     name = peewee.TextField(index=True)
     relation_counts = JSONField(index=False, null=True)
+    role_counts = peewee.BlobField(null=True, index=False)
     metadata = JSONField(index=False, null=True)
     entities = JSONField(index=False, null=True)
     search_content = postgres_ext.TSVectorField(index=True)
@@ -7,6 +7,10 @@ from discograph.library.models.relation import Relation
 
 
 class CockroachRelation(Relation):
+    _merge_releases_sql = (
+        'COALESCE("{table}"."releases", \'{{}}\'::jsonb) || EXCLUDED."releases"'
+    )
+
     # PEEWEE FIELDS
 
     entity_one_type = EnumField(index=False, choices=EntityType)
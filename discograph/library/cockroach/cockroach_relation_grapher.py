@@ -25,11 +25,18 @@ class CockroachRelationGrapher(RelationGrapher):
     # INITIALIZER
 
     def __init__(
-        self, center_entity, degree=3, link_ratio=None, max_nodes=None, roles=None
+        self,
+        center_entity,
+        degree=3,
+        link_ratio=None,
+        max_nodes=None,
+        roles=None,
+        graph=None,
+        page_size=None,
     ):
         assert isinstance(center_entity, CockroachEntity)
         super(CockroachRelationGrapher, self).__init__(
-            center_entity, degree, link_ratio, max_nodes, roles
+            center_entity, degree, link_ratio, max_nodes, roles, graph, page_size
         )
 
     # SPECIAL METHODS
@@ -85,15 +92,20 @@ class CockroachRelationGrapher(RelationGrapher):
         return entities
 
     def _search_via_relational_roles(self, distance, provisional_roles, relations):
-        for entity_key in sorted(self.entity_keys_to_visit):
-            node = self.nodes.get(entity_key)
-            if not node:
-                continue
-            entity = node.entity
-            relational_count = entity.roles_to_relation_count(provisional_roles)
-            if 0 < distance and self.max_links < relational_count:
-                self.entity_keys_to_visit.remove(entity_key)
-                log.debug(f"            Pre-pruned {entity.name} [{relational_count}]")
+        if 0 < distance:
+            entity_keys = sorted(
+                _ for _ in self.entity_keys_to_visit if _ in self.nodes
+            )
+            entities = [self.nodes[_].entity for _ in entity_keys]
+            relational_counts = CockroachEntity.roles_to_relation_counts(
+                entities, provisional_roles
+            )
+            for entity, relational_count in zip(entities, relational_counts):
+                if self.max_links < relational_count:
+                    self.entity_keys_to_visit.remove(entity.entity_key)
+                    log.debug(
+                        f"            Pre-pruned {entity.name} [{relational_count}]"
+                    )
         if provisional_roles and distance < self.degree:
             log.debug("        Retrieving relational relations")
             keys = sorted(self.entity_keys_to_visit)
@@ -14,6 +14,20 @@ class DatabaseHelper(ABC):
     LINK_RATIO = 10
     # was 3
 
+    MIN_PAGE_SIZE = 10
+
+    DEFAULT_ROLES = (
+        "Alias",
+        "Member Of",
+        # 'Sublabel Of',
+        # 'Released On',
+    )
+
+    @staticmethod
+    @abstractmethod
+    def compute_network(entity, on_mobile=False, roles=None, page_size=None):
+        pass
+
     @staticmethod
     @abstractmethod
     def get_entity(entity_type: EntityType, entity_id: int):
@@ -22,10 +36,67 @@ class DatabaseHelper(ABC):
     @staticmethod
     @abstractmethod
     def get_network(
-        entity_id: int, entity_type: EntityType, on_mobile=False, roles=None
+        entity_id: int,
+        entity_type: EntityType,
+        on_mobile=False,
+        roles=None,
+        page_size=None,
+        encoded=False,
     ):
         pass
 
+    @classmethod
+    def get_network_page(
+        cls,
+        entity_id: int,
+        entity_type: EntityType,
+        page: int,
+        on_mobile=False,
+        roles=None,
+        page_size=None,
+        encoded=False,
+    ):
+        """
+        Returns the nodes and links of one page of the network, or None if
+        there is no network or no such page. With ``encoded``, returns the
+        page's cache entry instead, as ``single_flight_encoded`` does.
+        """
+        from discograph.library.cache.cache_manager import (
+            single_flight,
+            single_flight_encoded,
+        )
+
+        cache_key = cls.network_cache_key(
+            entity_type,
+            entity_id,
+            on_mobile=on_mobile,
+            roles=roles,
+            page_size=page_size,
+            page=page,
+        )
+
+        def compute():
+            network = cls.get_network(
+                entity_id,
+                entity_type,
+                on_mobile=on_mobile,
+                roles=roles,
+                page_size=page_size,
+            )
+            if network is None or not 1 <= page <= network["pages"]:
+                return None
+            return {
+                "center": network["center"],
+                "links": [_ for _ in network["links"] if page in _["pages"]],
+                "nodes": [_ for _ in network["nodes"] if page in _["pages"]],
+                "page": page,
+                "pages": network["pages"],
+            }
+
+        if encoded:
+            return single_flight_encoded(cache_key, compute)
+        return single_flight(cache_key, compute)
+
     @staticmethod
     @abstractmethod
     def get_random_entity(roles=None):
@@ -38,5 +109,52 @@ class DatabaseHelper(ABC):
 
     @staticmethod
     @abstractmethod
-    def search_entities(search_string: str):
+    def search_entities(search_string: str, encoded=False):
         pass
+
+    @staticmethod
+    def network_cache_key(
+        entity_type: EntityType,
+        entity_id: int,
+        on_mobile=False,
+        roles=None,
+        page_size=None,
+        page=None,
+    ):
+        from discograph.library.relation_grapher import RelationGrapher
+
+        template = "discograph:/api/{entity_type}/network/{entity_id}"
+        if page is not None:
+            template += f"/page/{int(page)}"
+        if on_mobile:
+            template += "/mobile"
+        cache_key = RelationGrapher.make_cache_key(
+            template,
+            entity_type,
+            entity_id,
+            roles=roles,
+            page_size=DatabaseHelper.page_size(page_size, on_mobile=on_mobile),
+        )
+        return cache_key.format(entity_type, entity_id)
+
+    @staticmethod
+    def page_size(page_size=None, on_mobile=False):
+        """
+        Returns ``page_size`` clamped to the nodes of a network, or None when
+        a network is not paged beyond its maximum nodes.
+        """
+        if page_size is None:
+            return None
+        max_nodes = (
+            DatabaseHelper.MAX_NODES_MOBILE if on_mobile else DatabaseHelper.MAX_NODES
+        )
+        page_size = max(min(int(page_size), max_nodes), DatabaseHelper.MIN_PAGE_SIZE)
+        if page_size >= max_nodes:
+            return None
+        return page_size
+
+    @staticmethod
+    def search_cache_key(search_string):
+        from discograph.utils import urlify_pattern
+
+        return f"discograph:/api/search/{urlify_pattern.sub('+', search_string)}"
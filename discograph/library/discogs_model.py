@@ -1,7 +1,8 @@
+import functools
 import gzip
+import hashlib
 import json
 import logging
-import multiprocessing
 import pprint
 import random
 
@@ -12,6 +13,7 @@ from playhouse.shortcuts import model_to_dict
 import discograph.config
 import discograph.database
 import discograph.utils
+from discograph.library.bootstrap_pool import BootstrapPool
 from discograph.library.bootstrapper import Bootstrapper
 
 log = logging.getLogger(__name__)
@@ -23,25 +25,8 @@ class DiscogsModel(Model):
     BULK_INSERT_BATCH_SIZE = 1000
     _tags_to_fields_mapping: dict = None
 
-    class BootstrapPassOneWorker(multiprocessing.Process):
-        def __init__(self, model_class, bulk_inserts, inserted_count):
-            super().__init__()
-            self.model_class = model_class
-            self.bulk_inserts = bulk_inserts
-            self.inserted_count = inserted_count
-
-        def run(self):
-            proc_name = self.name
-            from discograph.database import bootstrap_database
-
-            if bootstrap_database:
-                database_proxy.initialize(bootstrap_database)
-            with DiscogsModel.connection_context():
-                try:
-                    self.model_class.bulk_create(self.bulk_inserts)
-                except peewee.PeeweeException:
-                    log.exception("Error in bootstrap_pass_one worker")
-            log.info(f"[{proc_name}] inserted_count: {self.inserted_count}")
+    # Values which are not derived from the dump content.
+    UNHASHED_FIELDS = ("content_hash", "random", "role_counts", "search_content")
 
     # PEEWEE FIELDS
 
@@ -64,7 +49,33 @@ class DiscogsModel(Model):
     def bootstrap_pass_one(
         cls, model_class, xml_tag, id_attr="id", name_attr="name", skip_without=None
     ):
-        # Pass one.
+        from discograph.library.models.content_hash import ContentHash
+
+        # Pass one records the content hashes incremental bootstraps diff
+        # against, so a (re)loaded dump starts from an empty set of hashes.
+        ContentHash.create_table(True)
+        ContentHash.clear_hashes(xml_tag)
+        if (
+            Bootstrapper.sharded_parse
+            and discograph.database.get_concurrency_count() > 1
+        ):
+            cls.bootstrap_pass_one_sharded(
+                model_class, xml_tag, id_attr, skip_without=skip_without
+            )
+            return
+        loader = model_class.bulk_loader()
+        if loader is not None:
+            cls.bootstrap_pass_one_bulk(
+                model_class, xml_tag, loader, id_attr, skip_without
+            )
+            return
+        if discograph.database.get_concurrency_count() > 1:
+            # Can do multi threading
+            with BootstrapPool.acquire() as pool:
+                cls.bootstrap_pass_one_pooled(
+                    pool, model_class, xml_tag, id_attr, skip_without
+                )
+            return
         initial_count = len(model_class)
         inserted_count = 0
         xml_path = Bootstrapper.get_xml_path(xml_tag)
@@ -72,41 +83,19 @@ class DiscogsModel(Model):
         with gzip.GzipFile(xml_path, "r") as file_pointer:
             iterator = Bootstrapper.iterparse(file_pointer, xml_tag)
             bulk_inserts = []
-            workers = []
+            hashes = []
             for i, element in enumerate(iterator):
                 data = None
                 try:
-                    data = model_class.tags_to_fields(element)
-                    if skip_without:
-                        if any(not data.get(_) for _ in skip_without):
-                            continue
-                    if element.get("id"):
-                        data["id"] = element.get("id")
-                    data["random"] = random.random()
+                    data = cls.element_to_data(model_class, element, skip_without)
+                    if data is None:
+                        continue
+                    hashes.append((int(data[id_attr]), data.pop("content_hash")))
                     # log.debug(**data)
                     new_instance = model_class(model_class, **data)
                     # log.debug(f"new_instance: {new_instance}", flush=True)
                     bulk_inserts.append(new_instance)
                     inserted_count += 1
-                    if discograph.database.get_concurrency_count() > 1:
-                        # Can do multi threading
-                        if len(bulk_inserts) >= DiscogsModel.BULK_INSERT_BATCH_SIZE:
-                            worker = cls.insert_bulk(
-                                model_class, bulk_inserts, inserted_count
-                            )
-                            worker.start()
-                            workers.append(worker)
-                            bulk_inserts.clear()
-                        if len(workers) > discograph.database.get_concurrency_count():
-                            worker = workers.pop(0)
-                            log.debug(f"wait for worker {len(workers)} in list")
-                            worker.join()
-                            if worker.exitcode > 0:
-                                log.debug(
-                                    f"worker {worker.name} exitcode: {worker.exitcode}"
-                                )
-                                # raise Exception("Error in worker process")
-                            worker.terminate()
                     # if inserted_count >= 1000000:
                     #     break
                     # document = model_class.create(**data)
@@ -122,20 +111,11 @@ class DiscogsModel(Model):
                     log.exception("Error in bootstrap_pass_one", pprint.pformat(data))
                     # traceback.print_exc()
                     raise e
-            while len(workers) > 0:
-                worker = workers.pop(0)
-                log.debug(
-                    f"wait for worker {worker.name} - {len(workers)} left in list"
-                )
-                worker.join()
-                if worker.exitcode > 0:
-                    log.debug(f"worker {worker.name} exitcode: {worker.exitcode}")
-                    # raise Exception("Error in worker process")
-                worker.terminate()
             if len(bulk_inserts) > 0:
                 with DiscogsModel.atomic():
                     try:
                         model_class.bulk_create(bulk_inserts)
+                        ContentHash.upsert_hashes(xml_tag, hashes)
                     except peewee.PeeweeException as e:
                         log.exception("Error in bootstrap_pass_one")
                         raise e
@@ -145,9 +125,147 @@ class DiscogsModel(Model):
             assert inserted_count == updated_count
 
     @classmethod
-    def insert_bulk(cls, model_class, bulk_inserts, inserted_count):
-        worker = cls.BootstrapPassOneWorker(model_class, bulk_inserts, inserted_count)
-        return worker
+    def bootstrap_pass_one_pooled(
+        cls, pool, model_class, xml_tag, id_attr="id", skip_without=None
+    ):
+        initial_count = len(model_class)
+        inserted_count = 0
+        xml_path = Bootstrapper.get_xml_path(xml_tag)
+        log.info(f"Loading data from {xml_path} on {pool.processes} workers")
+        with gzip.GzipFile(xml_path, "r") as file_pointer:
+            rows = []
+            for element in Bootstrapper.iterparse(file_pointer, xml_tag):
+                data = cls.element_to_data(model_class, element, skip_without)
+                if data is None:
+                    continue
+                rows.append(data)
+                inserted_count += 1
+                if len(rows) >= DiscogsModel.BULK_INSERT_BATCH_SIZE:
+                    # Blocks while the pool's queue is full.
+                    pool.submit(cls.insert_rows, model_class, rows, xml_tag, id_attr)
+                    rows = []
+            if rows:
+                pool.submit(cls.insert_rows, model_class, rows, xml_tag, id_attr)
+            pool.wait()
+        updated_count = len(model_class) - initial_count
+        log.debug(f"inserted_count: {inserted_count}")
+        log.debug(f"updated_count: {updated_count}")
+        assert inserted_count == updated_count
+
+    @classmethod
+    def bootstrap_pass_one_bulk(
+        cls, model_class, xml_tag, loader, id_attr="id", skip_without=None
+    ):
+        initial_count = len(model_class)
+        xml_path = Bootstrapper.get_xml_path(xml_tag)
+        log.info(f"Loading data from {xml_path} with {type(loader).__name__}")
+        with gzip.GzipFile(xml_path, "r") as file_pointer:
+            cls.load_elements(
+                model_class,
+                xml_tag,
+                Bootstrapper.iterparse(file_pointer, xml_tag),
+                loader,
+                id_attr,
+                skip_without,
+            )
+        updated_count = len(model_class) - initial_count
+        log.debug(f"inserted_count: {loader.count}")
+        log.debug(f"updated_count: {updated_count}")
+        assert loader.count == updated_count
+
+    @classmethod
+    def bootstrap_pass_one_sharded(
+        cls, model_class, xml_tag, id_attr="id", skip_without=None
+    ):
+        initial_count = len(model_class)
+        xml_path = Bootstrapper.get_xml_path(xml_tag)
+        log.info(f"Loading data from {xml_path} in shards")
+        with BootstrapPool.acquire() as pool:
+            with gzip.GzipFile(xml_path, "r") as file_pointer:
+                for shard in Bootstrapper.iter_shards(file_pointer, xml_tag):
+                    pool.submit(
+                        cls.bootstrap_shard,
+                        model_class,
+                        xml_tag,
+                        shard,
+                        id_attr,
+                        skip_without,
+                    )
+            inserted_count = sum(pool.wait())
+        updated_count = len(model_class) - initial_count
+        log.debug(f"inserted_count: {inserted_count}")
+        log.debug(f"updated_count: {updated_count}")
+        assert inserted_count == updated_count
+
+    @classmethod
+    def bootstrap_shard(
+        cls, model_class, xml_tag, shard, id_attr="id", skip_without=None
+    ):
+        iterator = Bootstrapper.iterparse_shard(shard, xml_tag)
+        loader = model_class.bulk_loader()
+        if loader is not None:
+            cls.load_elements(
+                model_class, xml_tag, iterator, loader, id_attr, skip_without
+            )
+            return loader.count
+        count = 0
+        rows = []
+        for element in iterator:
+            data = cls.element_to_data(model_class, element, skip_without)
+            if data is None:
+                continue
+            rows.append(data)
+            if len(rows) >= DiscogsModel.BULK_INSERT_BATCH_SIZE:
+                count += cls.insert_rows(model_class, rows, xml_tag, id_attr)
+                rows = []
+        if rows:
+            count += cls.insert_rows(model_class, rows, xml_tag, id_attr)
+        return count
+
+    @classmethod
+    def content_hash(cls, data):
+        data = {k: v for k, v in data.items() if k not in cls.UNHASHED_FIELDS}
+        data = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    @classmethod
+    def element_to_data(cls, model_class, element, skip_without=None):
+        data = model_class.tags_to_fields(element)
+        if skip_without:
+            if any(not data.get(_) for _ in skip_without):
+                return None
+        if element.get("id"):
+            data["id"] = element.get("id")
+        data["random"] = random.random()
+        data["content_hash"] = cls.content_hash(data)
+        return data
+
+    @classmethod
+    def insert_rows(cls, model_class, rows, xml_tag, id_attr="id"):
+        from discograph.library.models.content_hash import ContentHash
+
+        hashes = [(int(_[id_attr]), _.pop("content_hash")) for _ in rows]
+        with DiscogsModel.atomic():
+            model_class.bulk_create([model_class(**_) for _ in rows])
+            ContentHash.upsert_hashes(xml_tag, hashes)
+        return len(rows)
+
+    @classmethod
+    def load_elements(
+        cls, model_class, xml_tag, elements, loader, id_attr="id", skip_without=None
+    ):
+        from discograph.library.models.content_hash import ContentHash
+
+        # The hashes ride along with their rows, so each batch's hashes are
+        # written in the transaction that copies the batch.
+        loader.on_flush = functools.partial(ContentHash.upsert_hashes, xml_tag)
+        with loader:
+            for element in elements:
+                data = cls.element_to_data(model_class, element, skip_without)
+                if data is None:
+                    continue
+                content_hash = data.pop("content_hash")
+                loader.add(data, extra=(int(data[id_attr]), content_hash))
 
     @classmethod
     def bootstrap_pass_two(cls, model_class, name_attr="name"):
@@ -171,6 +289,14 @@ class DiscogsModel(Model):
                     + f"{getattr(document, name_attr)}"
                 )
 
+    @classmethod
+    def bulk_loader(cls):
+        """
+        Returns a loader streaming bootstrap rows into this model's table, or
+        None to insert them with bulk_create.
+        """
+        return None
+
     @staticmethod
     def database():
         return database_proxy
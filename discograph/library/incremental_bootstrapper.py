@@ -0,0 +1,263 @@
+import gzip
+import logging
+
+import numpy
+
+from discograph.library import EntityType
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.discogs_model import DiscogsModel
+from discograph.library.models.content_hash import ContentHash
+from discograph.library.name_corpus import NameCorpus
+from discograph.library.relation_accumulator import RelationAccumulator
+
+log = logging.getLogger(__name__)
+
+
+class IncrementalBootstrapper(object):
+    """
+    Applies a new Discogs dump on top of an already bootstrapped database.
+
+    Every loaded artist, label and release has a content hash of its parsed
+    dump data in the ContentHash table, recorded by pass one. Only records
+    whose hash changed, or which were added or removed, are rewritten, along
+    with their derived relations and the relation counts of the entities
+    those touch.
+    """
+
+    ENTITY_TAGS = (
+        ("artist", EntityType.ARTIST),
+        ("label", EntityType.LABEL),
+    )
+
+    ROLE_COUNTS_CHUNK_SIZE = 1000
+
+    # INITIALIZER
+
+    def __init__(self, entity_class, release_class, relation_class):
+        self.entity_class = entity_class
+        self.release_class = release_class
+        self.relation_class = relation_class
+        self.changed_entities = set()
+        self.changed_releases = set()
+        self.counted_entities = set()
+        self.removed_relations = {}
+        self.stats = {}
+
+    # SPECIAL METHODS
+
+    def __call__(self):
+        ContentHash.create_table(True)
+        for xml_tag, entity_type in self.ENTITY_TAGS:
+            self.update_entities(xml_tag, entity_type)
+        self.resolve_entities()
+        self.update_releases()
+        self.resolve_releases()
+        self.update_relations()
+        self.update_relation_counts()
+        log.info(f"incremental bootstrap: {self.stats}")
+        return self.stats
+
+    # PRIVATE METHODS
+
+    def _diff(self, model_class, xml_tag, skip_without, record_id_attr):
+        """
+        Yields (record_id, content_hash, data) for new or changed records and
+        records the ids of records missing from the dump in the stats.
+
+        Stored hashes are looked up one parsed batch at a time and the ids
+        seen are kept as integer arrays, so the diff never holds every
+        stored hash in memory.
+        """
+        seen = []
+        counts = dict(inserted=0, updated=0, deleted=0, unchanged=0)
+        xml_path = Bootstrapper.get_xml_path(xml_tag)
+        log.info(f"Diffing {xml_path}")
+        with gzip.GzipFile(xml_path, "r") as file_pointer:
+            batch = []
+            for element in Bootstrapper.iterparse(file_pointer, xml_tag):
+                data = DiscogsModel.element_to_data(model_class, element, skip_without)
+                if data is None:
+                    continue
+                batch.append(data)
+                if len(batch) >= DiscogsModel.BULK_INSERT_BATCH_SIZE:
+                    yield from self._diff_batch(
+                        xml_tag, batch, record_id_attr, seen, counts
+                    )
+                    batch = []
+            yield from self._diff_batch(xml_tag, batch, record_id_attr, seen, counts)
+        deleted = self._find_deleted(xml_tag, seen)
+        counts["deleted"] = len(deleted)
+        self.stats[xml_tag] = counts
+        self.stats[f"{xml_tag}_deleted"] = deleted
+
+    @staticmethod
+    def _diff_batch(xml_tag, batch, record_id_attr, seen, counts):
+        if not batch:
+            return
+        record_ids = [int(_[record_id_attr]) for _ in batch]
+        seen.append(numpy.array(record_ids, dtype=numpy.int64))
+        existing = ContentHash.get_hashes(xml_tag, record_ids)
+        for record_id, data in zip(record_ids, batch):
+            content_hash = data.pop("content_hash")
+            if existing.get(record_id) == content_hash:
+                counts["unchanged"] += 1
+                continue
+            counts["updated" if record_id in existing else "inserted"] += 1
+            yield record_id, content_hash, data
+
+    @staticmethod
+    def _find_deleted(xml_tag, seen):
+        # Walks the stored ids in order against the sorted ids seen in the
+        # dump; whatever is stored but was not seen has been deleted.
+        seen = numpy.sort(numpy.concatenate(seen or [numpy.empty(0, numpy.int64)]))
+        deleted = set()
+        for record_ids in ContentHash.iter_record_ids(xml_tag):
+            record_ids = numpy.array(record_ids, dtype=numpy.int64)
+            found = numpy.zeros(len(record_ids), dtype=bool)
+            if len(seen):
+                positions = numpy.searchsorted(seen, record_ids)
+                positions = numpy.minimum(positions, len(seen) - 1)
+                found = seen[positions] == record_ids
+            deleted.update(int(_) for _ in record_ids[~found])
+        return deleted
+
+    def _remove_release_relations(self, release):
+        for relation in self.relation_class.from_release(release):
+            key = tuple(relation[_] for _ in RelationAccumulator.KEY_FIELDS)
+            self.removed_relations.setdefault(key, set()).add(release.id)
+
+    # PUBLIC METHODS
+
+    def resolve_entities(self):
+        corpus = NameCorpus.from_entities(self.entity_class)
+        for entity_type, entity_id in sorted(self.changed_entities):
+            with DiscogsModel.atomic():
+                self.entity_class.bootstrap_pass_two_single(
+                    entity_type=entity_type,
+                    entity_id=entity_id,
+                    annotation="incremental",
+                    corpus=corpus,
+                    progress=0,
+                )
+
+    def resolve_releases(self):
+        corpus = NameCorpus.from_entities(self.entity_class)
+        for release_id in sorted(self.changed_releases):
+            with DiscogsModel.atomic():
+                self.release_class.bootstrap_pass_two_single(
+                    release_id=release_id,
+                    annotation="incremental",
+                    corpus=corpus,
+                    progress=0,
+                )
+
+    def update_entities(self, xml_tag, entity_type):
+        entity_class = self.entity_class
+        hashes = []
+        for entity_id, content_hash, data in self._diff(
+            entity_class, xml_tag, ["name"], "entity_id"
+        ):
+            with DiscogsModel.atomic():
+                entity_class.delete().where(
+                    entity_class.entity_type == entity_type,
+                    entity_class.entity_id == entity_id,
+                ).execute()
+                entity_class.create(**data)
+            hashes.append((entity_id, content_hash))
+            self.changed_entities.add((entity_type, entity_id))
+            self.counted_entities.add((entity_type, entity_id))
+        deleted = self.stats.pop(f"{xml_tag}_deleted")
+        with DiscogsModel.atomic():
+            for entity_id in deleted:
+                entity_class.delete().where(
+                    entity_class.entity_type == entity_type,
+                    entity_class.entity_id == entity_id,
+                ).execute()
+            ContentHash.upsert_hashes(xml_tag, hashes)
+            ContentHash.delete_hashes(xml_tag, deleted)
+
+    def update_releases(self):
+        release_class = self.release_class
+        hashes = []
+        for release_id, content_hash, data in self._diff(
+            release_class, "release", ["title"], "id"
+        ):
+            with DiscogsModel.atomic():
+                release = release_class.get_or_none(release_class.id == release_id)
+                if release is not None:
+                    self._remove_release_relations(release)
+                    release.delete_instance()
+                release_class.create(**data)
+            hashes.append((release_id, content_hash))
+            self.changed_releases.add(release_id)
+        deleted = self.stats.pop("release_deleted")
+        with DiscogsModel.atomic():
+            for release_id in deleted:
+                release = release_class.get_or_none(release_class.id == release_id)
+                if release is not None:
+                    self._remove_release_relations(release)
+                    release.delete_instance()
+            ContentHash.upsert_hashes("release", hashes)
+            ContentHash.delete_hashes("release", deleted)
+
+    def update_relations(self):
+        relation_class = self.relation_class
+        for key, release_ids in self.removed_relations.items():
+            with DiscogsModel.atomic():
+                relation = relation_class.get_or_none(
+                    **dict(zip(RelationAccumulator.KEY_FIELDS, key))
+                )
+                if relation is None:
+                    continue
+                releases = relation.releases or {}
+                for release_id in release_ids:
+                    releases.pop(release_id, None)
+                    releases.pop(str(release_id), None)
+                if releases:
+                    relation.releases = releases
+                    relation.save()
+                else:
+                    relation.delete_instance()
+            self.counted_entities.update(((key[0], key[1]), (key[2], key[3])))
+        with RelationAccumulator() as accumulator:
+            relation_class.accumulate_relations(
+                self.release_class,
+                sorted(self.changed_releases),
+                accumulator,
+                annotation="incremental",
+            )
+            items = []
+            for key, releases in accumulator.items():
+                self.counted_entities.update(((key[0], key[1]), (key[2], key[3])))
+                items.append((key, releases))
+            relation_class.write_relations(items)
+        self.stats["relations"] = dict(
+            removed=len(self.removed_relations),
+            written=len(items),
+        )
+
+    def update_relation_counts(self):
+        entity_class = self.entity_class
+        for entity_type, entity_id in sorted(self.counted_entities):
+            with DiscogsModel.atomic():
+                entity_class.update(relation_counts=None).where(
+                    entity_class.entity_type == entity_type,
+                    entity_class.entity_id == entity_id,
+                ).execute()
+                entity_class.bootstrap_pass_three_single(
+                    self.relation_class,
+                    entity_type=entity_type,
+                    entity_id=entity_id,
+                    annotation="incremental",
+                    progress=0,
+                )
+        self.stats["relation_counts"] = len(self.counted_entities)
+        # Role counts also count the structural relations of changed entities.
+        entity_keys = sorted(self.counted_entities | self.changed_entities)
+        for entity_type in (EntityType.ARTIST, EntityType.LABEL):
+            entity_ids = [_[1] for _ in entity_keys if _[0] == entity_type]
+            for start in range(0, len(entity_ids), self.ROLE_COUNTS_CHUNK_SIZE):
+                entity_class.update_role_counts(
+                    entity_type,
+                    entity_ids[start : start + self.ROLE_COUNTS_CHUNK_SIZE],
+                )
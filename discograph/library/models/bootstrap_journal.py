@@ -0,0 +1,191 @@
+import datetime
+import logging
+import time
+
+import peewee
+
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.discogs_model import DiscogsModel
+
+log = logging.getLogger(__name__)
+
+
+class BootstrapJournal(DiscogsModel):
+    """
+    Records which bootstrap stages, and which id range chunks of the chunked
+    stages, have completed so an interrupted bootstrap can resume.
+
+    Chunked stages run inside a stage are journaled under that stage's name,
+    as ``"<stage>/<chunked stage>"``, and their entries are cleared once the
+    enclosing stage completes.
+    """
+
+    CHUNK_SIZE = 10000
+
+    REPORT_INTERVAL = 30
+
+    # chunk_start of the entry marking a whole stage as complete.
+    STAGE_MARKER = -1
+
+    # The stage run_stage is running, if any.
+    current_stage = None
+
+    # PEEWEE FIELDS
+
+    stage = peewee.CharField(index=False)
+    chunk_start = peewee.IntegerField(index=False)
+    chunk_end = peewee.IntegerField(index=False)
+    count = peewee.IntegerField(default=0)
+    completed = peewee.DateTimeField(null=True)
+
+    # PEEWEE META
+
+    class Meta:
+        table_name = "bootstrapjournal"
+        primary_key = peewee.CompositeKey("stage", "chunk_start")
+
+    # PRIVATE METHODS
+
+    @classmethod
+    def _mark(cls, stage, chunk_start, chunk_end, count):
+        with DiscogsModel.atomic():
+            cls.insert(
+                stage=stage,
+                chunk_start=chunk_start,
+                chunk_end=chunk_end,
+                count=count,
+                completed=datetime.datetime.now(),
+            ).on_conflict(
+                conflict_target=[cls.stage, cls.chunk_start],
+                update={
+                    cls.chunk_end: peewee.EXCLUDED.chunk_end,
+                    cls.count: peewee.EXCLUDED.count,
+                    cls.completed: peewee.EXCLUDED.completed,
+                },
+            ).execute()
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def clear(cls):
+        cls.delete().execute()
+
+    @classmethod
+    def completed_count(cls, stage):
+        query = cls.select(peewee.fn.SUM(cls.count)).where(
+            cls.stage == stage, cls.chunk_start != cls.STAGE_MARKER
+        )
+        return query.scalar() or 0
+
+    @classmethod
+    def has_progress(cls):
+        """
+        Whether the running stage journaled chunked stages or chunks before
+        being interrupted.
+        """
+        if cls.current_stage is None:
+            return False
+        query = cls.select().where(cls.stage.startswith(f"{cls.current_stage}/"))
+        return query.exists()
+
+    @classmethod
+    def inner_stage(cls, stage):
+        if cls.current_stage is None:
+            return stage
+        return f"{cls.current_stage}/{stage}"
+
+    @classmethod
+    def is_stage_complete(cls, stage):
+        query = cls.select().where(
+            cls.stage == stage, cls.chunk_start == cls.STAGE_MARKER
+        )
+        return query.exists()
+
+    @classmethod
+    def iter_pending_chunks(cls, stage, ids, chunk_size=None):
+        """
+        Splits a sorted id sequence into chunks, skipping chunks already
+        journaled as complete.
+        """
+        chunk_size = chunk_size or cls.CHUNK_SIZE
+        query = cls.select(cls.chunk_start, cls.chunk_end).where(cls.stage == stage)
+        completed = set(query.tuples())
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i : i + chunk_size]
+            if (chunk[0], chunk[-1]) in completed:
+                log.debug(f"{stage}: skip completed chunk {chunk[0]}-{chunk[-1]}")
+                continue
+            yield chunk
+
+    @classmethod
+    def mark_chunk_complete(cls, stage, chunk, count=None):
+        if count is None:
+            count = len(chunk)
+        cls._mark(stage, chunk[0], chunk[-1], count)
+
+    @classmethod
+    def mark_stage_complete(cls, stage, count=0):
+        cls._mark(stage, cls.STAGE_MARKER, cls.STAGE_MARKER, count)
+
+    @classmethod
+    def report(cls, stage, started, initial, total):
+        done = cls.completed_count(stage)
+        elapsed = time.monotonic() - started
+        rate = (done - initial) / elapsed if elapsed else 0
+        if rate:
+            eta = datetime.timedelta(seconds=round((total - done) / rate))
+        else:
+            eta = "unknown"
+        log.info(f"{stage}: {done} of {total} done, {rate:.1f}/s, ETA {eta}")
+
+    @classmethod
+    def run_chunk(cls, stage, function, *args):
+        # Runs in a bootstrap pool worker; the chunk is the last argument.
+        function(*args)
+        cls.mark_chunk_complete(stage, args[-1])
+
+    @classmethod
+    def run_chunks(cls, stage, function, ids, *args, chunk_size=None):
+        """
+        Runs ``function(*args, chunk)`` on the bootstrap pool for each pending
+        chunk of ids, logging throughput and ETA from the journal.
+        """
+        cls.create_table(True)
+        stage = cls.inner_stage(stage)
+        if cls.is_stage_complete(stage):
+            log.info(f"{stage}: already complete, skipping")
+            return
+        started = time.monotonic()
+        initial = cls.completed_count(stage)
+        with BootstrapPool.acquire() as pool:
+            for chunk in cls.iter_pending_chunks(stage, ids, chunk_size):
+                pool.submit(cls.run_chunk, stage, function, *args, chunk)
+            pool.wait(lambda: cls.report(stage, started, initial, len(ids)))
+        cls.report(stage, started, initial, len(ids))
+        # The marker goes in with the chunk entries' removal, so a bootstrap
+        # stopped before the enclosing stage completes skips this one.
+        # Outside a stage nothing resumes it, so nothing is kept.
+        with DiscogsModel.atomic():
+            if cls.current_stage is not None:
+                cls.mark_stage_complete(stage, cls.completed_count(stage))
+            cls.delete().where(
+                cls.stage == stage, cls.chunk_start != cls.STAGE_MARKER
+            ).execute()
+
+    @classmethod
+    def run_stage(cls, stage, procedure, *args):
+        if cls.is_stage_complete(stage):
+            log.info(f"{stage}: already complete, skipping")
+            return
+        log.info(f"{stage}: start")
+        started = time.monotonic()
+        cls.current_stage = stage
+        try:
+            procedure(*args)
+        finally:
+            cls.current_stage = None
+        with DiscogsModel.atomic():
+            cls.mark_stage_complete(stage)
+            cls.delete().where(cls.stage.startswith(f"{stage}/")).execute()
+        elapsed = datetime.timedelta(seconds=round(time.monotonic() - started))
+        log.info(f"{stage}: done in {elapsed}")
@@ -0,0 +1,77 @@
+import logging
+
+import peewee
+
+from discograph.library.discogs_model import DiscogsModel
+
+log = logging.getLogger(__name__)
+
+
+class ContentHash(DiscogsModel):
+    # CLASS VARIABLES
+
+    RECORD_IDS_CHUNK_SIZE = 100000
+
+    # PEEWEE FIELDS
+
+    kind = peewee.CharField(index=False)
+    record_id = peewee.IntegerField(index=False)
+    content_hash = peewee.CharField(index=False, max_length=40)
+
+    # PEEWEE META
+
+    class Meta:
+        table_name = "contenthash"
+        primary_key = peewee.CompositeKey("kind", "record_id")
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def get_hashes(cls, kind, record_ids):
+        query = cls.select(cls.record_id, cls.content_hash).where(
+            cls.kind == kind, cls.record_id.in_(record_ids)
+        )
+        return dict(query.tuples())
+
+    @classmethod
+    def iter_record_ids(cls, kind, chunk_size=None):
+        """
+        Yields the record ids of a kind in ascending chunks, paging along the
+        primary key so no more than one chunk is held at a time.
+        """
+        chunk_size = chunk_size or cls.RECORD_IDS_CHUNK_SIZE
+        last_record_id = None
+        while True:
+            query = cls.select(cls.record_id).where(cls.kind == kind)
+            if last_record_id is not None:
+                query = query.where(cls.record_id > last_record_id)
+            query = query.order_by(cls.record_id).limit(chunk_size)
+            record_ids = [record_id for record_id, in query.tuples()]
+            if not record_ids:
+                return
+            yield record_ids
+            last_record_id = record_ids[-1]
+
+    @classmethod
+    def upsert_hashes(cls, kind, hashes):
+        rows = [
+            dict(kind=kind, record_id=record_id, content_hash=content_hash)
+            for record_id, content_hash in hashes
+        ]
+        for i in range(0, len(rows), DiscogsModel.BULK_INSERT_BATCH_SIZE):
+            batch = rows[i : i + DiscogsModel.BULK_INSERT_BATCH_SIZE]
+            cls.insert_many(batch).on_conflict(
+                conflict_target=[cls.kind, cls.record_id],
+                update={cls.content_hash: peewee.EXCLUDED.content_hash},
+            ).execute()
+
+    @classmethod
+    def clear_hashes(cls, kind):
+        cls.delete().where(cls.kind == kind).execute()
+
+    @classmethod
+    def delete_hashes(cls, kind, record_ids):
+        record_ids = list(record_ids)
+        for i in range(0, len(record_ids), DiscogsModel.BULK_INSERT_BATCH_SIZE):
+            batch = record_ids[i : i + DiscogsModel.BULK_INSERT_BATCH_SIZE]
+            cls.delete().where(cls.kind == kind, cls.record_id.in_(batch)).execute()
@@ -1,19 +1,24 @@
+import functools
 import logging
 import multiprocessing
 import re
 import sys
 
+import numpy
 import peewee
 
 import discograph.config
 import discograph.database
 import discograph.utils
 from discograph import utils
-from discograph.library import EntityType
+from discograph.library import CreditRole, EntityType
 from discograph.library.enum_field import EnumField
+from discograph.library.bootstrap_pool import BootstrapPool
 from discograph.library.bootstrapper import Bootstrapper
-from discograph.library.discogs_model import DiscogsModel, database_proxy
+from discograph.library.discogs_model import DiscogsModel
+from discograph.library.models.bootstrap_journal import BootstrapJournal
 from discograph.library.models.relation import Relation
+from discograph.library.name_corpus import NameCorpus
 
 
 log = logging.getLogger(__name__)
@@ -24,110 +29,18 @@ class Entity(DiscogsModel):
 
     _strip_pattern = re.compile(r"(\(\d+\)|[^(\w\s)]+)")
 
-    class BootstrapPassTwoWorker(multiprocessing.Process):
-        def __init__(self, model_class, entity_type: EntityType, indices):
-            super().__init__()
-            self.model_class = model_class
-            self.entity_type = entity_type
-            self.indices = indices
+    # SQL aggregate building a JSON object, enables set-based pass three.
+    _json_object_agg: str = None
 
-        def run(self):
-            proc_name = self.name
-            proc_number = proc_name.split("-")[-1]
-            corpus = {}
-
-            count = 0
-            total_count = len(self.indices)
-
-            from discograph.database import bootstrap_database
-
-            if bootstrap_database:
-                database_proxy.initialize(bootstrap_database)
-            with DiscogsModel.connection_context():
-                for i, entity_id in enumerate(self.indices):
-                    max_attempts = 10
-                    error = True
-                    while error and max_attempts != 0:
-                        error = False
-                        try:
-                            with DiscogsModel.atomic():
-                                progress = float(i) / total_count
-                                try:
-                                    self.model_class.bootstrap_pass_two_single(
-                                        entity_type=self.entity_type,
-                                        entity_id=entity_id,
-                                        annotation=proc_number,
-                                        corpus=corpus,
-                                        progress=progress,
-                                    )
-                                    count += 1
-                                    if count % 10000 == 0:
-                                        log.info(
-                                            f"[{proc_name}] processed {count} of {total_count}"
-                                        )
-                                except peewee.PeeweeException:
-                                    log.exception(
-                                        "ERROR 1:",
-                                        self.entity_type,
-                                        entity_id,
-                                        proc_number,
-                                    )
-                                    max_attempts -= 1
-                                    error = True
-                        except peewee.PeeweeException:
-                            log.exception(
-                                "ERROR 2:", self.entity_type, entity_id, proc_number
-                            )
-                            max_attempts -= 1
-                            error = True
-            log.info(f"[{proc_name}] processed {count} of {total_count}")
-
-    class BootstrapPassThreeWorker(multiprocessing.Process):
-        def __init__(self, model_class, entity_type: EntityType, indices):
-            super().__init__()
-            self.model_class = model_class
-            self.entity_type = entity_type
-            self.indices = indices
-
-        def run(self):
-            proc_name = self.name
-            entity_class_name = self.model_class.__qualname__
-            entity_module_name = self.model_class.__module__
-            relation_class_name = entity_class_name.replace("Entity", "Relation")
-            relation_module_name = entity_module_name.replace("entity", "relation")
-            relation_class = getattr(
-                sys.modules[relation_module_name], relation_class_name
-            )
+    # Role ids of the role counts vectors.
+    _role_ids = {name: i for i, name in enumerate(sorted(CreditRole.all_credit_roles))}
 
-            count = 0
-            total_count = len(self.indices)
-
-            from discograph.database import bootstrap_database
-
-            if bootstrap_database:
-                database_proxy.initialize(bootstrap_database)
-            with DiscogsModel.connection_context():
-                for i, entity_id in enumerate(self.indices):
-                    with DiscogsModel.atomic():
-                        progress = float(i) / total_count
-                        try:
-                            self.model_class.bootstrap_pass_three_single(
-                                relation_class,
-                                entity_type=self.entity_type,
-                                entity_id=entity_id,
-                                annotation=proc_name,
-                                progress=progress,
-                            )
-                            count += 1
-                            if count % 1000 == 0:
-                                log.info(
-                                    f"[{proc_name}] processed {count} of {total_count}"
-                                )
-                        except peewee.PeeweeException:
-                            log.exception(
-                                "ERROR:", self.entity_type, entity_id, proc_name
-                            )
-            log.info(f"[{proc_name}] processed {count} of {total_count}")
+    # Structural roles, counted from the entities instead of relations.
+    _structural_sections = {
+        "Alias": ("aliases",),
+        "Member Of": ("groups", "members"),
+        "Sublabel Of": ("parent_label", "sublabels"),
+    }
 
     # PEEWEE FIELDS
 
@@ -135,6 +48,7 @@ class Entity(DiscogsModel):
     entity_type: EnumField
     name: peewee.TextField
     relation_counts: peewee.Field
+    role_counts: peewee.BlobField
     metadata: peewee.Field
     entities: peewee.Field
     search_content: peewee.Field
@@ -189,80 +103,111 @@ class Entity(DiscogsModel):
             yield entity
 
     @classmethod
-    def get_indices(cls, entity_type: EntityType):
+    def get_ids(cls, entity_type: EntityType):
         query = cls.select(cls.entity_id)
         query = query.where(cls.entity_type == entity_type)
         query = query.order_by(cls.entity_id)
         query = query.tuples()
-        all_ids = tuple(_[0] for _ in query)
+        return [_[0] for _ in query]
+
+    @classmethod
+    def get_indices(cls, entity_type: EntityType):
+        all_ids = tuple(cls.get_ids(entity_type))
         num_chunks = discograph.database.get_concurrency_count()
         return utils.split_tuple(num_chunks, all_ids)
 
     @classmethod
     def bootstrap_pass_two(cls, **kwargs):
-        log.debug("entity bootstrap pass two - artist")
-        entity_type: EntityType = EntityType.ARTIST
-        indices = cls.get_indices(entity_type)
-
-        workers = [cls.BootstrapPassTwoWorker(cls, entity_type, x) for x in indices]
-        log.debug(f"entity bootstrap pass two - artist start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker {worker.name} exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
-
-        log.debug("entity bootstrap pass two - label")
-        entity_type: EntityType = EntityType.LABEL
-        indices = cls.get_indices(entity_type)
-
-        workers = [cls.BootstrapPassTwoWorker(cls, entity_type, x) for x in indices]
-        log.debug(f"entity bootstrap pass two - label start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker {worker.name} exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
+        for entity_type in (EntityType.ARTIST, EntityType.LABEL):
+            type_name = entity_type.name.lower()
+            log.debug(f"entity bootstrap pass two - {type_name}")
+            stage = f"{cls.__name__} pass two {type_name}"
+            with NameCorpus.sharing(cls, stage), BootstrapPool.acquire(fork=True):
+                BootstrapJournal.run_chunks(
+                    stage,
+                    cls.bootstrap_pass_two_chunk,
+                    cls.get_ids(entity_type),
+                    entity_type,
+                    stage,
+                )
         log.debug("entity bootstrap pass two - done")
 
+    @classmethod
+    def bootstrap_pass_two_chunk(cls, entity_type: EntityType, corpus_key, entity_ids):
+        proc_name = multiprocessing.current_process().name
+        corpus = NameCorpus.shared(cls, corpus_key)
+        for i, entity_id in enumerate(entity_ids):
+            max_attempts = 10
+            error = True
+            while error and max_attempts != 0:
+                error = False
+                try:
+                    with DiscogsModel.atomic():
+                        cls.bootstrap_pass_two_single(
+                            entity_type=entity_type,
+                            entity_id=entity_id,
+                            annotation=proc_name,
+                            corpus=corpus,
+                            progress=float(i) / len(entity_ids),
+                        )
+                except peewee.PeeweeException:
+                    log.exception("ERROR:", entity_type, entity_id, proc_name)
+                    max_attempts -= 1
+                    error = True
+        log.info(f"[{proc_name}] processed {len(entity_ids)} {entity_type.name}")
+
     @classmethod
     def bootstrap_pass_three(cls):
         log.debug("entity bootstrap pass three")
+        if cls._json_object_agg is not None:
+            try:
+                cls.bootstrap_pass_three_bulk()
+            except peewee.PeeweeException:
+                log.exception("Error in bootstrap_pass_three_bulk, use fallback")
+            else:
+                cls.bootstrap_role_counts()
+                return
+
+        for entity_type in (EntityType.ARTIST, EntityType.LABEL):
+            type_name = entity_type.name.lower()
+            log.debug(f"entity bootstrap pass three - {type_name}")
+            BootstrapJournal.run_chunks(
+                f"{cls.__name__} pass three {type_name}",
+                cls.bootstrap_pass_three_chunk,
+                cls.get_ids(entity_type),
+                entity_type,
+            )
+        cls.bootstrap_role_counts()
+
+    @classmethod
+    def bootstrap_pass_three_chunk(cls, entity_type: EntityType, entity_ids):
+        proc_name = multiprocessing.current_process().name
+        relation_class = cls.relation_class()
+        for i, entity_id in enumerate(entity_ids):
+            with DiscogsModel.atomic():
+                try:
+                    cls.bootstrap_pass_three_single(
+                        relation_class,
+                        entity_type=entity_type,
+                        entity_id=entity_id,
+                        annotation=proc_name,
+                        progress=float(i) / len(entity_ids),
+                    )
+                except peewee.PeeweeException:
+                    log.exception("ERROR:", entity_type, entity_id, proc_name)
+        log.info(f"[{proc_name}] processed {len(entity_ids)} {entity_type.name}")
 
-        entity_type: EntityType = EntityType.ARTIST
-        indices = cls.get_indices(entity_type)
-        workers = [cls.BootstrapPassThreeWorker(cls, entity_type, x) for x in indices]
-        log.debug(f"entity bootstrap pass three - artist start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker {worker.name} exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
-        entity_type: EntityType = EntityType.LABEL
-        indices = cls.get_indices(entity_type)
-        workers = [cls.BootstrapPassThreeWorker(cls, entity_type, _) for _ in indices]
-        log.debug(f"entity bootstrap pass three - label start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker {worker.name} exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
+    @classmethod
+    def bootstrap_role_counts(cls):
+        for entity_type in (EntityType.ARTIST, EntityType.LABEL):
+            type_name = entity_type.name.lower()
+            log.debug(f"entity bootstrap role counts - {type_name}")
+            BootstrapJournal.run_chunks(
+                f"{cls.__name__} role counts {type_name}",
+                cls.update_role_counts,
+                cls.get_ids(entity_type),
+                entity_type,
+            )
 
     @classmethod
     def bootstrap_pass_two_single(
@@ -280,7 +225,8 @@ class Entity(DiscogsModel):
         if not query.count():
             return
         document = query.get()
-        corpus = corpus or {}
+        if corpus is None:
+            corpus = {}
         changed = document.resolve_references(corpus)
         if changed:
             log.debug(
@@ -294,6 +240,45 @@ class Entity(DiscogsModel):
                 + f"[SKIPPED] (id:{(document.entity_type, document.entity_id)}): {document.name}"
             )
 
+    @classmethod
+    def bootstrap_pass_three_bulk(cls):
+        # Count relations per entity and role over both relation sides in one
+        # grouped query, self relations only once, and write them in one UPDATE.
+        entity_table = cls._meta.table_name
+        relation_table = cls.relation_class()._meta.table_name
+        sql = f"""
+            UPDATE "{entity_table}"
+            SET relation_counts = counts.relation_counts
+            FROM (
+                SELECT entity_type,
+                    entity_id,
+                    {cls._json_object_agg}(role, role_count) AS relation_counts
+                FROM (
+                    SELECT entity_type, entity_id, role, COUNT(*) AS role_count
+                    FROM (
+                        SELECT entity_one_type AS entity_type,
+                            entity_one_id AS entity_id,
+                            role
+                        FROM "{relation_table}"
+                        UNION ALL
+                        SELECT entity_two_type, entity_two_id, role
+                        FROM "{relation_table}"
+                        WHERE NOT (
+                            entity_one_type = entity_two_type
+                            AND entity_one_id = entity_two_id
+                        )
+                    ) AS sides
+                    GROUP BY entity_type, entity_id, role
+                ) AS role_counts
+                GROUP BY entity_type, entity_id
+            ) AS counts
+            WHERE "{entity_table}".entity_type = counts.entity_type
+                AND "{entity_table}".entity_id = counts.entity_id
+            """
+        with DiscogsModel.atomic():
+            cursor = cls.database().execute_sql(sql)
+        log.debug(f"entity bootstrap pass three - updated {cursor.rowcount} entities")
+
     @classmethod
     def bootstrap_pass_three_single(
         cls,
@@ -478,26 +463,60 @@ class Entity(DiscogsModel):
                         changed = True
         return changed
 
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def role_mask(roles):
+        """
+        Returns a boolean array indexed by role id, set for ``roles``.
+        """
+        mask = numpy.zeros(len(Entity._role_ids), dtype=bool)
+        mask[[Entity._role_ids[_] for _ in roles if _ in Entity._role_ids]] = True
+        return mask
+
+    def role_counts_vector(self):
+        """
+        Returns the role ids and relation counts of the entity as the rows of
+        a two row array, decoded from ``role_counts`` or, for entities
+        without it, built from ``relation_counts`` and ``entities``.
+
+        Structural roles are counted from the entities, as their relations
+        are, and the other roles from the relation counts.
+        """
+        if self.role_counts is not None:
+            vector = numpy.frombuffer(self.role_counts, dtype=numpy.int32)
+            return vector.reshape(2, -1)
+        entities = self.entities or {}
+        counts = {
+            role: count
+            for role, count in (self.relation_counts or {}).items()
+            if role not in self._structural_sections and role in self._role_ids
+        }
+        for role, sections in self._structural_sections.items():
+            count = sum(len(entities[_]) for _ in sections if _ in entities)
+            if count:
+                counts[role] = count
+        items = sorted((self._role_ids[_], count) for _, count in counts.items())
+        return numpy.array(items, dtype=numpy.int32).reshape(-1, 2).T
+
     def roles_to_relation_count(self, roles):
-        count = 0
-        relation_counts = self.relation_counts or {}
-        for role in roles:
-            if role == "Alias":
-                if "aliases" in self.entities:
-                    count += len(self.entities["aliases"])
-            elif role == "Member Of":
-                if "groups" in self.entities:
-                    count += len(self.entities["groups"])
-                if "members" in self.entities:
-                    count += len(self.entities["members"])
-            elif role == "Sublabel Of":
-                if "parent_label" in self.entities:
-                    count += len(self.entities["parent_label"])
-                if "sublabels" in self.entities:
-                    count += len(self.entities["sublabels"])
-            else:
-                count += relation_counts.get(role, 0)
-        return count
+        return int(self.roles_to_relation_counts([self], roles)[0])
+
+    @classmethod
+    def roles_to_relation_counts(cls, entities, roles):
+        """
+        Counts the relations of each of ``entities`` with one of ``roles``,
+        by one masked sum over their concatenated role counts vectors.
+        """
+        vectors = [_.role_counts_vector() for _ in entities]
+        if not vectors:
+            return numpy.zeros(0, dtype=numpy.int64)
+        role_ids, counts = numpy.concatenate(vectors, axis=1)
+        owners = numpy.repeat(numpy.arange(len(vectors)), [_.shape[1] for _ in vectors])
+        selected = cls.role_mask(tuple(roles))[role_ids]
+        counts = numpy.bincount(
+            owners[selected], weights=counts[selected], minlength=len(vectors)
+        )
+        return counts.astype(numpy.int64)
 
     @classmethod
     def search_multi(cls, entity_keys):
@@ -522,6 +541,34 @@ class Entity(DiscogsModel):
         # log.debug(f"            search_multi where_clause: {where_clause}")
         return cls.select().where(where_clause)
 
+    @classmethod
+    def update_role_counts(cls, entity_type: EntityType, entity_ids):
+        """
+        Stores the role counts vectors of the entities, from their relation
+        counts and entities, with one UPDATE ... FROM (VALUES ...) per batch.
+        """
+        query = cls.select(
+            cls.entity_id,
+            cls.relation_counts,
+            cls.entities,
+        ).where(cls.entity_type == entity_type, cls.entity_id.in_(entity_ids))
+        rows = [
+            (entity.entity_id, entity.role_counts_vector().tobytes())
+            for entity in query
+        ]
+        batch_size = DiscogsModel.BULK_INSERT_BATCH_SIZE
+        with DiscogsModel.atomic():
+            for i in range(0, len(rows), batch_size):
+                # Unnamed, as SQLite cannot alias the columns of VALUES, whose
+                # columns are then column1, column2 on every backend.
+                values = peewee.ValuesList(
+                    rows[i : i + batch_size], alias="role_counts_values"
+                )
+                cls.update(role_counts=values.c.column2).from_(values).where(
+                    cls.entity_type == entity_type,
+                    cls.entity_id == values.c.column1,
+                ).execute()
+
     def structural_roles_to_entity_keys(self, roles):
         entity_keys = set()
         if self.entity_type == EntityType.ARTIST:
@@ -629,10 +676,19 @@ class Entity(DiscogsModel):
         # log.debug(f"            structural_roles_to_relations relations: {relations}")
         return relations
 
+    @classmethod
+    def relation_class(cls):
+        entity_class_name = cls.__qualname__
+        entity_module_name = cls.__module__
+        relation_class_name = entity_class_name.replace("Entity", "Relation")
+        relation_module_name = entity_module_name.replace("entity", "relation")
+        return getattr(sys.modules[relation_module_name], relation_class_name)
+
     @classmethod
     def update_corpus(cls, corpus, key):
         # log.debug(f"            corpus before: {corpus}")
-        if key in corpus:
+        if key in corpus or isinstance(corpus, NameCorpus):
+            # A name corpus already holds every entity name.
             return
         entity_type, entity_name = key
         query = cls.select().where(
@@ -0,0 +1,122 @@
+import heapq
+import json
+import logging
+
+import peewee
+
+from discograph import utils
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.database_helper import DatabaseHelper
+from discograph.library.discogs_model import DiscogsModel
+
+log = logging.getLogger(__name__)
+
+
+class PrecomputedNetwork(DiscogsModel):
+    """
+    Network JSON of the most related entities, computed at the end of each
+    bootstrap for the default roles, on desktop and mobile, so get_network
+    can serve them without a search. Keyed by the network cache key.
+
+    Networks are computed into StagedPrecomputedNetwork and replace the
+    stored ones in one transaction, so readers never find the table empty.
+    """
+
+    TASKS_PER_WORKER = 8
+
+    # PEEWEE FIELDS
+
+    cache_key = peewee.TextField(primary_key=True)
+    data = peewee.TextField()
+
+    # PEEWEE META
+
+    class Meta:
+        table_name = "precomputednetwork"
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def get_data(cls, cache_key):
+        data = cls.select(cls.data).where(cls.cache_key == cache_key).scalar()
+        if data is None:
+            return None
+        return json.loads(data)
+
+    @classmethod
+    def precompute(cls, helper, entity_class, count, roles=None):
+        """
+        Replaces the stored networks with those of the ``count`` entities
+        with the most relations, computed on the bootstrap pool, and
+        invalidates the cached ones.
+        """
+        from discograph.library.cache import cache_manager
+
+        roles = roles or DatabaseHelper.DEFAULT_ROLES
+        staged_class = StagedPrecomputedNetwork
+        staged_class.drop_table(True)
+        staged_class.create_table()
+        if count:
+            entity_keys = cls.top_entity_keys(entity_class, count)
+            with BootstrapPool.acquire() as pool:
+                chunk_count = pool.processes * cls.TASKS_PER_WORKER
+                for chunk in utils.split_tuple(chunk_count, entity_keys):
+                    pool.submit(
+                        staged_class.precompute_chunk,
+                        helper,
+                        entity_class,
+                        chunk,
+                        roles,
+                    )
+                stored = sum(pool.wait())
+            log.info(f"precomputed {stored} networks of {len(entity_keys)} entities")
+        cls.create_table(True)
+        fields = cls._meta.sorted_fields
+        with DiscogsModel.atomic():
+            cls.delete().execute()
+            cls.insert_from(
+                staged_class.select(*[getattr(staged_class, _.name) for _ in fields]),
+                fields,
+            ).execute()
+        staged_class.drop_table()
+        cache_manager.invalidate()
+
+    @classmethod
+    def precompute_chunk(cls, helper, entity_class, entity_keys, roles):
+        rows = []
+        for entity in entity_class.search_multi(entity_keys):
+            for on_mobile in (False, True):
+                cache_key = helper.network_cache_key(
+                    entity.entity_type,
+                    entity.entity_id,
+                    on_mobile=on_mobile,
+                    roles=roles,
+                )
+                data = helper.compute_network(entity, on_mobile=on_mobile, roles=roles)
+                rows.append({cls.cache_key: cache_key, cls.data: json.dumps(data)})
+        with DiscogsModel.atomic():
+            cls.insert_many(rows).on_conflict_ignore().execute()
+        return len(rows)
+
+    @staticmethod
+    def top_entity_keys(entity_class, count):
+        query = entity_class.select(
+            entity_class.entity_type,
+            entity_class.entity_id,
+            entity_class.relation_counts,
+        ).where(entity_class.relation_counts.is_null(False))
+        top = heapq.nlargest(
+            count,
+            query.tuples().iterator(),
+            key=lambda row: sum(row[2].values()),
+        )
+        return [(entity_type, entity_id) for entity_type, entity_id, _ in top]
+
+
+class StagedPrecomputedNetwork(PrecomputedNetwork):
+    """
+    Networks being precomputed, until they replace the stored ones.
+    """
+
+    class Meta:
+        table_name = "stagedprecomputednetwork"
@@ -1,16 +1,27 @@
+import functools
 import itertools
 import logging
+import math
 import multiprocessing
+import operator
+import os
 import random
 import re
+import shutil
 import sys
+import tempfile
 
 import peewee
 
+import discograph.database
+from discograph import utils
 from discograph.library import EntityType, CreditRole
+from discograph.library.bootstrap_pool import BootstrapPool
 from discograph.library.bootstrapper import Bootstrapper
-from discograph.library.discogs_model import DiscogsModel, database_proxy
+from discograph.library.discogs_model import DiscogsModel
 from discograph.library.enum_field import EnumField
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.relation_accumulator import RelationAccumulator
 
 log = logging.getLogger(__name__)
 
@@ -18,48 +29,7 @@ log = logging.getLogger(__name__)
 class Relation(DiscogsModel):
     # CLASS VARIABLES
 
-    class BootstrapPassOneWorker(multiprocessing.Process):
-        corpus = {}
-
-        def __init__(self, model_class, indices):
-            super().__init__()
-            self.model_class = model_class
-            self.indices = indices
-
-        def run(self):
-            proc_name = self.name
-            relation_class_name = self.model_class.__qualname__
-            relation_module_name = self.model_class.__module__
-            release_class_name = relation_class_name.replace("Relation", "Release")
-            release_module_name = relation_module_name.replace("relation", "release")
-            release_class = getattr(
-                sys.modules[release_module_name], release_class_name
-            )
-
-            count = 0
-            total_count = len(self.indices)
-
-            from discograph.database import bootstrap_database
-
-            if bootstrap_database:
-                database_proxy.initialize(bootstrap_database)
-            with DiscogsModel.connection_context():
-                for release_id in self.indices:
-                    try:
-                        self.model_class.bootstrap_pass_one_inner(
-                            release_class,
-                            release_id,
-                            self.corpus,
-                            annotation=proc_name,
-                        )
-                        count += 1
-                        if count % 1000 == 0:
-                            log.info(
-                                f"[{proc_name}] processed {count} of {total_count}"
-                            )
-                    except peewee.PeeweeException:
-                        log.exception("Error in BootstrapPassOneWorker")
-            log.info(f"[{proc_name}] processed {count} of {total_count}")
+    TASKS_PER_WORKER = 4
 
     aggregate_roles = (
         "Compiled By",
@@ -71,6 +41,10 @@ class Relation(DiscogsModel):
 
     word_pattern = re.compile(r"\s+")
 
+    # SQL merging an existing row's releases map with the conflicting
+    # EXCLUDED row's map in an upsert, formatted with the table name.
+    _merge_releases_sql: str = None
+
     # PEEWEE FIELDS
     entity_one_type: EnumField
     entity_one_id: peewee.IntegerField
@@ -90,10 +64,9 @@ class Relation(DiscogsModel):
             "entity_two_id",
             "role",
         )
-        # indexes = (
-        #     (('entity_one_type', 'entity_one_id'), False),
-        #     (('entity_two_type', 'entity_two_id'), False),
-        # )
+        # The primary key serves lookups by entity one; this index serves
+        # lookups by entity two.
+        indexes = ((("entity_two_type", "entity_two_id", "role"), False),)
         # indexes = (
         #     ((
         #         'entity_one_type', 'entity_one_id',
@@ -144,60 +117,175 @@ class Relation(DiscogsModel):
     @classmethod
     def bootstrap_pass_one(cls, **kwargs):
         log.debug("relation bootstrap pass one")
+        if (
+            Bootstrapper.relation_shuffle
+            and discograph.database.get_concurrency_count() > 1
+        ):
+            cls.bootstrap_pass_one_shuffled()
+            return
+        release_class = cls.release_class()
+        with BootstrapPool.acquire() as pool:
+            chunks = cls.split_release_ids(pool)
+            log.debug(f"relation bootstrap pass one - {len(chunks)} tasks")
+            for chunk in chunks:
+                pool.submit(cls.accumulate_and_write_relations, release_class, chunk)
+            count = sum(pool.wait())
+        log.debug(f"relation bootstrap pass one - processed {count} releases")
+
+    @classmethod
+    def accumulate_and_write_relations(cls, release_cls, indices, annotation=""):
+        # Collect each relation's releases per task, spilling sorted runs to
+        # disk, then write every relation once with a merging upsert.
+        annotation = annotation or multiprocessing.current_process().name
+        with RelationAccumulator() as accumulator:
+            count = cls.accumulate_relations(
+                release_cls, indices, accumulator, annotation=annotation
+            )
+            cls.write_relations(accumulator.items())
+        return count
+
+    @classmethod
+    def bootstrap_pass_one_shuffled(cls):
+        # Map: tasks turn their releases into relations and route each
+        # relation key to a partition file. Reduce: each partition is owned
+        # by exactly one task, so no two workers write the same relation.
+        # Both are journaled task by task and the partition files are kept
+        # until the reduce is done, so a resumed bootstrap only reruns the
+        # unfinished tasks.
+        release_ids = cls.release_class().get_ids()
+        with BootstrapPool.acquire() as pool:
+            partition_count = pool.processes
+            task_count = partition_count * cls.TASKS_PER_WORKER
+            chunk_size = max(1, math.ceil(len(release_ids) / task_count))
+            bounds = [
+                (release_ids[i], release_ids[min(i + chunk_size, len(release_ids)) - 1])
+                for i in range(0, len(release_ids), chunk_size)
+            ]
+            directory = os.path.join(
+                tempfile.gettempdir(),
+                f"discograph-{cls.__name__.lower()}-shuffle-{partition_count}",
+            )
+            os.makedirs(directory, exist_ok=True)
+            log.debug(f"relation bootstrap pass one - map {len(bounds)} tasks")
+            BootstrapJournal.run_chunks(
+                f"{cls.__name__} pass one map of {partition_count}",
+                cls.map_relations,
+                release_ids,
+                directory,
+                partition_count,
+                chunk_size=chunk_size,
+            )
+            log.debug(f"relation bootstrap pass one - reduce {partition_count} tasks")
+            BootstrapJournal.run_chunks(
+                f"{cls.__name__} pass one reduce of {partition_count}",
+                cls.reduce_relations,
+                list(range(partition_count)),
+                directory,
+                bounds,
+                chunk_size=1,
+            )
+        shutil.rmtree(directory, ignore_errors=True)
+
+    @classmethod
+    def accumulate_relations(cls, release_cls, indices, accumulator, annotation=""):
+        count = 0
+        batch_size = DiscogsModel.BULK_INSERT_BATCH_SIZE
+        for i in range(0, len(indices), batch_size):
+            chunk = indices[i : i + batch_size]
+            query = release_cls.select().where(release_cls.id.in_(chunk))
+            for document in query:
+                for relation in cls.from_release(document):
+                    accumulator.add(relation)
+                count += 1
+            log.info(f"[{annotation}] processed {count} of {len(indices)}")
+        return count
+
+    @classmethod
+    def map_relations(cls, directory, partition_count, release_ids):
+        proc_name = multiprocessing.current_process().name
+        partition_paths = [
+            cls.partition_path(directory, (release_ids[0], release_ids[-1]), _)
+            for _ in range(partition_count)
+        ]
+        with RelationAccumulator() as accumulator:
+            count = cls.accumulate_relations(
+                cls.release_class(), release_ids, accumulator, annotation=proc_name
+            )
+            RelationAccumulator.write_items(accumulator.items(), partition_paths)
+        log.info(f"[{proc_name}] mapped {count} releases")
+
+    @staticmethod
+    def partition_path(directory, bounds, partition):
+        return os.path.join(
+            directory, f"map-{bounds[0]}-{bounds[1]}-partition-{partition}"
+        )
+
+    @classmethod
+    def reduce_relations(cls, directory, bounds, partitions):
+        proc_name = multiprocessing.current_process().name
+        partition_paths = [
+            cls.partition_path(directory, _, partition)
+            for partition in partitions
+            for _ in bounds
+        ]
+        iterators = [RelationAccumulator.read_items(_) for _ in partition_paths]
+        cls.write_relations(RelationAccumulator.merge(iterators))
+        log.info(f"[{proc_name}] reduced {len(partition_paths)} partitions")
+
+    @classmethod
+    def release_class(cls):
         relation_class_name = cls.__qualname__
         relation_module_name = cls.__module__
         release_class_name = relation_class_name.replace("Relation", "Release")
         release_module_name = relation_module_name.replace("relation", "release")
-        release_class = getattr(sys.modules[release_module_name], release_class_name)
-
-        indices = release_class.get_indices()
-        workers = [cls.BootstrapPassOneWorker(cls, _) for _ in indices]
-        log.debug(f"relation bootstrap pass one - start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker.exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
+        return getattr(sys.modules[release_module_name], release_class_name)
+
+    @classmethod
+    def split_release_ids(cls, pool):
+        # Several id ranges per worker, so workers that finish early pick up
+        # the remaining ones instead of idling.
+        release_ids = tuple(cls.release_class().get_ids())
+        task_count = pool.processes * cls.TASKS_PER_WORKER
+        return list(utils.split_tuple(task_count, release_ids))
 
-    # noinspection PyUnusedLocal
     @classmethod
-    def bootstrap_pass_one_inner(cls, release_cls, release_id, corpus, annotation=""):
-        document = None
+    def write_relations(cls, items):
+        rows = RelationAccumulator.to_rows(items)
+        loader = cls.bulk_loader()
+        if loader is not None:
+            with loader:
+                for row in rows:
+                    row["random"] = random.random()
+                    loader.add(row)
+            return
+        batch = []
+        for row in rows:
+            row["random"] = random.random()
+            batch.append(row)
+            if len(batch) >= DiscogsModel.BULK_INSERT_BATCH_SIZE:
+                cls.upsert_relations(batch)
+                batch.clear()
+        if batch:
+            cls.upsert_relations(batch)
+
+    @classmethod
+    def upsert_relations(cls, rows):
+        conflict_target = [
+            cls.entity_one_type,
+            cls.entity_one_id,
+            cls.entity_two_type,
+            cls.entity_two_id,
+            cls.role,
+        ]
         with DiscogsModel.atomic():
-            query = release_cls.select().where(release_cls.id == release_id)
-            if not query.count():
-                return
-            document = query.get()
-
-        relations = cls.from_release(document)
-        if Bootstrapper.is_test:
-            log.debug(
-                f"{cls.__name__.upper()} (Pass 1) [{annotation}]\t"
-                + f"(id:{document.id})\t[{len(relations)}] {document.title}"
-            )
-        for relation in relations:
-            with DiscogsModel.atomic():
-                instance, created = cls.get_or_create(
-                    entity_one_type=relation["entity_one_type"],
-                    entity_one_id=relation["entity_one_id"],
-                    entity_two_type=relation["entity_two_type"],
-                    entity_two_id=relation["entity_two_id"],
-                    role=relation["role"],
-                )
-                if created:
-                    instance.releases = {}
-                    instance.random = random.random()
-                if "release_id" in relation:
-                    release_id = relation["release_id"]
-                    year = relation.get("year")
-                    if not instance.releases:
-                        instance.releases = {}
-                    instance.releases[release_id] = year
-                instance.save()
+            cls.insert_many(rows).on_conflict(
+                conflict_target=conflict_target,
+                update={cls.releases: peewee.SQL(cls.merge_releases_sql())},
+            ).execute()
+
+    @classmethod
+    def merge_releases_sql(cls):
+        return cls._merge_releases_sql.format(table=cls._meta.table_name)
 
     @classmethod
     def from_release(cls, release):
@@ -350,14 +438,18 @@ class Relation(DiscogsModel):
         year=None,
         query_only=False,
     ):
-        where_clause = (cls.entity_one_id == entity_id) & (
+        # One query per direction, so each can use its index. Self relations
+        # are left to the entity one query.
+        entity_one_clause = (cls.entity_one_id == entity_id) & (
             cls.entity_one_type == entity_type
         )
-        where_clause |= (cls.entity_two_id == entity_id) & (
+        entity_two_clause = (cls.entity_two_id == entity_id) & (
             cls.entity_two_type == entity_type
         )
+        entity_two_clause &= ~entity_one_clause
+        where_clauses = [entity_one_clause, entity_two_clause]
         if roles:
-            where_clause &= cls.role.in_(roles)
+            where_clauses = [_ & cls.role.in_(roles) for _ in where_clauses]
         # TODO search by year
         # if year is not None:
         #     year_clause = cls.year.is_null(True)
@@ -366,62 +458,47 @@ class Relation(DiscogsModel):
         #     else:
         #         year_clause |= cls.year.between(year[0], year[1])
         #     where_clause &= year_clause
-        query = cls.select().where(where_clause)
+        query = cls.union_all_query(where_clauses)
         if query_only:
             return query
         return list(query)
 
     @classmethod
     def search_multi(cls, entity_keys, roles=None):
+        relations = {}
+        for relation in cls.search_multi_query(entity_keys, roles=roles):
+            relations[relation.link_key] = relation
+        return relations
+
+    @classmethod
+    def search_multi_query(cls, entity_keys, roles=None):
         assert entity_keys
-        artist_ids, label_ids = [], []
-        # noinspection PyTypeChecker
-        artist_where_clause: peewee.Expression = None
-        # noinspection PyTypeChecker
-        label_where_clause: peewee.Expression = None
-        # noinspection PyTypeChecker
-        where_clause: peewee.Expression = None
+        ids_by_type = {EntityType.ARTIST: [], EntityType.LABEL: []}
         for entity_type, entity_id in entity_keys:
-            if entity_type == EntityType.ARTIST:
-                artist_ids.append(entity_id)
-            elif entity_type == EntityType.LABEL:
-                label_ids.append(entity_id)
-        if artist_ids:
-            artist_where_clause = (
-                (cls.entity_one_type == EntityType.ARTIST)
-                & (cls.entity_one_id.in_(artist_ids))
-            ) | (
-                (cls.entity_two_type == EntityType.ARTIST)
-                & (cls.entity_two_id.in_(artist_ids))
+            if entity_type in ids_by_type:
+                ids_by_type[entity_type].append(entity_id)
+        where_clauses = []
+        for entity_type, entity_ids in ids_by_type.items():
+            if not entity_ids:
+                continue
+            where_clauses.append(
+                (cls.entity_one_type == entity_type)
+                & (cls.entity_one_id.in_(entity_ids))
             )
-        if label_ids:
-            label_where_clause = (
-                (cls.entity_one_type == EntityType.LABEL)
-                & (cls.entity_one_id.in_(label_ids))
-            ) | (
-                (cls.entity_two_type == EntityType.LABEL)
-                & (cls.entity_two_id.in_(label_ids))
+            where_clauses.append(
+                (cls.entity_two_type == entity_type)
+                & (cls.entity_two_id.in_(entity_ids))
             )
-        if artist_ids and label_ids:
-            where_clause = artist_where_clause | label_where_clause
-        elif artist_ids:
-            where_clause = artist_where_clause
-        elif label_ids:
-            where_clause = label_where_clause
         if roles:
-            where_clause &= cls.role.in_(roles)
-        query = cls.select().where(where_clause)
-        relations = {}
-        for relation in query:
-            relations[relation.link_key] = relation
-        return relations
+            where_clauses = [_ & cls.role.in_(roles) for _ in where_clauses]
+        return cls.union_all_query(where_clauses)
 
     # noinspection PyUnusedLocal
     @classmethod
     def search_bimulti(
         cls, lh_entities, rh_entities, roles=None, year=None, verbose=True
     ):
-        def build_query(_lh_type, _lh_ids, _rh_type, _rh_ids):
+        def build_where_clause(_lh_type, _lh_ids, _rh_type, _rh_ids):
             where_clause = cls.entity_one_type == _lh_type
             where_clause &= cls.entity_two_type == _rh_type
             where_clause &= cls.entity_one_id.in_(_lh_ids)
@@ -436,8 +513,7 @@ class Relation(DiscogsModel):
             #     else:
             #         year_clause |= cls.year.between(year[0], year[1])
             #     where_clause &= year_clause
-            _query = cls.select().where(where_clause)
-            return _query
+            return where_clause
 
         lh_artist_ids = []
         lh_label_ids = []
@@ -453,35 +529,30 @@ class Relation(DiscogsModel):
                 rh_artist_ids.append(entity_id)
             else:
                 rh_label_ids.append(entity_id)
-        queries = []
-        if lh_artist_ids:
-            lh_type, lh_ids = 1, lh_artist_ids
-            if rh_artist_ids:
-                rh_type, rh_ids = 1, rh_artist_ids
-                query = build_query(lh_type, lh_ids, rh_type, rh_ids)
-                queries.append(query)
-            if rh_label_ids:
-                rh_type, rh_ids = 2, rh_label_ids
-                query = build_query(lh_type, lh_ids, rh_type, rh_ids)
-                queries.append(query)
-        if lh_label_ids:
-            lh_type, lh_ids = 2, lh_label_ids
-            if rh_artist_ids:
-                rh_type, rh_ids = 1, rh_artist_ids
-                query = build_query(lh_type, lh_ids, rh_type, rh_ids)
-                queries.append(query)
-            if rh_label_ids:
-                rh_type, rh_ids = 2, rh_label_ids
-                query = build_query(lh_type, lh_ids, rh_type, rh_ids)
-                queries.append(query)
-        relations = []
-        for query in queries:
+        where_clauses = []
+        for lh_type, lh_ids in ((1, lh_artist_ids), (2, lh_label_ids)):
+            for rh_type, rh_ids in ((1, rh_artist_ids), (2, rh_label_ids)):
+                if lh_ids and rh_ids:
+                    where_clauses.append(
+                        build_where_clause(lh_type, lh_ids, rh_type, rh_ids)
+                    )
+        relations = {}
+        if where_clauses:
+            query = cls.union_all_query(where_clauses)
             log.debug(f"query: {query}")
-            relations.extend(query)
-        relations = {relation.link_key: relation for relation in relations}
+            relations = {relation.link_key: relation for relation in query}
         log.debug(f"relations: {relations}")
         return relations
 
+    @classmethod
+    def union_all_query(cls, where_clauses):
+        """
+        Combines one select per where clause with UNION ALL, rather than
+        OR-ing the clauses, so each select can use its own index.
+        """
+        queries = [cls.select().where(_) for _ in where_clauses]
+        return functools.reduce(operator.add, queries)
+
     # PUBLIC PROPERTIES
 
     @property
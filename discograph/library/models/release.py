@@ -8,8 +8,11 @@ import discograph.config
 import discograph.database
 import discograph.utils
 from discograph import utils
+from discograph.library.bootstrap_pool import BootstrapPool
 from discograph.library.bootstrapper import Bootstrapper
-from discograph.library.discogs_model import DiscogsModel, database_proxy
+from discograph.library.discogs_model import DiscogsModel
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.name_corpus import NameCorpus
 
 log = logging.getLogger(__name__)
 
@@ -23,34 +26,6 @@ class Release(DiscogsModel):
 
     _tracks_mapping = {}
 
-    class BootstrapPassTwoWorker(multiprocessing.Process):
-        def __init__(self, model_class, indices):
-            super().__init__()
-            self.model_class = model_class
-            self.indices = indices
-
-        def run(self):
-            proc_name = self.name
-            corpus = {}
-            total = len(self.indices)
-            from discograph.database import bootstrap_database
-
-            if bootstrap_database:
-                database_proxy.initialize(bootstrap_database)
-            with DiscogsModel.connection_context():
-                for i, release_id in enumerate(self.indices):
-                    with DiscogsModel.atomic():
-                        progress = float(i) / total
-                        try:
-                            self.model_class.bootstrap_pass_two_single(
-                                release_id=release_id,
-                                annotation=proc_name,
-                                corpus=corpus,
-                                progress=progress,
-                            )
-                        except peewee.PeeweeException:
-                            log.exception("ERROR:", release_id, proc_name)
-
     # PEEWEE FIELDS
     id: peewee.IntegerField
     artists: peewee.Field
@@ -93,11 +68,15 @@ class Release(DiscogsModel):
         )
 
     @classmethod
-    def get_indices(cls):
+    def get_ids(cls):
         query = cls.select(cls.id)
         query = query.order_by(cls.id)
         query = query.tuples()
-        all_ids = tuple(_[0] for _ in query)
+        return [_[0] for _ in query]
+
+    @classmethod
+    def get_indices(cls):
+        all_ids = tuple(cls.get_ids())
         num_chunks = discograph.database.get_concurrency_count()
         return utils.split_tuple(num_chunks, all_ids)
 
@@ -112,21 +91,30 @@ class Release(DiscogsModel):
     @classmethod
     def bootstrap_pass_two(cls, **kwargs):
         log.debug("release bootstrap pass two")
-        indices = cls.get_indices()
-
-        workers = [cls.BootstrapPassTwoWorker(cls, x) for x in indices]
-        log.debug(f"release bootstrap pass two - start {len(workers)} workers")
-        for worker in workers:
-            worker.start()
-        for worker in workers:
-            worker.join()
-            if worker.exitcode > 0:
-                log.debug(f"worker.exitcode: {worker.exitcode}")
-                # raise Exception("Error in worker process")
-        for worker in workers:
-            worker.terminate()
+        stage = f"{cls.__name__} pass two"
+        with NameCorpus.sharing(cls.entity_class(), stage):
+            with BootstrapPool.acquire(fork=True):
+                BootstrapJournal.run_chunks(
+                    stage, cls.bootstrap_pass_two_chunk, cls.get_ids(), stage
+                )
         log.debug("release bootstrap pass two - done")
 
+    @classmethod
+    def bootstrap_pass_two_chunk(cls, corpus_key, release_ids):
+        proc_name = multiprocessing.current_process().name
+        corpus = NameCorpus.shared(cls.entity_class(), corpus_key)
+        for i, release_id in enumerate(release_ids):
+            with DiscogsModel.atomic():
+                try:
+                    cls.bootstrap_pass_two_single(
+                        release_id=release_id,
+                        annotation=proc_name,
+                        corpus=corpus,
+                        progress=float(i) / len(release_ids),
+                    )
+                except peewee.PeeweeException:
+                    log.exception("ERROR:", release_id, proc_name)
+
     @classmethod
     def bootstrap_pass_two_single(
         cls,
@@ -306,6 +294,14 @@ class Release(DiscogsModel):
         # noinspection PyArgumentList
         return cls(**data)
 
+    @classmethod
+    def entity_class(cls):
+        release_class_name = cls.__qualname__
+        release_module_name = cls.__module__
+        entity_class_name = release_class_name.replace("Release", "Entity")
+        entity_module_name = release_module_name.replace("release", "entity")
+        return getattr(sys.modules[entity_module_name], entity_class_name)
+
     def resolve_references(self, corpus, spuriously=False):
         changed = False
         spurious_id = 0
@@ -313,15 +309,7 @@ class Release(DiscogsModel):
             name = entry["name"]
             entity_key = (2, name)
             if not spuriously:
-                release_class_name = self.__class__.__qualname__
-                release_module_name = self.__class__.__module__
-                entity_class_name = release_class_name.replace("Release", "Entity")
-                entity_module_name = release_module_name.replace("release", "entity")
-                entity_class = getattr(
-                    sys.modules[entity_module_name], entity_class_name
-                )
-
-                entity_class.update_corpus(corpus, entity_key)
+                self.entity_class().update_corpus(corpus, entity_key)
             if entity_key in corpus:
                 entry["id"] = corpus[entity_key]
                 changed = True
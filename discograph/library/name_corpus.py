@@ -0,0 +1,107 @@
+import contextlib
+import enum
+import gc
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class NameCorpus(object):
+    """
+    Maps ``(entity_type, name)`` keys to entity ids for every entity.
+
+    Built with one streaming scan of the entities table per pass, in the
+    parent before the pass's bootstrap pool workers fork, so workers share
+    it copy-on-write and resolve references without per-name queries.
+    Drop-in for the ``corpus`` dict used by ``resolve_references``.
+    """
+
+    __slots__ = ("_ids_by_type",)
+
+    # (entity class, key, corpus) built by sharing() or shared() in this
+    # process, or inherited from the parent.
+    _shared = None
+
+    def __init__(self):
+        self._ids_by_type = {}
+
+    # SPECIAL METHODS
+
+    def __contains__(self, key):
+        entity_type, name = key
+        ids = self._ids_by_type.get(self._type_value(entity_type))
+        return ids is not None and name in ids
+
+    def __getitem__(self, key):
+        entity_type, name = key
+        return self._ids_by_type[self._type_value(entity_type)][name]
+
+    def __len__(self):
+        return sum(len(_) for _ in self._ids_by_type.values())
+
+    def __setitem__(self, key, entity_id):
+        entity_type, name = key
+        ids = self._ids_by_type.setdefault(self._type_value(entity_type), {})
+        ids[name] = entity_id
+
+    # PRIVATE METHODS
+
+    @staticmethod
+    def _type_value(entity_type):
+        if isinstance(entity_type, enum.Enum):
+            return entity_type.value
+        return entity_type
+
+    # PUBLIC METHODS
+
+    def add(self, entity_type, name, entity_id):
+        # First (lowest) entity id wins for duplicate names.
+        ids = self._ids_by_type.setdefault(self._type_value(entity_type), {})
+        ids.setdefault(name, entity_id)
+
+    @classmethod
+    def from_entities(cls, entity_class):
+        corpus = cls()
+        query = entity_class.select(
+            entity_class.entity_type,
+            entity_class.name,
+            entity_class.entity_id,
+        )
+        query = query.order_by(entity_class.entity_type, entity_class.entity_id)
+        for entity_type, name, entity_id in query.tuples().iterator():
+            corpus.add(entity_type, name, entity_id)
+        log.debug(f"name corpus: {len(corpus)} names")
+        return corpus
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    @classmethod
+    def shared(cls, entity_class, key):
+        """
+        Returns this process's corpus for ``key``, building it on first use
+        if it was not inherited from the parent.
+        """
+        if cls._shared is None or cls._shared[:2] != (entity_class, key):
+            cls._shared = None
+            cls._shared = (entity_class, key, cls.from_entities(entity_class))
+        return cls._shared[2]
+
+    @classmethod
+    @contextlib.contextmanager
+    def sharing(cls, entity_class, key):
+        """
+        Builds the corpus for ``key`` and keeps it as this process's shared
+        corpus for the block, for workers forked inside it to inherit.
+        """
+        cls._shared = (entity_class, key, cls.from_entities(entity_class))
+        # Keeps the collector from touching, and so copying, the corpus's
+        # pages in the forked workers.
+        gc.freeze()
+        try:
+            yield cls._shared[2]
+        finally:
+            cls._shared = None
+            gc.unfreeze()
@@ -1,8 +1,15 @@
 import logging
 
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.incremental_bootstrapper import IncrementalBootstrapper
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.models.precomputed_network import PrecomputedNetwork
 from discograph.library.postgres.postgres_entity import PostgresEntity
+from discograph.library.postgres.postgres_helper import PostgresHelper
 from discograph.library.postgres.postgres_relation import PostgresRelation
 from discograph.library.postgres.postgres_release import PostgresRelease
+from discograph.library.relation_graph import RelationGraph
 
 log = logging.getLogger(__name__)
 
@@ -11,46 +18,91 @@ class PostgresBootstrapper:
     @classmethod
     def bootstrap_models(cls):
         log.info("bootstrap postgres models")
-        PostgresEntity.drop_table(True)
-        PostgresRelease.drop_table(True)
-        PostgresRelation.drop_table(True)
+        if not Bootstrapper.resume:
+            BootstrapJournal.drop_table(True)
+        BootstrapJournal.create_table(True)
+
+        # One worker pool, and one connection per worker, for all passes.
+        with BootstrapPool.acquire():
+            BootstrapJournal.run_stage("entity pass 1", cls.load_model, PostgresEntity)
+            BootstrapJournal.run_stage(
+                "release pass 1", cls.load_model, PostgresRelease
+            )
+            BootstrapJournal.run_stage(
+                "entity pass 2", PostgresEntity.bootstrap_pass_two
+            )
+            BootstrapJournal.run_stage(
+                "release pass 2", PostgresRelease.bootstrap_pass_two
+            )
+            BootstrapJournal.run_stage(
+                "relation pass 1", cls.load_model, PostgresRelation
+            )
+            BootstrapJournal.run_stage("entity pass 3", cls.count_relations)
+            if Bootstrapper.relation_graph_path:
+                BootstrapJournal.run_stage(
+                    "relation graph",
+                    RelationGraph.build,
+                    PostgresEntity,
+                    PostgresRelation,
+                    Bootstrapper.relation_graph_path,
+                )
+            BootstrapJournal.run_stage(
+                "precomputed networks",
+                PrecomputedNetwork.precompute,
+                PostgresHelper,
+                PostgresEntity,
+                Bootstrapper.precomputed_network_count,
+            )
+            # Every stage is done, so the next bootstrap starts afresh even
+            # with resume on.
+            BootstrapJournal.clear()
 
-        PostgresEntity.create_table(True)
-        PostgresRelease.create_table(True)
-        PostgresRelation.create_table(True)
-
-        log.debug("entity pass 1")
-        PostgresEntity.bootstrap_pass_one()
-
-        log.debug("entity analyze")
-        PostgresEntity.database().execute_sql("VACUUM FULL ANALYZE postgresentity;")
-
-        log.debug("release pass 1")
-        PostgresRelease.bootstrap_pass_one()
+        log.debug("bootstrap done.")
 
-        log.debug("release analyze")
-        PostgresRelease.database().execute_sql("VACUUM FULL ANALYZE postgresrelease;")
+    @classmethod
+    def count_relations(cls):
+        log.debug("relation analyze")
+        cls.vacuum(PostgresEntity, PostgresRelease, PostgresRelation)
 
-        log.debug("entity pass 2")
-        PostgresEntity.bootstrap_pass_two()
+        PostgresEntity.bootstrap_pass_three()
 
-        log.debug("release pass 2")
-        PostgresRelease.bootstrap_pass_two()
+        log.debug("final vacuum analyze")
+        cls.vacuum(PostgresEntity, PostgresRelease, PostgresRelation)
 
-        log.debug("relation pass 1")
-        PostgresRelation.bootstrap_pass_one()
+    @classmethod
+    def load_model(cls, model_class):
+        # Each pass one stage starts from an empty table so it can be rerun,
+        # unless it resumes journaled chunks whose rows are already written.
+        if not BootstrapJournal.has_progress():
+            model_class.drop_table(True)
 
-        log.debug("relation analyze")
-        PostgresEntity.database().execute_sql("VACUUM FULL ANALYZE postgresentity;")
-        PostgresRelease.database().execute_sql("VACUUM FULL ANALYZE postgresrelease;")
-        PostgresRelation.database().execute_sql("VACUUM FULL ANALYZE postgresrelation;")
+        # Indexes are built after the COPY load, not maintained row by row.
+        model_class._schema.create_table(safe=True)
+        model_class.bootstrap_pass_one()
 
-        log.debug("entity pass 3")
-        PostgresEntity.bootstrap_pass_three()
+        log.debug(f"{model_class.__name__} indexes")
+        model_class._schema.create_indexes(safe=True)
 
-        log.debug("final vacuum analyze")
-        PostgresEntity.database().execute_sql("VACUUM FULL ANALYZE postgresentity;")
-        PostgresRelease.database().execute_sql("VACUUM FULL ANALYZE postgresrelease;")
-        PostgresRelation.database().execute_sql("VACUUM FULL ANALYZE postgresrelation;")
+        log.debug(f"{model_class.__name__} analyze")
+        cls.vacuum(model_class)
 
-        log.debug("bootstrap done.")
+    @classmethod
+    def update_models(cls):
+        log.info("incremental bootstrap postgres models")
+        stats = IncrementalBootstrapper(
+            PostgresEntity, PostgresRelease, PostgresRelation
+        )()
+        if Bootstrapper.relation_graph_path:
+            RelationGraph.build(
+                PostgresEntity, PostgresRelation, Bootstrapper.relation_graph_path
+            )
+        PrecomputedNetwork.precompute(
+            PostgresHelper, PostgresEntity, Bootstrapper.precomputed_network_count
+        )
+        return stats
+
+    @staticmethod
+    def vacuum(*model_classes):
+        for model_class in model_classes:
+            table_name = model_class._meta.table_name
+            model_class.database().execute_sql(f"VACUUM FULL ANALYZE {table_name};")
@@ -0,0 +1,196 @@
+import datetime
+import io
+import json
+import logging
+
+import peewee
+from playhouse import postgres_ext
+
+from discograph.library.discogs_model import DiscogsModel
+
+
+log = logging.getLogger(__name__)
+
+
+class PostgresCopyLoader:
+    """
+    Streams rows into a Postgres table with COPY ... FROM STDIN.
+
+    Columns whose values are computed server side (the TSVector search
+    content) and tables that need an ON CONFLICT merge are copied into a
+    temporary staging table first and moved over with one INSERT ... SELECT
+    per batch. The batch is selected in conflict target order, so
+    concurrent loaders upserting overlapping keys take their row locks in
+    the same order instead of deadlocking.
+
+    Extras passed along with rows are handed to on_flush inside the
+    transaction that copies their batch, so bookkeeping rows (like content
+    hashes) commit together with the rows they describe.
+    """
+
+    BATCH_SIZE = 100000
+
+    # INITIALIZER
+
+    def __init__(
+        self,
+        model_class,
+        conflict_target=None,
+        on_conflict=None,
+        batch_size=None,
+        on_flush=None,
+    ):
+        if bool(conflict_target) != bool(on_conflict):
+            raise ValueError("conflict_target and on_conflict go together")
+        self.model_class = model_class
+        self.conflict_target = tuple(conflict_target or ())
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.on_flush = on_flush
+        self.fields = list(model_class._meta.sorted_fields)
+        self.staged_columns = set(
+            field.column_name
+            for field in self.fields
+            if isinstance(field, postgres_ext.TSVectorField)
+        )
+        self.count = 0
+        self._buffer = io.StringIO()
+        self._extras = []
+        self._pending = 0
+        self._has_staging_table = False
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    # PRIVATE METHODS
+
+    @staticmethod
+    def _format_array(values):
+        items = []
+        for value in values:
+            if value is None:
+                items.append("NULL")
+                continue
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            items.append(f'"{value}"')
+        return "{" + ",".join(items) + "}"
+
+    def _format_value(self, field, value):
+        if value is None:
+            return "\\N"
+        if field.column_name in self.staged_columns:
+            if isinstance(value, peewee.Function):
+                value = value.arguments[0]
+        elif isinstance(field, postgres_ext.ArrayField):
+            value = self._format_array(value)
+        elif isinstance(field, postgres_ext.JSONField):
+            value = json.dumps(value)
+        else:
+            value = field.db_value(value)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+        # COPY text format: backslash escapes, tab separated, \N for NULL.
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    def _create_staging_table(self):
+        if self._has_staging_table:
+            return
+        database = self.model_class.database()
+        database.execute_sql(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS "{self.staging_table_name}" '
+            f'(LIKE "{self.table_name}" INCLUDING DEFAULTS);'
+        )
+        for column_name in sorted(self.staged_columns):
+            database.execute_sql(
+                f'ALTER TABLE "{self.staging_table_name}" '
+                f'ALTER COLUMN "{column_name}" TYPE text;'
+            )
+        self._has_staging_table = True
+
+    def _insert_staged_sql(self):
+        columns = ", ".join(f'"{_.column_name}"' for _ in self.fields)
+        expressions = []
+        for field in self.fields:
+            if field.column_name in self.staged_columns:
+                expressions.append(f'to_tsvector("{field.column_name}")')
+            else:
+                expressions.append(f'"{field.column_name}"')
+        sql = (
+            f'INSERT INTO "{self.table_name}" ({columns}) '
+            f'SELECT {", ".join(expressions)} FROM "{self.staging_table_name}"'
+        )
+        if self.on_conflict:
+            target = ", ".join(f'"{_}"' for _ in self.conflict_target)
+            sql += f" ORDER BY {target} ON CONFLICT ({target}) {self.on_conflict}"
+        return sql + ";"
+
+    # PUBLIC METHODS
+
+    def add(self, data, extra=None):
+        values = self.model_class._meta.get_default_dict()
+        values.update(data)
+        row = [
+            self._format_value(field, values.get(field.name)) for field in self.fields
+        ]
+        self._buffer.write("\t".join(row))
+        self._buffer.write("\n")
+        if extra is not None:
+            self._extras.append(extra)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        columns = ", ".join(f'"{_.column_name}"' for _ in self.fields)
+        self._buffer.seek(0)
+        with DiscogsModel.atomic():
+            database = self.model_class.database()
+            if self.uses_staging_table:
+                self._create_staging_table()
+                target = self.staging_table_name
+            else:
+                target = self.table_name
+            cursor = database.cursor()
+            cursor.copy_expert(
+                f'COPY "{target}" ({columns}) FROM STDIN',
+                self._buffer,
+            )
+            if self.uses_staging_table:
+                database.execute_sql(self._insert_staged_sql())
+                database.execute_sql(f'TRUNCATE "{target}";')
+            if self.on_flush is not None and self._extras:
+                self.on_flush(self._extras)
+        self.count += self._pending
+        log.debug(f"COPY {self.table_name}: {self._pending} rows ({self.count} total)")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._extras = []
+        self._pending = 0
+
+    # PUBLIC PROPERTIES
+
+    @property
+    def staging_table_name(self):
+        return f"{self.table_name}_copy"
+
+    @property
+    def table_name(self):
+        return self.model_class._meta.table_name
+
+    @property
+    def uses_staging_table(self):
+        return bool(self.staged_columns or self.on_conflict)
@@ -10,6 +10,7 @@ from unidecode import unidecode
 from discograph.library import EntityType
 from discograph.library.enum_field import EnumField
 from discograph.library.models.entity import Entity
+from discograph.library.postgres.postgres_copy_loader import PostgresCopyLoader
 from discograph.library.postgres.postgres_relation import PostgresRelation
 
 
@@ -17,6 +18,8 @@ log = logging.getLogger(__name__)
 
 
 class PostgresEntity(Entity):
+    _json_object_agg = "jsonb_object_agg"
+
     def __format__(self, format_specification=""):
         return json.dumps(
             model_to_dict(
@@ -24,6 +27,7 @@ class PostgresEntity(Entity):
                 exclude=[
                     PostgresEntity.random,
                     # PostgresEntity.relation_counts,
+                    PostgresEntity.role_counts,
                     PostgresEntity.search_content,
                 ],
             ),
@@ -39,11 +43,16 @@ class PostgresEntity(Entity):
     # name = peewee.TextField(index=False)
     name = peewee.TextField(index=True)
     relation_counts = postgres_ext.BinaryJSONField(null=True, index=False)
+    role_counts = peewee.BlobField(null=True, index=False)
     metadata = postgres_ext.BinaryJSONField(null=True, index=False)
     entities = postgres_ext.BinaryJSONField(null=True, index=False)
     # search_content = postgres_ext.TSVectorField(index=False)
     search_content = postgres_ext.TSVectorField(index=True)
 
+    @classmethod
+    def bulk_loader(cls):
+        return PostgresCopyLoader(cls)
+
     @classmethod
     def search_text(cls, search_string):
         search_string = search_string.lower()
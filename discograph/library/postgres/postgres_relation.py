@@ -6,12 +6,17 @@ from playhouse import postgres_ext
 from discograph.library import EntityType
 from discograph.library.enum_field import EnumField
 from discograph.library.models.relation import Relation
+from discograph.library.postgres.postgres_copy_loader import PostgresCopyLoader
 
 
 log = logging.getLogger(__name__)
 
 
 class PostgresRelation(Relation):
+    _merge_releases_sql = (
+        'COALESCE("{table}"."releases", \'{{}}\'::jsonb) || EXCLUDED."releases"'
+    )
+
     # PEEWEE FIELDS
 
     entity_one_type = EnumField(index=False, choices=EntityType)
@@ -20,3 +25,19 @@ class PostgresRelation(Relation):
     entity_two_id = peewee.IntegerField(index=False)
     role = peewee.CharField(index=False)
     releases = postgres_ext.BinaryJSONField(index=False, null=True)
+
+    @classmethod
+    def bulk_loader(cls):
+        # The same relation shows up in many releases, possibly handled by
+        # different workers, so merge the release maps on conflict.
+        return PostgresCopyLoader(
+            cls,
+            conflict_target=(
+                "entity_one_type",
+                "entity_one_id",
+                "entity_two_type",
+                "entity_two_id",
+                "role",
+            ),
+            on_conflict=f'DO UPDATE SET "releases" = {cls.merge_releases_sql()}',
+        )
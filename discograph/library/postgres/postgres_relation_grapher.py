@@ -1,10 +1,11 @@
 import itertools
 import logging
 
+from discograph.library import EntityType
 from discograph.library.postgres.postgres_entity import PostgresEntity
 from discograph.library.postgres.postgres_relation import PostgresRelation
 from discograph.library.relation_grapher import RelationGrapher
-
+from discograph.library.trellis_node import TrellisNode
 
 log = logging.getLogger(__name__)
 
@@ -23,14 +24,26 @@ class PostgresRelationGrapher(RelationGrapher):
     #     "_structural_roles",
     # )
 
+    NETWORK_FUNCTION = "discograph_network"
+
+    # Set by setup_database from POSTGRES_NETWORK_FUNCTION.
+    network_function = False
+
     # INITIALIZER
 
     def __init__(
-        self, center_entity, degree=3, link_ratio=None, max_nodes=None, roles=None
+        self,
+        center_entity,
+        degree=3,
+        link_ratio=None,
+        max_nodes=None,
+        roles=None,
+        graph=None,
+        page_size=None,
     ):
         assert isinstance(center_entity, PostgresEntity)
         super(PostgresRelationGrapher, self).__init__(
-            center_entity, degree, link_ratio, max_nodes, roles
+            center_entity, degree, link_ratio, max_nodes, roles, graph, page_size
         )
 
     # SPECIAL METHODS
@@ -71,6 +84,13 @@ class PostgresRelationGrapher(RelationGrapher):
             f"        Cross-referenced: {len(self.nodes)} nodes / {len(self.links)} links"
         )
 
+    def _search_database(self, provisional_roles):
+        if not self.network_function:
+            return super(PostgresRelationGrapher, self)._search_database(
+                provisional_roles
+            )
+        return self._search_network_function(provisional_roles)
+
     @staticmethod
     def _search_entities(entity_keys_to_visit):
         log.debug(f"        Retrieving entities keys: {entity_keys_to_visit}")
@@ -86,15 +106,20 @@ class PostgresRelationGrapher(RelationGrapher):
         return entities
 
     def _search_via_relational_roles(self, distance, provisional_roles, relations):
-        for entity_key in sorted(self.entity_keys_to_visit):
-            node = self.nodes.get(entity_key)
-            if not node:
-                continue
-            entity = node.entity
-            relational_count = entity.roles_to_relation_count(provisional_roles)
-            if 0 < distance and self.max_links < relational_count:
-                self.entity_keys_to_visit.remove(entity_key)
-                log.debug(f"            Pre-pruned {entity.name} [{relational_count}]")
+        if 0 < distance:
+            entity_keys = sorted(
+                _ for _ in self.entity_keys_to_visit if _ in self.nodes
+            )
+            entities = [self.nodes[_].entity for _ in entity_keys]
+            relational_counts = PostgresEntity.roles_to_relation_counts(
+                entities, provisional_roles
+            )
+            for entity, relational_count in zip(entities, relational_counts):
+                if self.max_links < relational_count:
+                    self.entity_keys_to_visit.remove(entity.entity_key)
+                    log.debug(
+                        f"            Pre-pruned {entity.name} [{relational_count}]"
+                    )
         if provisional_roles and distance < self.degree:
             log.debug("        Retrieving relational relations")
             keys = sorted(self.entity_keys_to_visit)
@@ -111,3 +136,363 @@ class PostgresRelationGrapher(RelationGrapher):
                         roles=provisional_roles,
                     )
                 )
+
+    def _search_network_function(self, provisional_roles):
+        # The search loop of _search_database, run server side by the network
+        # function in one round trip. Node rows carry the entity columns the
+        # trellis needs.
+        roles_to_prune = list(self.roles_to_prune)
+        if self.center_entity.entity_type == EntityType.ARTIST:
+            roles_to_prune.append("Sublabel Of")
+        cursor = PostgresEntity._meta.database.execute_sql(
+            f"""
+            SELECT network.*,
+                entity.name,
+                entity.entities,
+                entity.relation_counts,
+                entity.role_counts
+            FROM {self.NETWORK_FUNCTION}(
+                %s, %s, %s, %s, %s, %s::text[], %s::text[], %s::text[]
+            ) AS network
+            LEFT JOIN {PostgresEntity._meta.table_name} AS entity
+                ON network.kind = 'node'
+                AND entity.entity_type = network.node_type
+                AND entity.entity_id = network.node_id
+            ORDER BY network.kind, network.hop, network.node_type, network.node_id
+            """,
+            (
+                self.center_entity.entity_type.value,
+                self.center_entity.entity_id,
+                self.degree,
+                self.max_nodes,
+                self.max_links,
+                list(self.structural_roles),
+                list(provisional_roles),
+                roles_to_prune,
+            ),
+        )
+        distance = 0
+        for row in cursor.fetchall():
+            kind, hop, node_type, node_id, *link, name, entities, counts, vector = row
+            if kind == "distance":
+                distance = hop
+            elif kind == "node":
+                entity = PostgresEntity(
+                    entity_type=EntityType(node_type),
+                    entity_id=node_id,
+                    name=name,
+                    entities=entities,
+                    relation_counts=counts,
+                    role_counts=vector,
+                )
+                self.nodes[entity.entity_key] = TrellisNode(entity, hop)
+            else:
+                one_type, one_id, two_type, two_id, role = link
+                relation = self.center_entity.create_relation(
+                    entity_one_type=EntityType(one_type),
+                    entity_one_id=one_id,
+                    entity_two_type=EntityType(two_type),
+                    entity_two_id=two_id,
+                    role=role,
+                )
+                self.links[relation.link_key] = relation
+        log.debug(f"    Network function: {len(self.nodes)} nodes")
+        return distance
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def create_network_function(cls):
+        """
+        Creates or replaces the server-side network search function.
+        """
+        sql = NETWORK_FUNCTION_SQL.format(
+            function=cls.NETWORK_FUNCTION,
+            entity_table=PostgresEntity._meta.table_name,
+            relation_table=PostgresRelation._meta.table_name,
+            artist=EntityType.ARTIST.value,
+            label=EntityType.LABEL.value,
+        )
+        PostgresEntity._meta.database.execute_sql(sql)
+
+
+# One search of RelationGrapher._search_database per call: the frontier,
+# nodes and links are kept in PL/pgSQL arrays, so a call runs no DDL, and
+# the per-hop break, role
+# pruning and pre-pruning rules are the same as the Python loop's. Returns
+# 'node' rows with their distance, 'link' rows and one 'distance' row holding
+# the distance the search stopped at.
+NETWORK_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION {function}(
+    center_type integer,
+    center_id integer,
+    degree integer,
+    max_nodes integer,
+    max_links integer,
+    structural_roles text[],
+    relational_roles text[],
+    roles_to_prune text[]
+)
+RETURNS TABLE (
+    kind text,
+    hop integer,
+    node_type integer,
+    node_id integer,
+    link_one_type integer,
+    link_one_id integer,
+    link_two_type integer,
+    link_two_id integer,
+    link_role text
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    search_distance integer;
+    reached_distance integer := 0;
+    provisional_roles text[] := relational_roles;
+    should_break boolean := false;
+    node_count integer;
+    link_count integer;
+    frontier_types integer[] := ARRAY[center_type];
+    frontier_ids integer[] := ARRAY[center_id];
+    node_types integer[] := '{{}}';
+    node_ids integer[] := '{{}}';
+    node_distances integer[] := '{{}}';
+    link_one_types integer[] := '{{}}';
+    link_one_ids integer[] := '{{}}';
+    link_two_types integer[] := '{{}}';
+    link_two_ids integer[] := '{{}}';
+    link_roles text[] := '{{}}';
+    hop_one_types integer[];
+    hop_one_ids integer[];
+    hop_two_types integer[];
+    hop_two_ids integer[];
+    hop_roles text[];
+BEGIN
+    FOR search_distance IN 0..degree LOOP
+        reached_distance := search_distance;
+
+        -- _process_entities: unnamed entities leave the frontier, entities
+        -- missing from the table stay in it.
+        SELECT COALESCE(array_agg(f.entity_type), '{{}}'),
+            COALESCE(array_agg(f.entity_id), '{{}}')
+        INTO frontier_types, frontier_ids
+        FROM unnest(frontier_types, frontier_ids) AS f (entity_type, entity_id)
+        WHERE NOT EXISTS (
+            SELECT FROM {entity_table} AS e
+            WHERE e.entity_type = f.entity_type
+                AND e.entity_id = f.entity_id
+                AND (e.entity_id = 0 OR COALESCE(e.name, '') = '')
+        );
+        SELECT node_types || COALESCE(array_agg(f.entity_type), '{{}}'),
+            node_ids || COALESCE(array_agg(f.entity_id), '{{}}'),
+            node_distances || COALESCE(array_agg(search_distance), '{{}}')
+        INTO node_types, node_ids, node_distances
+        FROM unnest(frontier_types, frontier_ids) AS f (entity_type, entity_id)
+        JOIN {entity_table} AS e
+            ON e.entity_type = f.entity_type AND e.entity_id = f.entity_id
+        WHERE NOT EXISTS (
+            SELECT FROM unnest(node_types, node_ids) AS n (entity_type, entity_id)
+            WHERE n.entity_type = f.entity_type AND n.entity_id = f.entity_id
+        );
+        IF should_break OR cardinality(frontier_ids) = 0 THEN
+            EXIT;
+        END IF;
+
+        -- _test_loop_one and _prune_roles
+        node_count := cardinality(node_ids);
+        IF search_distance > 0 AND node_count >= max_nodes THEN
+            should_break := true;
+        END IF;
+        IF search_distance > 0 AND node_count > max_nodes / 4.0 THEN
+            provisional_roles := ARRAY(
+                SELECT r FROM unnest(provisional_roles) AS r
+                WHERE r <> ALL(roles_to_prune)
+            );
+        END IF;
+
+        hop_one_types := '{{}}';
+        hop_one_ids := '{{}}';
+        hop_two_types := '{{}}';
+        hop_two_ids := '{{}}';
+        hop_roles := '{{}}';
+        IF NOT should_break THEN
+            -- _search_via_structural_roles: every frontier entity in the
+            -- entity table is a node by now.
+            IF cardinality(structural_roles) > 0 THEN
+                SELECT COALESCE(array_agg(h.entity_one_type), '{{}}'),
+                    COALESCE(array_agg(h.entity_one_id), '{{}}'),
+                    COALESCE(array_agg(h.entity_two_type), '{{}}'),
+                    COALESCE(array_agg(h.entity_two_id), '{{}}'),
+                    COALESCE(array_agg(h.role), '{{}}')
+                INTO hop_one_types, hop_one_ids, hop_two_types, hop_two_ids,
+                    hop_roles
+                FROM (
+                    SELECT DISTINCT s.*
+                    FROM unnest(frontier_types, frontier_ids)
+                        AS f (entity_type, entity_id)
+                    JOIN {entity_table} AS e
+                        ON e.entity_type = f.entity_type
+                        AND e.entity_id = f.entity_id
+                    CROSS JOIN LATERAL (
+                        SELECT e.entity_type,
+                            least(a.value::integer, e.entity_id),
+                            e.entity_type,
+                            greatest(a.value::integer, e.entity_id),
+                            'Alias'
+                        FROM jsonb_each_text(e.entities -> 'aliases') AS a
+                        WHERE e.entity_type = {artist} AND a.value::integer <> 0
+                        UNION ALL
+                        SELECT e.entity_type, e.entity_id,
+                            e.entity_type, g.value::integer, 'Member Of'
+                        FROM jsonb_each_text(e.entities -> 'groups') AS g
+                        WHERE e.entity_type = {artist}
+                        UNION ALL
+                        SELECT e.entity_type, m.value::integer,
+                            e.entity_type, e.entity_id, 'Member Of'
+                        FROM jsonb_each_text(e.entities -> 'members') AS m
+                        WHERE e.entity_type = {artist}
+                        UNION ALL
+                        SELECT e.entity_type, e.entity_id,
+                            e.entity_type, p.value::integer, 'Sublabel Of'
+                        FROM jsonb_each_text(e.entities -> 'parent_label') AS p
+                        WHERE e.entity_type = {label}
+                        UNION ALL
+                        SELECT e.entity_type, l.value::integer,
+                            e.entity_type, e.entity_id, 'Sublabel Of'
+                        FROM jsonb_each_text(e.entities -> 'sublabels') AS l
+                        WHERE e.entity_type = {label}
+                    ) AS s (
+                        entity_one_type, entity_one_id,
+                        entity_two_type, entity_two_id, role
+                    )
+                    WHERE s.role = ANY(structural_roles)
+                        AND s.entity_one_id <> 0
+                        AND s.entity_two_id <> 0
+                ) AS h;
+            END IF;
+
+            -- _search_via_relational_roles
+            IF search_distance > 0 THEN
+                SELECT COALESCE(array_agg(f.entity_type), '{{}}'),
+                    COALESCE(array_agg(f.entity_id), '{{}}')
+                INTO frontier_types, frontier_ids
+                FROM unnest(frontier_types, frontier_ids)
+                    AS f (entity_type, entity_id)
+                WHERE NOT EXISTS (
+                    SELECT FROM {entity_table} AS e
+                    WHERE e.entity_type = f.entity_type
+                        AND e.entity_id = f.entity_id
+                        AND max_links < (
+                            SELECT COALESCE(sum(c.value::integer), 0)
+                            FROM jsonb_each_text(e.relation_counts) AS c
+                            WHERE c.key = ANY(provisional_roles)
+                        )
+                );
+            END IF;
+            IF cardinality(provisional_roles) > 0 AND search_distance < degree THEN
+                SELECT COALESCE(array_agg(h.entity_one_type), '{{}}'),
+                    COALESCE(array_agg(h.entity_one_id), '{{}}'),
+                    COALESCE(array_agg(h.entity_two_type), '{{}}'),
+                    COALESCE(array_agg(h.entity_two_id), '{{}}'),
+                    COALESCE(array_agg(h.role), '{{}}')
+                INTO hop_one_types, hop_one_ids, hop_two_types, hop_two_ids,
+                    hop_roles
+                FROM (
+                    SELECT * FROM unnest(
+                        hop_one_types, hop_one_ids, hop_two_types, hop_two_ids,
+                        hop_roles
+                    )
+                    UNION
+                    SELECT r.entity_one_type, r.entity_one_id,
+                        r.entity_two_type, r.entity_two_id, r.role
+                    FROM {relation_table} AS r
+                    JOIN unnest(frontier_types, frontier_ids)
+                        AS f (entity_type, entity_id)
+                        ON r.entity_one_type = f.entity_type
+                        AND r.entity_one_id = f.entity_id
+                    WHERE r.role = ANY(provisional_roles)
+                    UNION
+                    SELECT r.entity_one_type, r.entity_one_id,
+                        r.entity_two_type, r.entity_two_id, r.role
+                    FROM {relation_table} AS r
+                    JOIN unnest(frontier_types, frontier_ids)
+                        AS f (entity_type, entity_id)
+                        ON r.entity_two_type = f.entity_type
+                        AND r.entity_two_id = f.entity_id
+                    WHERE r.role = ANY(provisional_roles)
+                ) AS h (
+                    entity_one_type, entity_one_id,
+                    entity_two_type, entity_two_id, role
+                );
+            END IF;
+        END IF;
+
+        -- _test_loop_two
+        link_count := cardinality(hop_one_ids);
+        IF link_count = 0
+            OR link_count >= max_links * 3
+            OR (search_distance > 1 AND link_count >= max_links)
+        THEN
+            should_break := true;
+        END IF;
+
+        -- _process_relations: links to the null entity are dropped, the
+        -- rest join the links and their new entities make the next frontier.
+        SELECT COALESCE(array_agg(l.entity_one_type), '{{}}'),
+            COALESCE(array_agg(l.entity_one_id), '{{}}'),
+            COALESCE(array_agg(l.entity_two_type), '{{}}'),
+            COALESCE(array_agg(l.entity_two_id), '{{}}'),
+            COALESCE(array_agg(l.role), '{{}}')
+        INTO hop_one_types, hop_one_ids, hop_two_types, hop_two_ids, hop_roles
+        FROM unnest(
+            hop_one_types, hop_one_ids, hop_two_types, hop_two_ids, hop_roles
+        ) AS l (entity_one_type, entity_one_id, entity_two_type, entity_two_id, role)
+        WHERE l.entity_one_id <> 0 AND l.entity_two_id <> 0;
+        SELECT COALESCE(array_agg(l.entity_one_type), '{{}}'),
+            COALESCE(array_agg(l.entity_one_id), '{{}}'),
+            COALESCE(array_agg(l.entity_two_type), '{{}}'),
+            COALESCE(array_agg(l.entity_two_id), '{{}}'),
+            COALESCE(array_agg(l.role), '{{}}')
+        INTO link_one_types, link_one_ids, link_two_types, link_two_ids,
+            link_roles
+        FROM (
+            SELECT * FROM unnest(
+                link_one_types, link_one_ids, link_two_types, link_two_ids,
+                link_roles
+            )
+            UNION
+            SELECT * FROM unnest(
+                hop_one_types, hop_one_ids, hop_two_types, hop_two_ids, hop_roles
+            )
+        ) AS l (entity_one_type, entity_one_id, entity_two_type, entity_two_id, role);
+        SELECT COALESCE(array_agg(k.entity_type), '{{}}'),
+            COALESCE(array_agg(k.entity_id), '{{}}')
+        INTO frontier_types, frontier_ids
+        FROM (
+            SELECT * FROM unnest(hop_one_types, hop_one_ids)
+            UNION
+            SELECT * FROM unnest(hop_two_types, hop_two_ids)
+        ) AS k (entity_type, entity_id)
+        WHERE NOT EXISTS (
+            SELECT FROM unnest(node_types, node_ids) AS n (entity_type, entity_id)
+            WHERE n.entity_type = k.entity_type AND n.entity_id = k.entity_id
+        );
+    END LOOP;
+
+    RETURN QUERY
+    SELECT 'node', n.distance, n.entity_type, n.entity_id,
+        NULL::integer, NULL::integer, NULL::integer, NULL::integer, NULL::text
+    FROM unnest(node_types, node_ids, node_distances)
+        AS n (entity_type, entity_id, distance)
+    UNION ALL
+    SELECT 'link', NULL::integer, NULL::integer, NULL::integer, l.*
+    FROM unnest(
+        link_one_types, link_one_ids, link_two_types, link_two_ids, link_roles
+    ) AS l
+    UNION ALL
+    SELECT 'distance', reached_distance,
+        NULL, NULL, NULL, NULL, NULL, NULL, NULL;
+END;
+$$;
+"""
@@ -4,6 +4,7 @@ import peewee
 from playhouse import postgres_ext
 
 from discograph.library.models.release import Release
+from discograph.library.postgres.postgres_copy_loader import PostgresCopyLoader
 
 
 log = logging.getLogger(__name__)
@@ -27,3 +28,7 @@ class PostgresRelease(Release):
     styles = postgres_ext.ArrayField(peewee.TextField, null=True, index=False)
     title = peewee.TextField(index=False)
     tracklist = postgres_ext.BinaryJSONField(null=True, index=False)
+
+    @classmethod
+    def bulk_loader(cls):
+        return PostgresCopyLoader(cls)
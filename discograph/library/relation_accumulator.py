@@ -0,0 +1,138 @@
+import heapq
+import logging
+import operator
+import pickle
+import tempfile
+import zlib
+
+log = logging.getLogger(__name__)
+
+
+class RelationAccumulator(object):
+    """
+    Collects relation key -> {release_id: year} maps in memory.
+
+    When the map grows past ``max_entries`` it is written to a temporary file
+    as a sorted run; ``items()`` merges the runs back into one sorted stream
+    with each relation key appearing once.
+    """
+
+    MAX_ENTRIES = 250000
+
+    KEY_FIELDS = (
+        "entity_one_type",
+        "entity_one_id",
+        "entity_two_type",
+        "entity_two_id",
+        "role",
+    )
+
+    # INITIALIZER
+
+    def __init__(self, max_entries=None, directory=None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.directory = directory
+        self.relations = {}
+        self.runs = []
+
+    # SPECIAL METHODS
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.relations)
+
+    # PRIVATE METHODS
+
+    @staticmethod
+    def _iterate_run(run):
+        run.seek(0)
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+    # PUBLIC METHODS
+
+    def add(self, relation):
+        key = tuple(relation[_] for _ in self.KEY_FIELDS)
+        releases = self.relations.setdefault(key, {})
+        if "release_id" in relation:
+            releases[relation["release_id"]] = relation.get("year")
+        if len(self.relations) >= self.max_entries:
+            self.spill()
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs.clear()
+        self.relations.clear()
+
+    def items(self):
+        iterators = [self._iterate_run(_) for _ in self.runs]
+        iterators.append(iter(sorted(self.relations.items())))
+        return self.merge(iterators)
+
+    @staticmethod
+    def merge(iterators):
+        """
+        Merges sorted (key, releases) streams, one entry per relation key.
+        """
+        merged = heapq.merge(*iterators, key=operator.itemgetter(0))
+        current_key, current_releases = None, None
+        for key, releases in merged:
+            if key == current_key:
+                current_releases.update(releases)
+                continue
+            if current_key is not None:
+                yield current_key, current_releases
+            current_key, current_releases = key, releases
+        if current_key is not None:
+            yield current_key, current_releases
+
+    @staticmethod
+    def partition(key, partition_count):
+        # Stable across processes, unlike hash() on strings.
+        data = ":".join(str(getattr(_, "value", _)) for _ in key)
+        return zlib.crc32(data.encode()) % partition_count
+
+    @classmethod
+    def read_items(cls, path):
+        with open(path, "rb") as file_pointer:
+            yield from cls._iterate_run(file_pointer)
+
+    def spill(self):
+        if not self.relations:
+            return
+        run = tempfile.TemporaryFile(dir=self.directory)
+        for item in sorted(self.relations.items()):
+            pickle.dump(item, run, pickle.HIGHEST_PROTOCOL)
+        self.runs.append(run)
+        log.debug(f"spilled {len(self.relations)} relations to run {len(self.runs)}")
+        self.relations.clear()
+
+    @classmethod
+    def to_rows(cls, items):
+        for key, releases in items:
+            row = dict(zip(cls.KEY_FIELDS, key))
+            row["releases"] = releases
+            yield row
+
+    @classmethod
+    def write_items(cls, items, paths):
+        """
+        Routes sorted (key, releases) items to one file per partition.
+        """
+        file_pointers = [open(_, "wb") for _ in paths]
+        try:
+            for item in items:
+                partition = cls.partition(item[0], len(paths))
+                pickle.dump(item, file_pointers[partition], pickle.HIGHEST_PROTOCOL)
+        finally:
+            for file_pointer in file_pointers:
+                file_pointer.close()
@@ -0,0 +1,343 @@
+import itertools
+import json
+import logging
+import os
+
+import numpy
+
+from discograph.library import CreditRole, EntityType
+
+log = logging.getLogger(__name__)
+
+
+class _Columns(object):
+    """
+    Typed numpy columns grown by whole chunks of rows, so building never
+    holds a Python object per row.
+    """
+
+    __slots__ = ("arrays", "size")
+
+    def __init__(self, *dtypes, capacity=1024):
+        self.arrays = [numpy.empty(capacity, dtype=_) for _ in dtypes]
+        self.size = 0
+
+    def extend(self, *columns):
+        count = len(columns[0])
+        end = self.size + count
+        if end > len(self.arrays[0]):
+            capacity = max(end, 2 * len(self.arrays[0]))
+            for i, array in enumerate(self.arrays):
+                grown = numpy.empty(capacity, dtype=array.dtype)
+                grown[: self.size] = array[: self.size]
+                self.arrays[i] = grown
+        for array, column in zip(self.arrays, columns):
+            array[self.size : end] = column
+        self.size = end
+
+    def finish(self):
+        return [_[: self.size] for _ in self.arrays]
+
+
+class RelationGraph(object):
+    """
+    Compressed sparse row adjacency of every relation, for network searches
+    without relation queries.
+
+    Nodes are entity keys encoded as ``entity_type << 32 | entity_id`` and
+    sorted. Node ``i``'s edges are ``offsets[i]:offsets[i + 1]`` of the
+    ``neighbors`` (node indices), ``roles`` (role codes) and ``outgoing``
+    (node ``i`` is entity one) arrays. Relations from the relations table are
+    edges of both their entities. Structural relations (aliases, groups,
+    members, parent labels, sublabels) are edges of the entity listing them
+    only, matching ``Entity.structural_roles_to_relations``.
+
+    The arrays are saved as ``.npy`` files by ``build`` at bootstrap and
+    memory-mapped by ``load``.
+    """
+
+    __slots__ = (
+        "exists",
+        "keys",
+        "neighbors",
+        "offsets",
+        "outgoing",
+        "role_codes",
+        "role_names",
+        "roles",
+    )
+
+    ARRAY_NAMES = ("exists", "keys", "neighbors", "offsets", "outgoing", "roles")
+
+    # Rows read from the database per numpy conversion while building.
+    BUILD_CHUNK_SIZE = 100000
+
+    ROLE_NAMES_FILE = "roles.json"
+
+    # Set by setup_database when a graph is configured.
+    loaded = None
+
+    # INITIALIZER
+
+    def __init__(self, keys, exists, offsets, neighbors, roles, outgoing, role_names):
+        self.keys = keys
+        self.exists = exists
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.roles = roles
+        self.outgoing = outgoing
+        self.role_names = tuple(role_names)
+        self.role_codes = {name: i for i, name in enumerate(self.role_names)}
+
+    # SPECIAL METHODS
+
+    def __len__(self):
+        return len(self.keys)
+
+    # PRIVATE METHODS
+
+    @classmethod
+    def _chunks(cls, query):
+        rows = query.tuples().iterator()
+        return iter(lambda: list(itertools.islice(rows, cls.BUILD_CHUNK_SIZE)), [])
+
+    @staticmethod
+    def _structural_edges(entity_type, entity_id, entities):
+        # (entity one id, entity two id, role) per structural relation.
+        entities = entities or {}
+        if entity_type == EntityType.ARTIST:
+            for alias_id in entities.get("aliases", {}).values():
+                if alias_id:
+                    ids = sorted((alias_id, entity_id))
+                    yield ids[0], ids[1], "Alias"
+            for group_id in entities.get("groups", {}).values():
+                if group_id:
+                    yield entity_id, group_id, "Member Of"
+            for member_id in entities.get("members", {}).values():
+                if member_id:
+                    yield member_id, entity_id, "Member Of"
+        elif entity_type == EntityType.LABEL:
+            for parent_id in entities.get("parent_label", {}).values():
+                if parent_id:
+                    yield entity_id, parent_id, "Sublabel Of"
+            for sublabel_id in entities.get("sublabels", {}).values():
+                if sublabel_id:
+                    yield sublabel_id, entity_id, "Sublabel Of"
+
+    # PUBLIC METHODS
+
+    @classmethod
+    def build(cls, entity_class, relation_class, path):
+        """
+        Builds the graph from the entities and relations tables into the
+        directory ``path``.
+        """
+        role_names = sorted(CreditRole.all_credit_roles)
+        role_codes = {name: i for i, name in enumerate(role_names)}
+
+        def role_code(role):
+            if role not in role_codes:
+                role_codes[role] = len(role_names)
+                role_names.append(role)
+            return role_codes[role]
+
+        # (source key, other key, role code, source is entity one)
+        edges = _Columns(numpy.int64, numpy.int64, numpy.int16, bool)
+        entity_keys = _Columns(numpy.int64)
+        query = entity_class.select(
+            entity_class.entity_type,
+            entity_class.entity_id,
+            entity_class.name,
+            entity_class.entities,
+        )
+        for chunk in cls._chunks(query):
+            keys, structural_edges = [], []
+            for entity_type, entity_id, name, entities in chunk:
+                entity_key = cls.encode(entity_type, entity_id)
+                if entity_id and name:
+                    keys.append(entity_key)
+                for entity_one_id, entity_two_id, role in cls._structural_edges(
+                    entity_type, entity_id, entities
+                ):
+                    is_one = entity_one_id == entity_id
+                    other_id = entity_two_id if is_one else entity_one_id
+                    structural_edges.append(
+                        (
+                            entity_key,
+                            cls.encode(entity_type, other_id),
+                            role_code(role),
+                            is_one,
+                        )
+                    )
+            entity_keys.extend(keys)
+            if structural_edges:
+                edges.extend(*zip(*structural_edges))
+        query = relation_class.select(
+            relation_class.entity_one_type,
+            relation_class.entity_one_id,
+            relation_class.entity_two_type,
+            relation_class.entity_two_id,
+            relation_class.role,
+        )
+        for chunk in cls._chunks(query):
+            (
+                entity_one_types,
+                entity_one_ids,
+                entity_two_types,
+                entity_two_ids,
+                names,
+            ) = zip(*chunk)
+            del chunk
+            entity_one_keys = cls.encode_all(entity_one_types, entity_one_ids)
+            entity_two_keys = cls.encode_all(entity_two_types, entity_two_ids)
+            codes = numpy.array([role_code(_) for _ in names], dtype=numpy.int16)
+            # Both entities' edges, in row order, except for self relations.
+            both = entity_one_keys != entity_two_keys
+            order = numpy.argsort(
+                numpy.concatenate(
+                    [
+                        numpy.arange(len(codes)) * 2,
+                        numpy.flatnonzero(both) * 2 + 1,
+                    ]
+                ),
+                kind="stable",
+            )
+            edges.extend(
+                numpy.concatenate([entity_one_keys, entity_two_keys[both]])[order],
+                numpy.concatenate([entity_two_keys, entity_one_keys[both]])[order],
+                numpy.concatenate([codes, codes[both]])[order],
+                numpy.concatenate(
+                    [
+                        numpy.ones(len(codes), dtype=bool),
+                        numpy.zeros(int(both.sum()), dtype=bool),
+                    ]
+                )[order],
+            )
+
+        sources, others, roles, outgoing = edges.finish()
+        (entity_keys,) = entity_keys.finish()
+        keys = numpy.unique(numpy.concatenate([entity_keys, sources, others]))
+        source_indices = numpy.searchsorted(keys, sources)
+        order = numpy.argsort(source_indices, kind="stable")
+        counts = numpy.bincount(source_indices, minlength=len(keys))
+        offsets = numpy.zeros(len(keys) + 1, dtype=numpy.int64)
+        numpy.cumsum(counts, out=offsets[1:])
+        arrays = dict(
+            exists=numpy.isin(keys, entity_keys),
+            keys=keys,
+            neighbors=numpy.searchsorted(keys, others)[order].astype(numpy.int32),
+            offsets=offsets,
+            outgoing=outgoing[order],
+            roles=roles[order],
+        )
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            temporary_path = os.path.join(path, f"{name}.tmp.npy")
+            numpy.save(temporary_path, array)
+            os.replace(temporary_path, os.path.join(path, f"{name}.npy"))
+        with open(os.path.join(path, cls.ROLE_NAMES_FILE), "w") as file_pointer:
+            json.dump(role_names, file_pointer)
+        log.info(f"relation graph: {len(keys)} nodes, {len(sources)} edges in {path}")
+        return cls(role_names=role_names, **arrays)
+
+    @staticmethod
+    def decode(key):
+        key = int(key)
+        return EntityType(key >> 32), key & 0xFFFFFFFF
+
+    @staticmethod
+    def encode(entity_type, entity_id):
+        entity_type = getattr(entity_type, "value", entity_type)
+        return (entity_type << 32) | (entity_id or 0)
+
+    @staticmethod
+    def encode_all(entity_types, entity_ids):
+        entity_types = numpy.array(
+            [getattr(_, "value", _) for _ in entity_types], dtype=numpy.int64
+        )
+        entity_ids = numpy.array([_ or 0 for _ in entity_ids], dtype=numpy.int64)
+        return (entity_types << 32) | entity_ids
+
+    def edges(self, index, roles):
+        """
+        Returns ``(entity_one_key, entity_two_key, role)`` of the node's
+        relations with one of ``roles``.
+        """
+        entity_one, entity_two, roles = self.expand([index], self.role_mask(roles))
+        return [
+            (
+                self.decode(self.keys[one]),
+                self.decode(self.keys[two]),
+                self.role_names[role],
+            )
+            for one, two, role in zip(entity_one, entity_two, roles)
+        ]
+
+    def expand(self, indices, role_mask):
+        """
+        Returns the entity one, entity two and role code arrays of every
+        relation of the ``indices`` nodes whose role is set in ``role_mask``.
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        positions, owners = self.positions(indices)
+        selected = role_mask[self.roles[positions]]
+        positions, sources = positions[selected], indices[owners[selected]]
+        neighbors = self.neighbors[positions]
+        outgoing = self.outgoing[positions]
+        entity_one = numpy.where(outgoing, sources, neighbors)
+        entity_two = numpy.where(outgoing, neighbors, sources)
+        return entity_one, entity_two, self.roles[positions]
+
+    def index(self, entity_key):
+        """
+        Returns the node index of an ``(entity_type, entity_id)`` key, or -1.
+        """
+        key = self.encode(*entity_key)
+        index = int(numpy.searchsorted(self.keys, key))
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return -1
+
+    @classmethod
+    def load(cls, path):
+        arrays = {
+            name: numpy.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in cls.ARRAY_NAMES
+        }
+        with open(os.path.join(path, cls.ROLE_NAMES_FILE)) as file_pointer:
+            role_names = json.load(file_pointer)
+        log.info(f"relation graph: loaded {len(arrays['keys'])} nodes from {path}")
+        return cls(role_names=role_names, **arrays)
+
+    def positions(self, indices):
+        """
+        Returns the edge positions of the ``indices`` nodes and, for each
+        position, the offset in ``indices`` of the node it belongs to.
+        """
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        ends = numpy.cumsum(lengths)
+        positions = numpy.arange(int(ends[-1]) if len(ends) else 0)
+        positions += numpy.repeat(starts - ends + lengths, lengths)
+        return positions, numpy.repeat(numpy.arange(len(indices)), lengths)
+
+    def relation_count(self, index, roles):
+        return int(self.relation_counts([index], self.role_mask(roles))[0])
+
+    def relation_counts(self, indices, role_mask):
+        """
+        Counts the relations of each of the ``indices`` nodes whose role is
+        set in ``role_mask``.
+        """
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        positions, owners = self.positions(indices)
+        selected = role_mask[self.roles[positions]]
+        return numpy.bincount(owners[selected], minlength=len(indices))
+
+    def role_mask(self, roles):
+        """
+        Returns a boolean array indexed by role code, set for ``roles``.
+        """
+        mask = numpy.zeros(len(self.role_names), dtype=bool)
+        mask[[self.role_codes[_] for _ in roles if _ in self.role_codes]] = True
+        return mask
@@ -1,9 +1,13 @@
 import collections
 import collections.abc as collections_abc
+import itertools
 import logging
+import math
 import re
 from abc import abstractmethod, ABC
 
+import numpy
+
 from discograph.library import CreditRole, EntityType
 from discograph.library.database_helper import DatabaseHelper
 from discograph.library.trellis_node import TrellisNode
@@ -19,10 +23,12 @@ class RelationGrapher(ABC):
         "_center_entity",
         "_degree",
         "_entity_keys_to_visit",
+        "_graph",
         "_link_ratio",
         "_links",
         "_max_nodes",
         "_nodes",
+        "_page_size",
         "_relational_roles",
         "_structural_roles",
     )
@@ -47,6 +53,8 @@ class RelationGrapher(ABC):
         link_ratio=None,
         max_nodes=None,
         roles=None,
+        graph=None,
+        page_size=None,
     ):
         log.debug(f"RelationGrapher for {center_entity.name}")
         self._center_entity = center_entity
@@ -59,6 +67,12 @@ class RelationGrapher(ABC):
         else:
             max_nodes = DatabaseHelper.MAX_NODES
         self._max_nodes = max_nodes
+        if page_size is not None:
+            page_size = int(page_size)
+            assert page_size > 0
+        else:
+            page_size = max_nodes
+        self._page_size = page_size
         if link_ratio is not None:
             link_ratio = int(link_ratio)
             assert link_ratio > 0
@@ -85,6 +99,7 @@ class RelationGrapher(ABC):
         self._links = {}
         self._should_break_loop = False
         self._entity_keys_to_visit = set()
+        self._graph = graph
 
     def __call__(self):
         log.debug(f"Searching around {self.center_entity.name}...")
@@ -92,36 +107,21 @@ class RelationGrapher(ABC):
         self._report_search_start()
         self._clear()
         self.entity_keys_to_visit.add(self.center_entity.entity_key)
-        distance = 0
-        for distance in range(self.degree + 1):
-            self._report_search_loop_start(distance)
-            log.debug(f"    Search for: {self.entity_keys_to_visit}")
-            entities = self._search_entities(self.entity_keys_to_visit)
-            # log.debug(f"    Search found entities: {entities}")
-            relations = {}
-            self._process_entities(distance, entities)
-            if not self.entity_keys_to_visit or self.should_break_loop:
-                break
-            self._test_loop_one(distance)
-            self._prune_roles(distance, provisional_roles)
-            if not self.should_break_loop:
-                self._search_via_structural_roles(
-                    distance, provisional_roles, relations
-                )
-                self._search_via_relational_roles(
-                    distance, provisional_roles, relations
-                )
-            self._test_loop_two(distance, relations)
-            self.entity_keys_to_visit.clear()
-            self._process_relations(relations)
+        if self.graph is not None:
+            distance = self._search_graph(provisional_roles)
+        else:
+            distance = self._search_database(provisional_roles)
         self._build_trellis()
         # self._cross_reference(distance)
         pages = self._partition_trellis(distance)
         self._page_entities(pages)
         self._find_clusters()
-        for node in self.nodes.values():
-            expected_count = node.entity.roles_to_relation_count(self.all_roles)
-            node.missing = expected_count - len(node.links)
+        nodes = list(self.nodes.values())
+        expected_counts = type(self.center_entity).roles_to_relation_counts(
+            [_.entity for _ in nodes], self.all_roles
+        )
+        for node, expected_count in zip(nodes, expected_counts):
+            node.missing = int(expected_count) - len(node.links)
         # log.debug(f"self.links: {self.links}")
         # log.debug(f"self.nodes: {self.nodes}")
         json_links = tuple(
@@ -155,28 +155,55 @@ class RelationGrapher(ABC):
     # PRIVATE METHODS
 
     def _find_clusters(self):
-        cluster_count = 0
-        cluster_map = {}
-        for node in sorted(
-            self.nodes.values(),
-            key=lambda x: len(x.entity.entities.get("aliases", {})),
-            reverse=True,
-        ):
-            entity = node.entity
-            aliases = entity.entities.get("aliases", {})
-            if not aliases:
+        """
+        Clusters the nodes joined by alias links, with a union-find over node
+        positions. Nodes whose aliases are all outside the network are
+        clusters of their own.
+
+        Clusters are numbered from 1 in order of their smallest entity key,
+        so their ids do not depend on the order of links or aliases.
+        """
+        nodes = list(self.nodes.values())
+        positions = {node.entity_key: i for i, node in enumerate(nodes)}
+        roots = list(range(len(nodes)))
+        sizes = [1] * len(nodes)
+        clustered = [bool(_.entity.entities.get("aliases")) for _ in nodes]
+
+        def find(position):
+            while roots[position] != position:
+                roots[position] = roots[roots[position]]
+                position = roots[position]
+            return position
+
+        for link in self.links.values():
+            if link.role != "Alias":
+                continue
+            one = positions[link.entity_one_key]
+            two = positions[link.entity_two_key]
+            clustered[one] = clustered[two] = True
+            one, two = find(one), find(two)
+            if one == two:
                 continue
-            if entity.entity_id not in cluster_map:
-                cluster_count += 1
-                cluster_map[entity.entity_id] = cluster_count
-                for _, alias_id in aliases.items():
-                    cluster_map[alias_id] = cluster_count
-            cluster = cluster_map[entity.entity_id]
-            if cluster is not None:
-                node.cluster = cluster
-        # import pprint
-        #
-        # log.debug(pprint.pformat(cluster_map))
+            if sizes[one] < sizes[two]:
+                one, two = two, one
+            roots[two] = one
+            sizes[one] += sizes[two]
+        first_keys = {}
+        for position, node in enumerate(nodes):
+            if not clustered[position]:
+                continue
+            root = find(position)
+            if root not in first_keys or node.entity_key < first_keys[root]:
+                first_keys[root] = node.entity_key
+        clusters = {
+            root: cluster
+            for cluster, root in enumerate(
+                sorted(first_keys, key=first_keys.__getitem__), 1
+            )
+        }
+        for position, node in enumerate(nodes):
+            if clustered[position]:
+                node.cluster = clusters[find(position)]
 
     @staticmethod
     def _page_naively(pages, trellis_nodes_by_distance):
@@ -242,9 +269,12 @@ class RelationGrapher(ABC):
             elif target_node.distance < source_node.distance:
                 target_node.children.add(source_node)
                 source_node.parents.add(target_node)
-        self._recurse_trellis(self.nodes[self.center_entity.entity_key])
+        trellis_nodes = self._index_trellis(
+            list(self.nodes.values()),
+            self.nodes[self.center_entity.entity_key],
+        )
         for node_key, node in tuple(self.nodes.items()):
-            if node.subgraph_size is None:
+            if node not in trellis_nodes:
                 self.nodes.pop(node_key)
         for link_key, relation in tuple(self.links.items()):
             if (
@@ -257,11 +287,57 @@ class RelationGrapher(ABC):
             f"    Built trellis: {len(self.nodes)} nodes / {len(self.links)} links"
         )
 
+    @staticmethod
+    def _index_trellis(trellis_nodes, center_node):
+        """
+        Numbers the trellis nodes, then sizes the subgraph of each node
+        reachable from the center node and sets its parentage. Returns the
+        set of reachable nodes.
+
+        Subgraphs are integer bitsets over node numbers, each built once from
+        its children's by an iterative post-order traversal and dropped once
+        every parent has used it, so shared subgraphs are not walked again
+        and deep trellises do not recurse. Parentages are built once each in
+        reverse post-order from the parents' parentages.
+        """
+        for index, trellis_node in enumerate(trellis_nodes):
+            trellis_node.index = index
+        subgraphs = [0] * len(trellis_nodes)
+        pending_parents = [len(_.parents) for _ in trellis_nodes]
+        # 1 once a node's children are stacked, 2 once it is sized.
+        states = bytearray(len(trellis_nodes))
+        post_order = []
+        stack = [center_node]
+        while stack:
+            trellis_node = stack[-1]
+            index = trellis_node.index
+            if not states[index]:
+                states[index] = 1
+                stack.extend(_ for _ in trellis_node.children if not states[_.index])
+                continue
+            stack.pop()
+            if states[index] == 2:
+                continue
+            states[index] = 2
+            subgraph = 1 << index
+            for child in trellis_node.children:
+                subgraph |= subgraphs[child.index]
+                pending_parents[child.index] -= 1
+                if not pending_parents[child.index]:
+                    subgraphs[child.index] = 0
+            subgraphs[index] = subgraph
+            trellis_node.subgraph_size = subgraph.bit_count()
+            post_order.append(trellis_node)
+        for trellis_node in reversed(post_order):
+            trellis_node.parentage = frozenset([trellis_node]).union(
+                *(_.parentage for _ in trellis_node.parents if _.parentage)
+            )
+        return set(post_order)
+
     def _partition_trellis(self, distance):
-        page_count = 1
-        # TODO was math.ceil(float(len(self.nodes)) / self.max_nodes)
+        page_count = max(1, math.ceil(len(self.nodes) / self.page_size))
         log.debug(f"    Partitioning trellis into {page_count} pages...")
-        log.debug(f"        Maximum: {self.max_nodes} nodes / {self.max_links} links")
+        log.debug(f"        Maximum: {self.page_size} nodes per page")
         pages = [set() for _ in range(page_count)]
         trellis_nodes_by_distance = self._group_trellis(self.nodes)
         threshold = len(self.nodes) / len(pages) / len(trellis_nodes_by_distance)
@@ -270,7 +346,6 @@ class RelationGrapher(ABC):
             threshold,
         )
         self._page_by_local_neighborhood(pages, trellis_nodes_by_distance)
-        # TODO: Add fast path when node count is very high (e.g. 4000+)
         if distance > 1:
             self._page_at_winning_distance(
                 pages, trellis_nodes_by_distance, winning_distance
@@ -285,16 +360,9 @@ class RelationGrapher(ABC):
     @staticmethod
     def _page_at_winning_distance(pages, trellis_nodes_by_distance, winning_distance):
         log.debug("        Paging at winning distance...")
-        while trellis_nodes_by_distance[winning_distance]:
-            trellis_node = trellis_nodes_by_distance[winning_distance].pop(0)
-            parentage = trellis_node.get_parentage()
-            pages.sort(
-                key=lambda page: (
-                    len(page.difference(parentage)),
-                    len(page),
-                ),
-            )
-            pages[0].update(parentage)
+        trellis_nodes = trellis_nodes_by_distance[winning_distance]
+        RelationGrapher._page_greedily(pages, trellis_nodes)
+        trellis_nodes[:] = []
 
     # noinspection PyUnusedLocal
     def _page_by_local_neighborhood(
@@ -308,24 +376,59 @@ class RelationGrapher(ABC):
                 trellis_nodes[:] = []
         log.debug(f"        Paging by local neighborhood: {len(local_neighborhood)}")
         for trellis_node in local_neighborhood:
-            parentage = trellis_node.get_parentage()
+            parentage = trellis_node.parentage
             for page in pages:
                 page.update(parentage)
 
     @staticmethod
     def _page_by_distance(pages, trellis_nodes_by_distance):
         log.debug("        Paging by distance...")
-        for distance in sorted(trellis_nodes_by_distance):
-            while trellis_nodes_by_distance[distance]:
-                trellis_node = trellis_nodes_by_distance[distance].pop(0)
-                parentage = trellis_node.get_parentage()
-                pages.sort(
-                    key=lambda page: (
-                        len(page.difference(parentage)),
-                        len(page),
-                    ),
-                )
-                pages[0].update(parentage)
+        distances = sorted(trellis_nodes_by_distance)
+        RelationGrapher._page_greedily(
+            pages,
+            itertools.chain.from_iterable(
+                trellis_nodes_by_distance[_] for _ in distances
+            ),
+        )
+        for distance in distances:
+            trellis_nodes_by_distance[distance] = []
+
+    @staticmethod
+    def _page_greedily(pages, trellis_nodes):
+        """
+        Adds the parentage of each trellis node, in order, to the page with
+        the fewest nodes outside of it, then to the smallest such page, then
+        to the first. There must be at least one page.
+
+        Page membership is kept as a boolean matrix indexed by node and page,
+        so each page's nodes outside a parentage are counted by one
+        vectorized sum over the parentage's rows rather than by diffing every
+        page.
+        """
+        if len(pages) == 1:
+            for trellis_node in trellis_nodes:
+                pages[0].update(trellis_node.parentage)
+            return
+        parentages = [_.parentage for _ in trellis_nodes]
+        nodes = set().union(*pages, *parentages)
+        node_indices = {node: i for i, node in enumerate(nodes)}
+        membership = numpy.zeros((len(nodes), len(pages)), dtype=bool)
+        for page_index, page in enumerate(pages):
+            membership[[node_indices[_] for _ in page], page_index] = True
+        sizes = numpy.array([len(_) for _ in pages], dtype=numpy.int64)
+        for parentage in parentages:
+            rows = numpy.fromiter(
+                map(node_indices.__getitem__, parentage),
+                dtype=numpy.int64,
+                count=len(parentage),
+            )
+            costs = sizes - membership[rows].sum(axis=0)
+            page_index = int(numpy.argmin(costs * (len(nodes) + 1) + sizes))
+            added = rows[~membership[rows, page_index]]
+            if len(added):
+                membership[added, page_index] = True
+                sizes[page_index] += len(added)
+                pages[page_index].update(parentage)
 
     @staticmethod
     def _find_trellis_distance(trellis_nodes_by_distance, threshold):
@@ -402,15 +505,6 @@ class RelationGrapher(ABC):
             self.links[link_key] = relation
         # log.debug(f"        entity_keys_to_visit: {self.entity_keys_to_visit}")
 
-    def _recurse_trellis(self, node):
-        # noinspection PySetFunctionToLiteral
-        traversed_keys = set([node.entity_key])
-        for child in node.children:
-            traversed_keys.update(self._recurse_trellis(child))
-        node.subgraph_size = len(traversed_keys)
-        # log.debug(f"{'    ' * node.distance}{node.entity.name}: {node.subgraph_size}")
-        return traversed_keys
-
     def _report_search_loop_start(self, distance):
         to_visit_count = len(self.entity_keys_to_visit)
         log.debug(f"    At distance {distance}:")
@@ -423,6 +517,109 @@ class RelationGrapher(ABC):
         log.debug(f"    Max links: {self.max_links}")
         log.debug(f"    Roles: {self.all_roles}")
 
+    def _search_database(self, provisional_roles):
+        distance = 0
+        for distance in range(self.degree + 1):
+            self._report_search_loop_start(distance)
+            log.debug(f"    Search for: {self.entity_keys_to_visit}")
+            entities = self._search_entities(self.entity_keys_to_visit)
+            # log.debug(f"    Search found entities: {entities}")
+            relations = {}
+            self._process_entities(distance, entities)
+            if not self.entity_keys_to_visit or self.should_break_loop:
+                break
+            self._test_loop_one(distance)
+            self._prune_roles(distance, provisional_roles)
+            if not self.should_break_loop:
+                self._search_via_structural_roles(
+                    distance, provisional_roles, relations
+                )
+                self._search_via_relational_roles(
+                    distance, provisional_roles, relations
+                )
+            self._test_loop_two(distance, relations)
+            self.entity_keys_to_visit.clear()
+            self._process_relations(relations)
+        return distance
+
+    def _search_graph(self, provisional_roles):
+        # The same search as _search_database, with each hop's expansion,
+        # dedup and pre-pruning done as array operations on the in-memory
+        # graph. The frontier and visited nodes are node index arrays and the
+        # role filters boolean masks over role codes. Nodes are placeholders
+        # until the entities of the final node set are fetched in one go.
+        graph = self.graph
+        center_index = graph.index(self.center_entity.entity_key)
+        if center_index < 0:
+            log.debug("    Center missing from relation graph")
+            return self._search_database(provisional_roles)
+        structural_mask = graph.role_mask(self.structural_roles)
+        frontier = numpy.array([center_index], dtype=numpy.int64)
+        visited = numpy.empty(0, dtype=numpy.int64)
+        distances = numpy.empty(0, dtype=numpy.int64)
+        distance = 0
+        for distance in range(self.degree + 1):
+            log.debug(f"    At distance {distance}:")
+            log.debug(f"        {len(self.nodes)} old nodes")
+            log.debug(f"        {len(self.links)} old links")
+            log.debug(f"        {len(frontier)} new nodes")
+            relations = {}
+            found = frontier[graph.exists[frontier]]
+            found = found[~numpy.isin(found, visited)]
+            visited = numpy.concatenate([visited, found])
+            distances = numpy.concatenate([distances, numpy.full(len(found), distance)])
+            self.nodes.update(dict.fromkeys(map(graph.decode, graph.keys[found])))
+            if not len(frontier) or self.should_break_loop:
+                break
+            self._test_loop_one(distance)
+            self._prune_roles(distance, provisional_roles)
+            if not self.should_break_loop:
+                found = frontier[numpy.isin(frontier, visited)]
+                edges = [graph.expand(found, structural_mask)]
+                relational_mask = graph.role_mask(provisional_roles)
+                if 0 < distance:
+                    counts = graph.relation_counts(found, relational_mask)
+                    pruned = found[self.max_links < counts]
+                    frontier = frontier[~numpy.isin(frontier, pruned)]
+                    if len(pruned):
+                        log.debug(f"            Pre-pruned {len(pruned)} nodes")
+                if provisional_roles and distance < self.degree:
+                    edges.append(graph.expand(frontier, relational_mask))
+                edges = numpy.unique(numpy.concatenate(edges, axis=1), axis=1)
+                for entity_one, entity_two, role in edges.T.tolist():
+                    entity_one_type, entity_one_id = graph.decode(
+                        graph.keys[entity_one]
+                    )
+                    entity_two_type, entity_two_id = graph.decode(
+                        graph.keys[entity_two]
+                    )
+                    relation = self.center_entity.create_relation(
+                        entity_one_type=entity_one_type,
+                        entity_one_id=entity_one_id,
+                        entity_two_type=entity_two_type,
+                        entity_two_id=entity_two_id,
+                        role=graph.role_names[role],
+                    )
+                    relations[relation.link_key] = relation
+                # Skip relations with a missing entity id, as _process_relations does.
+                edges = edges[:, (graph.keys[edges[:2]] & 0xFFFFFFFF).all(axis=0)]
+                frontier = numpy.setdiff1d(edges[:2], visited)
+            else:
+                frontier = frontier[:0]
+            self._test_loop_two(distance, relations)
+            for link_key, relation in relations.items():
+                if relation.entity_one_id and relation.entity_two_id:
+                    self.links[link_key] = relation
+        node_keys = list(map(graph.decode, graph.keys[visited]))
+        entities = self._search_entities(node_keys)
+        entities = {_.entity_key: _ for _ in entities}
+        self.nodes.clear()
+        for entity_key, node_distance in zip(node_keys, distances.tolist()):
+            if entity_key in entities:
+                entity = entities[entity_key]
+                self.nodes[entity_key] = TrellisNode(entity, node_distance)
+        return distance
+
     # noinspection PyUnusedLocal
     def _search_via_structural_roles(self, distance, provisional_roles, relations):
         if not self.structural_roles:
@@ -463,14 +660,20 @@ class RelationGrapher(ABC):
 
     @classmethod
     def make_cache_key(
-        cls, template, entity_type: EntityType, entity_id, roles=None, year=None
+        cls,
+        template,
+        entity_type: EntityType,
+        entity_id,
+        roles=None,
+        year=None,
+        page_size=None,
     ):
         assert entity_type in (EntityType.ARTIST, EntityType.LABEL)
         # if isinstance(entity_type, int):
         #     entity_type = cls.entity_type_names[entity_type]
         entity_type_str = entity_type.name.lower()
         key = template.format(entity_type=entity_type_str, entity_id=entity_id)
-        if roles or year:
+        if roles or year or page_size:
             parts = []
             if roles:
                 roles = (cls.word_pattern.sub("+", _) for _ in roles)
@@ -484,6 +687,8 @@ class RelationGrapher(ABC):
                     year = "-".join(str(_) for _ in year)
                     year = f"year={year}"
                 parts.append(year)
+            if page_size:
+                parts.append(f"page_size={page_size}")
             query_string = "&".join(parts)
             key = f"{key}?{query_string}"
         key = f"discograph:{key}"
@@ -516,6 +721,10 @@ class RelationGrapher(ABC):
     def entity_keys_to_visit(self):
         return self._entity_keys_to_visit
 
+    @property
+    def graph(self):
+        return self._graph
+
     @property
     def link_ratio(self):
         return self._link_ratio
@@ -536,6 +745,10 @@ class RelationGrapher(ABC):
     def nodes(self):
         return self._nodes
 
+    @property
+    def page_size(self):
+        return self._page_size
+
     @property
     def relational_roles(self):
         return self._relational_roles
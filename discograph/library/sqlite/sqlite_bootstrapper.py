@@ -1,10 +1,16 @@
 import logging
 
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.incremental_bootstrapper import IncrementalBootstrapper
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.models.precomputed_network import PrecomputedNetwork
+from discograph.library.relation_graph import RelationGraph
 from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from discograph.library.sqlite.sqlite_helper import SqliteHelper
 from discograph.library.sqlite.sqlite_relation import SqliteRelation
 from discograph.library.sqlite.sqlite_release import SqliteRelease
 
-
 log = logging.getLogger(__name__)
 
 
@@ -13,15 +19,60 @@ class SqliteBootstrapper:
     def bootstrap_models(cls):
         log.info("Bootstrap sqlite models")
 
-        SqliteEntity.drop_table(True)
-        SqliteRelease.drop_table(True)
-        SqliteRelation.drop_table(True)
-        SqliteEntity.create_table(True)
-        SqliteRelease.create_table(True)
-        SqliteRelation.create_table(True)
-        SqliteEntity.bootstrap_pass_one()
-        SqliteEntity.bootstrap_pass_two()
-        SqliteRelease.bootstrap_pass_one()
-        SqliteRelease.bootstrap_pass_two()
-        SqliteRelation.bootstrap_pass_one()
-        SqliteEntity.bootstrap_pass_three()
+        if not Bootstrapper.resume:
+            BootstrapJournal.drop_table(True)
+        BootstrapJournal.create_table(True)
+
+        # One worker pool, and one connection per worker, for all passes.
+        with BootstrapPool.acquire():
+            BootstrapJournal.run_stage("entity pass 1", cls.load_model, SqliteEntity)
+            BootstrapJournal.run_stage("release pass 1", cls.load_model, SqliteRelease)
+            BootstrapJournal.run_stage("entity pass 2", SqliteEntity.bootstrap_pass_two)
+            BootstrapJournal.run_stage(
+                "release pass 2", SqliteRelease.bootstrap_pass_two
+            )
+            BootstrapJournal.run_stage(
+                "relation pass 1", cls.load_model, SqliteRelation
+            )
+            BootstrapJournal.run_stage(
+                "entity pass 3", SqliteEntity.bootstrap_pass_three
+            )
+            if Bootstrapper.relation_graph_path:
+                BootstrapJournal.run_stage(
+                    "relation graph",
+                    RelationGraph.build,
+                    SqliteEntity,
+                    SqliteRelation,
+                    Bootstrapper.relation_graph_path,
+                )
+            BootstrapJournal.run_stage(
+                "precomputed networks",
+                PrecomputedNetwork.precompute,
+                SqliteHelper,
+                SqliteEntity,
+                Bootstrapper.precomputed_network_count,
+            )
+            # Every stage is done, so the next bootstrap starts afresh even
+            # with resume on.
+            BootstrapJournal.clear()
+
+    @classmethod
+    def load_model(cls, model_class):
+        # A resumed stage keeps the rows its journaled chunks already wrote.
+        if not BootstrapJournal.has_progress():
+            model_class.drop_table(True)
+        model_class.create_table(True)
+        model_class.bootstrap_pass_one()
+
+    @classmethod
+    def update_models(cls):
+        log.info("incremental bootstrap sqlite models")
+        stats = IncrementalBootstrapper(SqliteEntity, SqliteRelease, SqliteRelation)()
+        if Bootstrapper.relation_graph_path:
+            RelationGraph.build(
+                SqliteEntity, SqliteRelation, Bootstrapper.relation_graph_path
+            )
+        PrecomputedNetwork.precompute(
+            SqliteHelper, SqliteEntity, Bootstrapper.precomputed_network_count
+        )
+        return stats
@@ -19,6 +19,8 @@ log = logging.getLogger(__name__)
 
 
 class SqliteEntity(Entity):
+    _json_object_agg = "json_group_object"
+
     def __format__(self, format_specification="") -> Any:
         return json.dumps(
             model_to_dict(
@@ -26,6 +28,7 @@ class SqliteEntity(Entity):
                 exclude=[
                     SqliteEntity.random,
                     SqliteEntity.relation_counts,
+                    SqliteEntity.role_counts,
                     SqliteEntity.search_content,
                 ],
             ),
@@ -40,6 +43,7 @@ class SqliteEntity(Entity):
     entity_type = EnumField(index=False, choices=EntityType)
     name = peewee.TextField(index=True)
     relation_counts = sqlite_ext.JSONField(null=True, index=False)
+    role_counts = peewee.BlobField(null=True, index=False)
     metadata = sqlite_ext.JSONField(null=True, index=False)
     entities = sqlite_ext.JSONField(null=True, index=False)
     search_content = sqlite_ext.SearchField()
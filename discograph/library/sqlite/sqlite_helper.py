@@ -4,6 +4,8 @@ import random
 from discograph.library import EntityType, CreditRole
 from discograph.library.database_helper import DatabaseHelper
 from discograph.library.discogs_model import DiscogsModel
+from discograph.library.models.precomputed_network import PrecomputedNetwork
+from discograph.library.relation_graph import RelationGraph
 from discograph.library.sqlite.sqlite_entity import SqliteEntity
 from discograph.library.sqlite.sqlite_relation import SqliteRelation
 from discograph.library.sqlite.sqlite_relation_grapher import SqliteRelationGrapher
@@ -13,6 +15,24 @@ log = logging.getLogger(__name__)
 
 
 class SqliteHelper(DatabaseHelper):
+    @staticmethod
+    def compute_network(entity, on_mobile=False, roles=None, page_size=None):
+        if not on_mobile:
+            max_nodes = DatabaseHelper.MAX_NODES
+            degree = DatabaseHelper.MAX_DEGREE
+        else:
+            max_nodes = DatabaseHelper.MAX_NODES_MOBILE
+            degree = DatabaseHelper.MAX_DEGREE_MOBILE
+        relation_grapher = SqliteRelationGrapher(
+            center_entity=entity,
+            degree=degree,
+            max_nodes=max_nodes,
+            roles=roles,
+            graph=RelationGraph.loaded,
+            page_size=DatabaseHelper.page_size(page_size, on_mobile=on_mobile),
+        )
+        return relation_grapher()
+
     @staticmethod
     def get_entity(entity_type: EntityType, entity_id: int):
         assert entity_type in (EntityType.ARTIST, EntityType.LABEL)
@@ -26,48 +46,48 @@ class SqliteHelper(DatabaseHelper):
 
     @staticmethod
     def get_network(
-        entity_id: int, entity_type: EntityType, on_mobile=False, roles=None
+        entity_id: int,
+        entity_type: EntityType,
+        on_mobile=False,
+        roles=None,
+        page_size=None,
+        encoded=False,
     ):
-        from discograph.library.cache.cache_manager import cache
+        from discograph.library.cache.cache_manager import (
+            single_flight,
+            single_flight_encoded,
+        )
 
         log.debug(f"entity_type: {entity_type}")
         assert entity_type in (EntityType.ARTIST, EntityType.LABEL)
-        template = "discograph:/api/{entity_type}/network/{entity_id}"
-        if on_mobile:
-            template += "/mobile"
-
-        cache_key_formatter = SqliteRelationGrapher.make_cache_key(
-            template,
+        cache_key = DatabaseHelper.network_cache_key(
             entity_type,
             entity_id,
+            on_mobile=on_mobile,
             roles=roles,
+            page_size=page_size,
         )
-        cache_key = cache_key_formatter.format(entity_type, entity_id)
         log.debug(f"cache_key: {cache_key}")
-        data = cache.get(cache_key)
-        if data is not None:
+
+        def compute():
+            with DiscogsModel.connection_context():
+                data = PrecomputedNetwork.get_data(cache_key)
+            if data is not None:
+                return data
+            # entity_type = entity_name_types[entity_type]
+            entity = SqliteHelper.get_entity(entity_type, entity_id)
+            log.debug(f"entity: {entity}")
+            if entity is None:
+                return None
+            with DiscogsModel.connection_context():
+                data = SqliteHelper.compute_network(
+                    entity, on_mobile=on_mobile, roles=roles, page_size=page_size
+                )
             return data
-        # entity_type = entity_name_types[entity_type]
-        entity = SqliteHelper.get_entity(entity_type, entity_id)
-        log.debug(f"entity: {entity}")
-        if entity is None:
-            return None
-        if not on_mobile:
-            max_nodes = DatabaseHelper.MAX_NODES
-            degree = DatabaseHelper.MAX_DEGREE
-        else:
-            max_nodes = DatabaseHelper.MAX_NODES_MOBILE
-            degree = DatabaseHelper.MAX_DEGREE_MOBILE
-        relation_grapher = SqliteRelationGrapher(
-            center_entity=entity,
-            degree=degree,
-            max_nodes=max_nodes,
-            roles=roles,
-        )
-        with DiscogsModel.connection_context():
-            data = relation_grapher()
-        cache.set(cache_key, data)
-        return data
+
+        if encoded:
+            return single_flight_encoded(cache_key, compute)
+        return single_flight(cache_key, compute)
 
     @staticmethod
     def get_random_entity(roles=None):
@@ -151,31 +171,33 @@ class SqliteHelper(DatabaseHelper):
         return roles, year
 
     @staticmethod
-    def search_entities(search_string):
-        from discograph.utils import urlify_pattern
-        from discograph.library.cache.cache_manager import cache
+    def search_entities(search_string, encoded=False):
+        from discograph.library.cache.cache_manager import (
+            single_flight,
+            single_flight_encoded,
+        )
 
-        cache_key = f"discograph:/api/search/{urlify_pattern.sub('+', search_string)}"
+        cache_key = DatabaseHelper.search_cache_key(search_string)
         log.debug(f"  get cache_key: {cache_key}")
-        data = cache.get(cache_key)
-        if data is not None:
-            log.debug(f"{cache_key}: CACHED")
-            for datum in data["results"]:
-                log.debug(f"    {datum}")
+
+        def compute():
+            with DiscogsModel.connection_context():
+                query = SqliteEntity.search_text(search_string)
+                log.debug(f"query: {query}")
+                log.debug(f"{cache_key}: NOT CACHED")
+                data = []
+                for entity in query:
+                    entity_type = entity.entity_type.name.lower()
+                    datum = dict(
+                        key=f"{entity_type}-{entity.entity_id}",
+                        name=entity.name,
+                    )
+                    data.append(datum)
+                    log.debug(f"    {datum}")
+            data = {"results": tuple(data)}
+            log.debug(f"  set cache_key: {cache_key} data: {data}")
             return data
-        with DiscogsModel.connection_context():
-            query = SqliteEntity.search_text(search_string)
-            log.debug(f"query: {query}")
-            log.debug(f"{cache_key}: NOT CACHED")
-            data = []
-            for entity in query:
-                datum = dict(
-                    key=f"{entity.entity_type.name.lower()}-{entity.entity_id}",
-                    name=entity.name,
-                )
-                data.append(datum)
-                log.debug(f"    {datum}")
-        data = {"results": tuple(data)}
-        log.debug(f"  set cache_key: {cache_key} data: {data}")
-        cache.set(cache_key, data)
-        return data
+
+        if encoded:
+            return single_flight_encoded(cache_key, compute)
+        return single_flight(cache_key, compute)
@@ -12,6 +12,13 @@ log = logging.getLogger(__name__)
 
 
 class SqliteRelation(Relation):
+    # json_patch() would drop releases without a year (null values).
+    _merge_releases_sql = (
+        "(SELECT json_group_object(key, value) FROM ("
+        'SELECT key, value FROM json_each("{table}"."releases") '
+        'UNION SELECT key, value FROM json_each(excluded."releases")))'
+    )
+
     # PEEWEE FIELDS
 
     entity_one_type = EnumField(index=False, choices=EntityType)
@@ -7,6 +7,7 @@ class TrellisNode(object):
         "_missing",
         "_missing_by_page",
         "_entity",
+        "_index",
         "_pages",
         "_parentage",
         "_parents",
@@ -22,6 +23,7 @@ class TrellisNode(object):
         self._missing = 0
         self._missing_by_page = {}
         self._entity = entity
+        self._index = None
         self._pages = set()
         self._parentage = None
         self._parents = set()
@@ -73,22 +75,6 @@ class TrellisNode(object):
         neighbors.update(self.children)
         return neighbors
 
-    def get_parentage(self):
-        if self._parentage is not None:
-            return self._parentage
-        # noinspection PySetFunctionToLiteral
-        parentage = set([self])
-        parents = self.parents
-        while parents:
-            parentage.update(parents)
-            new_parents = set()
-            for parent in parents:
-                new_parents.update(parent.parents)
-            parents = new_parents
-        parentage = frozenset(parentage)
-        self._parentage = parentage
-        return parentage
-
     # PUBLIC PROPERTIES
 
     @property
@@ -115,6 +101,14 @@ class TrellisNode(object):
     def entity_key(self):
         return self._entity.entity_key
 
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, expr):
+        self._index = int(expr)
+
     @property
     def links(self):
         return self._links
@@ -135,6 +129,14 @@ class TrellisNode(object):
     def pages(self):
         return self._pages
 
+    @property
+    def parentage(self):
+        return self._parentage
+
+    @parentage.setter
+    def parentage(self, expr):
+        self._parentage = frozenset(expr)
+
     @property
     def parents(self):
         return self._parents
@@ -11,18 +11,14 @@ from flask import url_for
 import discograph.utils
 from discograph import database, exceptions
 from discograph.library import CreditRole, EntityType
+from discograph.library.database_helper import DatabaseHelper
 
 log = logging.getLogger(__name__)
 
 blueprint = Blueprint("ui", __name__, template_folder="templates")
 
 
-default_roles = (
-    "Alias",
-    "Member Of",
-    # 'Sublabel Of',
-    # 'Released On',
-)
+default_roles = DatabaseHelper.DEFAULT_ROLES
 
 
 @blueprint.route("/")
@@ -14,6 +14,8 @@ if __name__ == "__main__":
             "apsw",
             "flask",
             "gunicorn",
+            "lxml",
+            "numpy",
             "peewee",
             "psycopg2",
             "pytest",
@@ -0,0 +1,52 @@
+"""
+Reports elements/second for each Bootstrapper XML parser backend.
+
+Run from the repository root:
+
+    python -m tests.benchmark.benchmark_bootstrapper_iterparse
+
+"""
+
+import argparse
+import gzip
+import time
+
+from discograph.config import XmlParserType
+from discograph.library.bootstrapper import Bootstrapper
+
+
+def benchmark(tag, xml_parser, repeat=3):
+    file_path = Bootstrapper.get_xml_path(tag, test=True)
+    best = None
+    count = 0
+    for _ in range(repeat):
+        with gzip.GzipFile(file_path, "r") as file_pointer:
+            start = time.perf_counter()
+            iterator = Bootstrapper.iterparse(file_pointer, tag, xml_parser)
+            iterator = Bootstrapper.clean_elements(iterator)
+            count = sum(1 for _ in iterator)
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for tag in ("artist", "label", "release"):
+        baseline = None
+        for xml_parser in XmlParserType:
+            count, elapsed = benchmark(tag, xml_parser, repeat=args.repeat)
+            rate = count / elapsed
+            if baseline is None:
+                baseline = rate
+            print(
+                f"{tag:<8} {xml_parser.name:<12} {count:>6} elements "
+                f"{elapsed:8.3f}s {rate:12.0f} elements/s {rate / baseline:6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmarks RelationGrapher._index_trellis against the recursive subgraph
+sizing and layer-walking parentage it replaced, on synthetic trellises.
+
+Layered trellises are those of benchmark_relation_grapher_page_greedily.
+Chains are single member-of chains, whose parentages grow quadratically,
+so they are only built up to --chain-max-nodes.
+
+Run from the repository root:
+
+    python -m tests.benchmark.benchmark_relation_grapher_index_trellis \
+        --nodes 400 2000 5000 50000
+
+"""
+
+import argparse
+import sys
+import time
+
+from discograph.library.relation_grapher import RelationGrapher
+from discograph.library.trellis_node import TrellisNode
+from tests.benchmark.benchmark_relation_grapher_page_greedily import (
+    SyntheticEntity,
+    build_trellis,
+)
+
+
+def build_chain(node_count):
+    layers = [[TrellisNode(SyntheticEntity((1, 0)), 0)]]
+    for entity_id in range(1, node_count):
+        node = TrellisNode(SyntheticEntity((1, entity_id)), entity_id)
+        node.parents.add(layers[-1][0])
+        layers[-1][0].children.add(node)
+        layers.append([node])
+    return layers
+
+
+def index_by_recursion(trellis_nodes, center_node):
+    # Subgraph sizing and parentage before _index_trellis.
+    def recurse_trellis(node):
+        traversed_keys = set([node.entity_key])
+        for child in node.children:
+            traversed_keys.update(recurse_trellis(child))
+        node.subgraph_size = len(traversed_keys)
+        return traversed_keys
+
+    def get_parentage(node):
+        parentage = set([node])
+        parents = node.parents
+        while parents:
+            parentage.update(parents)
+            new_parents = set()
+            for parent in parents:
+                new_parents.update(parent.parents)
+            parents = new_parents
+        return frozenset(parentage)
+
+    recurse_trellis(center_node)
+    for trellis_node in trellis_nodes:
+        trellis_node.parentage = get_parentage(trellis_node)
+
+
+def run(function, layers):
+    trellis_nodes = [_ for layer in layers for _ in layer]
+    started = time.perf_counter()
+    try:
+        function(trellis_nodes, layers[0][0])
+    except RecursionError:
+        return None
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[400, 2000, 5000, 50000]
+    )
+    parser.add_argument(
+        "--recursion-max-nodes",
+        type=int,
+        default=5000,
+        help="skip the recursive indexing above this many nodes",
+    )
+    parser.add_argument(
+        "--chain-max-nodes",
+        type=int,
+        default=5000,
+        help="skip chains above this many nodes",
+    )
+    args = parser.parse_args()
+    print(f"recursion limit: {sys.getrecursionlimit()}")
+    print(f"{'shape':>7} {'nodes':>6} {'bitsets s':>9} {'recursion s':>11}")
+    for node_count in args.nodes:
+        shapes = [("layered", build_trellis(node_count, index=False))]
+        if node_count <= args.chain_max_nodes:
+            shapes.append(("chain", build_chain(node_count)))
+        for shape, layers in shapes:
+            row = [
+                f"{shape:>7}",
+                f"{node_count:>6}",
+                f"{run(RelationGrapher._index_trellis, layers):>9.3f}",
+            ]
+            if node_count > args.recursion_max_nodes:
+                row.append(f"{'-':>11}")
+            else:
+                elapsed = run(index_by_recursion, layers)
+                row.append(f"{elapsed:>11.3f}" if elapsed else f"{'recursion':>11}")
+            print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmarks RelationGrapher._page_greedily against the sort-based paging it
+replaced, on synthetic trellises.
+
+Each trellis has a center and layers of nodes at growing distances, every
+node with one to three parents on the layer before. As in
+RelationGrapher._partition_trellis, the first layers are put on every
+page, then the other nodes are paged in distance order.
+
+Run from the repository root:
+
+    python -m tests.benchmark.benchmark_relation_grapher_page_greedily \
+        --nodes 5000 20000 50000 --pages 1 8 64
+
+"""
+
+import argparse
+import random
+import time
+
+from discograph.library.relation_grapher import RelationGrapher
+from discograph.library.trellis_node import TrellisNode
+
+
+class SyntheticEntity(object):
+    __slots__ = ("entity_key",)
+
+    def __init__(self, entity_key):
+        self.entity_key = entity_key
+
+
+def build_trellis(node_count, seed=0, index=True):
+    """
+    Returns the trellis nodes of a synthetic network, by distance.
+    """
+    rng = random.Random(seed)
+    center = TrellisNode(SyntheticEntity((1, 0)), 0)
+    layers = [[center]]
+    remaining = node_count - 1
+    width = 8
+    while remaining:
+        count = min(remaining, width)
+        layer = []
+        for _ in range(count):
+            node = TrellisNode(
+                SyntheticEntity((1, node_count - remaining)), len(layers)
+            )
+            for parent in rng.sample(
+                layers[-1], min(len(layers[-1]), rng.randint(1, 3))
+            ):
+                node.parents.add(parent)
+                parent.children.add(node)
+            layer.append(node)
+            remaining -= 1
+        layers.append(layer)
+        width *= 6
+    # Parentage is set on the nodes up front, so neither paging pays for it.
+    if index:
+        RelationGrapher._index_trellis([_ for layer in layers for _ in layer], center)
+    return layers
+
+
+def page_by_sorting(pages, trellis_nodes):
+    # The paging loop of _page_by_distance before the greedy partitioner.
+    for trellis_node in trellis_nodes:
+        parentage = trellis_node.parentage
+        pages.sort(
+            key=lambda page: (
+                len(page.difference(parentage)),
+                len(page),
+            ),
+        )
+        pages[0].update(parentage)
+
+
+def run(function, layers, page_count):
+    pages = [set() for _ in range(page_count)]
+    for layer in layers[:2]:
+        for trellis_node in layer:
+            for page in pages:
+                page.update(trellis_node.parentage)
+    trellis_nodes = [_ for layer in layers[2:] for _ in layer]
+    started = time.perf_counter()
+    function(pages, trellis_nodes)
+    elapsed = time.perf_counter() - started
+    return elapsed, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument(
+        "--sorting-max-nodes",
+        type=int,
+        default=20000,
+        help="skip the sort-based paging above this many nodes",
+    )
+    args = parser.parse_args()
+    print(
+        f"{'nodes':>6} {'pages':>5} {'greedy s':>9} {'sorting s':>9} "
+        f"{'greedy total':>12} {'sorting total':>13} {'greedy max':>10} "
+        f"{'sorting max':>11}"
+    )
+    for node_count in args.nodes:
+        layers = build_trellis(node_count)
+        for page_count in args.pages:
+            greedy_time, greedy = run(
+                RelationGrapher._page_greedily, layers, page_count
+            )
+            row = [
+                f"{node_count:>6}",
+                f"{page_count:>5}",
+                f"{greedy_time:>9.3f}",
+            ]
+            if node_count <= args.sorting_max_nodes:
+                sorting_time, sorting = run(page_by_sorting, layers, page_count)
+                row.append(f"{sorting_time:>9.3f}")
+            else:
+                sorting = None
+                row.append(f"{'-':>9}")
+            row.append(f"{sum(len(_) for _ in greedy):>12}")
+            row.append(f"{sum(len(_) for _ in sorting) if sorting else '-':>13}")
+            row.append(f"{max(len(_) for _ in greedy):>10}")
+            row.append(f"{max(len(_) for _ in sorting) if sorting else '-':>11}")
+            print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
+import gzip
+import json
+import threading
+import time
 import unittest
 
-from discograph.config import SqliteTestConfiguration, SqliteDevelopmentConfiguration
-from discograph.library.cache.cache_manager import setup_cache, shutdown_cache
+import fakeredis
+
+from discograph.config import (
+    CacheType,
+    SqliteDevelopmentConfiguration,
+    SqliteTestConfiguration,
+)
+from discograph.library.cache import cache_manager
+from discograph.library.cache.cache_manager import (
+    setup_cache,
+    shutdown_cache,
+    single_flight,
+)
+from discograph.library.cache.lru_cache import LruCache
+from discograph.library.cache.redis_cache import CompressedRedisCache, Precompressed
 from discograph.logging_config import setup_logging, shutdown_logging
 
 
@@ -115,3 +132,216 @@ class TestCache(unittest.TestCase):
         actual = cache.get(cache_key)
         expected = None
         assert actual == expected
+
+    def test_07(self):
+        # Concurrent misses for one key compute it once.
+        cache_key = "test_single_flight"
+        setup_cache(vars(SqliteTestConfiguration))
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"results": (1, 2)}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(single_flight(cache_key, compute))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert results == [{"results": (1, 2)}] * 8
+        assert cache_manager.cache.get(f"{cache_key}:lock") is None
+        assert not cache_manager._local_locks
+        shutdown_cache()
+
+    def test_08(self):
+        # A lock held in the cache, as by another worker, is waited on.
+        cache_key = "test_single_flight"
+        setup_cache(vars(SqliteTestConfiguration))
+        cache = cache_manager.cache
+        cache.add(f"{cache_key}:lock", "other worker")
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(single_flight(cache_key, lambda: "mine"))
+        )
+        thread.start()
+        time.sleep(0.2)
+        cache_manager._store(cache_key, "theirs")
+        thread.join()
+        assert results == ["theirs"]
+        # A lock released without a value is taken over.
+        cache_manager.delete(cache_key)
+        thread = threading.Thread(
+            target=lambda: results.append(single_flight(cache_key, lambda: "mine"))
+        )
+        thread.start()
+        time.sleep(0.2)
+        cache.delete(f"{cache_key}:lock")
+        thread.join()
+        assert results == ["theirs", "mine"]
+        assert cache_manager._decode(cache.get(cache_key)) == "mine"
+        shutdown_cache()
+
+    def test_09(self):
+        # Stale values are served while one background refresh replaces them.
+        cache_key = "test_stale"
+        setup_cache(vars(SqliteTestConfiguration))
+        cache_manager.soft_timeout = 0
+        refreshed = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            refreshed.wait(5)
+            return len(calls)
+
+        assert single_flight(cache_key, lambda: 0) == 0
+        assert single_flight(cache_key, compute) == 0
+        assert single_flight(cache_key, compute) == 0
+        refreshed.set()
+        cache_manager.refresh_executor.shutdown()
+        assert calls == [1]
+        assert cache_manager._decode(cache_manager.cache.get(cache_key)) == 1
+        assert cache_manager.cache.get(f"{cache_key}:refresh") is None
+        shutdown_cache()
+
+    def test_10(self):
+        # Redis caches on one server are shared and compress large values.
+        server = fakeredis.FakeServer()
+        caches = [
+            CompressedRedisCache(host=fakeredis.FakeRedis(server=server))
+            for _ in range(2)
+        ]
+        data = {"nodes": [dict(id=i, name=f"Artist {i}") for i in range(500)]}
+        caches[0].set("test_key", data)
+        assert caches[1].get("test_key") == data
+        payload = caches[1]._read_client.get("test_key")
+        assert payload[:1] in (b"g", b"z")
+        assert len(payload) < len(str(data))
+        caches[0].set("test_small", "small")
+        assert caches[1]._read_client.get("test_small")[:1] == b"!"
+        # Values holding compressed payloads are not compressed again.
+        entry = Precompressed(gzip=gzip.compress(str(data).encode()), etag="etag")
+        caches[0].set("test_entry", entry)
+        assert caches[1]._read_client.get("test_entry")[:1] == b"!"
+        assert caches[1].get("test_entry") == entry
+        assert caches[1].add("test_lock", "one", timeout=60)
+        assert not caches[0].add("test_lock", "two", timeout=60)
+
+    def test_11(self):
+        # Without a REDIS_URL the Redis cache runs on fakeredis.
+        config = dict(vars(SqliteTestConfiguration), CACHE_TYPE=CacheType.REDIS)
+        setup_cache(config)
+        assert isinstance(cache_manager.cache, CompressedRedisCache)
+        assert single_flight("test_key", lambda: {"results": ()}) == {"results": ()}
+        assert single_flight("test_key", lambda: None) == {"results": ()}
+        shutdown_cache()
+
+    def test_12(self):
+        # Hits on fresh values are served from the l1 cache.
+        setup_cache(vars(SqliteTestConfiguration))
+        data = {"results": ({"key": "artist-1", "name": "Name"},)}
+        assert single_flight("test_key", lambda: data) == data
+        assert cache_manager.get_json("test_key") == (
+            b'{"results":[{"key":"artist-1","name":"Name"}]}'
+        )
+        cache_manager.counters.clear()
+        cache_manager.cache.delete("test_key")
+        assert single_flight("test_key", lambda: None) == data
+        assert cache_manager.counters == {"l1 hits": 1}
+        # Stale values are read again from the shared cache.
+        cache_manager.l1_cache.get("test_key")["stale_at"] = 0
+        cache_manager.cache.set("test_key", dict(data=1, stale_at=time.time() + 60))
+        assert single_flight("test_key", lambda: None) == 1
+        assert cache_manager.counters == {"l1 hits": 1, "l1 misses": 1, "l2 hits": 1}
+        cache_manager.delete("test_key")
+        assert cache_manager.get_json("test_key") is None
+        shutdown_cache()
+
+    def test_13(self):
+        # The least recently used values are evicted to fit the size bound.
+        lru_cache = LruCache(10)
+        lru_cache.set("a", 1, 4)
+        lru_cache.set("b", 2, 4)
+        assert lru_cache.get("a") == 1
+        lru_cache.set("c", 3, 4)
+        assert "b" not in lru_cache
+        assert (len(lru_cache), lru_cache.size) == (2, 8)
+        assert not lru_cache.set("d", 4, 11)
+        lru_cache.set("a", 5, 6)
+        assert (lru_cache.get("a"), lru_cache.size) == (5, 10)
+
+    def test_14(self):
+        # Values are cached with their encodings and a strong ETag.
+        setup_cache(vars(SqliteTestConfiguration))
+        data = {"nodes": [dict(id=i, name=f"Artist {i}") for i in range(100)]}
+        single_flight("test_key", lambda: data)
+        entry = cache_manager.get_encoded("test_key")
+        assert json.loads(entry["json"]) == data
+        assert gzip.decompress(entry["gzip"]) == entry["json"]
+        assert "br" in entry and "br" in cache_manager.ENCODINGS
+        # The shared cache holds only the encodings and ETag.
+        shared_entry = cache_manager.cache.get("test_key")
+        assert sorted(shared_entry) == ["br", "etag", "gzip", "stale_at"]
+        assert shared_entry == {_: entry[_] for _ in shared_entry}
+        # Values read from it are decoded on first use.
+        cache_manager.l1_cache.clear()
+        assert "data" not in cache_manager._get_entry("test_key")
+        assert single_flight("test_key", lambda: None) == data
+        assert cache_manager.get_encoded("test_key")["data"] == data
+        # Values cached without them are encoded when read.
+        cache_manager.l1_cache.clear()
+        cache_manager.cache.set("test_key", dict(data=data, stale_at=time.time() + 60))
+        assert single_flight("test_key", lambda: None) == data
+        assert cache_manager.get_encoded("test_key")["etag"] == entry["etag"]
+        shutdown_cache()
+
+    def test_15(self):
+        # Invalidated values are recomputed, in other processes sharing the
+        # cache once they next read its version.
+        config = dict(vars(SqliteTestConfiguration), CACHE_TYPE=CacheType.REDIS)
+        setup_cache(config)
+        assert single_flight("test_key", lambda: 1) == 1
+        cache_manager.invalidate()
+        assert cache_manager.get_json("test_key") is None
+        assert single_flight("test_key", lambda: 2) == 2
+        version = cache_manager.cache.get(cache_manager.VERSION_KEY)
+        cache_manager.cache.set(cache_manager.VERSION_KEY, "other")
+        assert single_flight("test_key", lambda: 3) == 2
+        cache_manager._version[1] = 0
+        assert single_flight("test_key", lambda: 3) == 3
+        entry = cache_manager.cache.get(f"test_key:v{version}")
+        assert cache_manager._decode(entry) == 2
+        shutdown_cache()
+
+    def test_16(self):
+        # The l1 cache counts decoded values as well as their encodings.
+        setup_cache(vars(SqliteTestConfiguration))
+        single_flight("test_key", lambda: {"nodes": list(range(100))})
+        entry = cache_manager.get_encoded("test_key")
+        encoded_size = sum(len(entry[_]) for _ in ("json",) + cache_manager.ENCODINGS)
+        decoded_size = len(entry["json"]) * cache_manager.DECODED_SIZE_RATIO
+        assert cache_manager.l1_cache.size == encoded_size + decoded_size
+        shutdown_cache()
+
+    def test_17(self):
+        # Encoded single-flight hits return the entry without decoding it.
+        setup_cache(vars(SqliteTestConfiguration))
+        data = {"results": ({"key": "artist-1", "name": "Name"},)}
+        entry = cache_manager.single_flight_encoded("test_key", lambda: data)
+        assert json.loads(entry["json"]) == {"results": [data["results"][0]]}
+        assert cache_manager.single_flight_encoded("test_missing", lambda: None) is None
+        cache_manager.l1_cache.clear()
+        entry = cache_manager.single_flight_encoded("test_key", lambda: None)
+        assert "data" not in entry
+        entry = cache_manager.single_flight_encoded("test_key", lambda: None)
+        assert "data" not in entry
+        assert cache_manager.counters["l1 hits"] == 1
+        shutdown_cache()
@@ -3,6 +3,8 @@ import unittest
 
 from discograph import database
 from discograph.config import PostgresTestConfiguration
+from discograph.library import EntityType
+from discograph.library.discogs_model import DiscogsModel
 from discograph.library.postgres.postgres_entity import PostgresEntity
 from discograph.logging_config import setup_logging
 
@@ -46,3 +48,18 @@ class TestPostgresEntityBootstrap(unittest.TestCase):
 
         log.debug("entity pass 2")
         PostgresEntity.bootstrap_pass_two()
+
+    def test_bootstrap_pass_one_copy_01(self):
+        PostgresEntity.drop_table(True)
+        PostgresEntity._schema.create_table(safe=True)
+
+        log.debug("entity pass 1")
+        loader = PostgresEntity.bulk_loader()
+        DiscogsModel.bootstrap_pass_one_bulk(
+            PostgresEntity, "artist", loader, "entity_id", skip_without=["name"]
+        )
+        PostgresEntity._schema.create_indexes(safe=True)
+        assert loader.count == len(PostgresEntity)
+        entity = PostgresEntity.get(entity_id=3, entity_type=EntityType.ARTIST)
+        assert entity.name == "Josh Wink"
+        assert list(PostgresEntity.search_text("josh wink"))
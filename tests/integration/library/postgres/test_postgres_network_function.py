@@ -0,0 +1,52 @@
+from discograph.library import EntityType
+from discograph.library.postgres.postgres_entity import PostgresEntity
+from discograph.library.postgres.postgres_relation_grapher import (
+    PostgresRelationGrapher,
+)
+from tests.integration.library.postgres.postgres_test_case import PostgresTestCase
+
+
+class TestPostgresNetworkFunction(PostgresTestCase):
+    def setUp(self):
+        super(TestPostgresNetworkFunction, self).setUp()
+
+    @staticmethod
+    def assert_same_network(entity, **kwargs):
+        assert PostgresRelationGrapher.network_function
+        actual = PostgresRelationGrapher(entity, **kwargs)()
+        PostgresRelationGrapher.network_function = False
+        try:
+            expected = PostgresRelationGrapher(entity, **kwargs)()
+        finally:
+            PostgresRelationGrapher.network_function = True
+        assert actual == expected
+        return actual
+
+    def test_01(self):
+        artist = PostgresEntity.get(entity_type=EntityType.ARTIST, name="Seefeel")
+        network = self.assert_same_network(
+            artist, degree=1, roles=["Alias", "Member Of"]
+        )
+        assert network["links"]
+
+    def test_02(self):
+        artist = PostgresEntity.get(
+            entity_type=EntityType.ARTIST, name="Justin Fletcher"
+        )
+        roles = ["Alias", "Member Of"]
+        self.assert_same_network(artist, degree=2, max_nodes=5, roles=roles)
+        self.assert_same_network(artist, degree=2, link_ratio=2, roles=roles)
+
+    def test_03(self):
+        label = PostgresEntity.get(
+            entity_type=EntityType.LABEL, name="Lab Studio, Berlin"
+        )
+        network = self.assert_same_network(label, degree=2, roles=["Recorded At"])
+        assert network["links"]
+
+    def test_04(self):
+        # Pre-pruning and role pruning run server side too.
+        artist = PostgresEntity.get(entity_type=EntityType.ARTIST, entity_id=3)
+        roles = ["Released On", "Manufactured By", "Marketed By"]
+        network = self.assert_same_network(artist, degree=2, link_ratio=1, roles=roles)
+        assert network["links"]
@@ -0,0 +1,33 @@
+from discograph.library import EntityType
+from discograph.library.postgres.postgres_relation import PostgresRelation
+from tests.integration.library.postgres.postgres_test_case import PostgresTestCase
+
+
+class TestPostgresRelationSearch(PostgresTestCase):
+    def setUp(self):
+        super(TestPostgresRelationSearch, self).setUp()
+
+    @staticmethod
+    def query_plan(query):
+        # The test tables are small enough that a sequential scan always
+        # wins, so rule it out to see which indexes the planner can use.
+        sql, params = query.sql()
+        database = PostgresRelation._meta.database
+        with database.atomic():
+            database.execute_sql("SET LOCAL enable_seqscan = off")
+            cursor = database.execute_sql(f"EXPLAIN {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assert_uses_indexes(self, query):
+        plan = self.query_plan(query)
+        assert "Seq Scan" not in plan, plan
+        assert "postgresrelation_pkey" in plan, plan
+        assert "postgresrelation_entity_two_type_entity_two_id_role" in plan, plan
+
+    def test_01(self):
+        # Each direction of a search is an index scan.
+        keys = [(EntityType.ARTIST, 2239), (EntityType.LABEL, 245)]
+        self.assert_uses_indexes(PostgresRelation.search(2239, query_only=True))
+        query = PostgresRelation.search_multi_query(keys[:1], roles=["Member Of"])
+        self.assert_uses_indexes(query)
+        self.assert_uses_indexes(PostgresRelation.search_multi_query(keys))
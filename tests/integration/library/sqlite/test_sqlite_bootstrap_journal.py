@@ -0,0 +1,138 @@
+import os
+import tempfile
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.models.bootstrap_journal import BootstrapJournal
+from discograph.library.sqlite.sqlite_bootstrapper import SqliteBootstrapper
+from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+def record_chunk(directory, name, fail_at, chunk):
+    # Runs in a bootstrap pool worker, so calls are recorded on disk.
+    with open(os.path.join(directory, f"{name}-{chunk[0]}"), "a") as file_pointer:
+        file_pointer.write("x")
+    if chunk[0] == fail_at:
+        raise RuntimeError(f"killed at chunk {chunk[0]}")
+
+
+def run_inner_stages(directory, fail_at):
+    ids = list(range(1, 31))
+    BootstrapJournal.run_chunks(
+        "first", record_chunk, ids, directory, "first", None, chunk_size=10
+    )
+    BootstrapJournal.run_chunks(
+        "second", record_chunk, ids, directory, "second", fail_at, chunk_size=10
+    )
+
+
+# The stages journaled by a bootstrap killed during entity pass 3.
+INTERRUPTED_STAGES = [
+    "entity pass 1",
+    "release pass 1",
+    "entity pass 2",
+    "release pass 2",
+    "relation pass 1",
+]
+
+
+class TestSqliteBootstrapJournal(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteBootstrapJournal, self).setUp()
+
+    @staticmethod
+    def resume_bootstrap():
+        Bootstrapper.resume = True
+        try:
+            SqliteBootstrapper.bootstrap_models()
+        finally:
+            Bootstrapper.resume = False
+
+    def test_01(self):
+        # A finished bootstrap leaves an empty journal.
+        assert not BootstrapJournal.select().exists()
+        assert not BootstrapJournal.has_progress()
+
+    def test_02(self):
+        # Journaled chunks are skipped.
+        stage = "test chunks"
+        ids = list(range(1, 26))
+        chunks = list(BootstrapJournal.iter_pending_chunks(stage, ids, 10))
+        assert chunks == [ids[:10], ids[10:20], ids[20:]]
+        BootstrapJournal.mark_chunk_complete(stage, chunks[1])
+        assert BootstrapJournal.completed_count(stage) == 10
+        chunks = list(BootstrapJournal.iter_pending_chunks(stage, ids, 10))
+        assert chunks == [ids[:10], ids[20:]]
+        BootstrapJournal.delete().where(BootstrapJournal.stage == stage).execute()
+
+    def test_03(self):
+        # Resuming reruns only the stages not journaled as complete.
+        where_clause = (SqliteEntity.entity_type == EntityType.ARTIST) & (
+            SqliteEntity.entity_id == 3
+        )
+        entity = SqliteEntity.get(where_clause)
+        assert entity.relation_counts
+        SqliteEntity.update(name="Wrong Name").where(where_clause).execute()
+        SqliteEntity.update(relation_counts=None).execute()
+        for stage in INTERRUPTED_STAGES:
+            BootstrapJournal.mark_stage_complete(stage)
+        try:
+            self.resume_bootstrap()
+            resumed = SqliteEntity.get(where_clause)
+            assert resumed.name == "Wrong Name"
+            assert resumed.relation_counts == entity.relation_counts
+            assert not BootstrapJournal.select().exists()
+        finally:
+            SqliteEntity.update(name=entity.name).where(where_clause).execute()
+
+    def test_04(self):
+        # A stage killed in its second chunked stage resumes with the first
+        # chunked stage and the finished chunks skipped.
+        stage = "test stage"
+        with tempfile.TemporaryDirectory() as directory:
+
+            def calls():
+                return {
+                    name: len(open(os.path.join(directory, name)).read())
+                    for name in os.listdir(directory)
+                }
+
+            with self.assertRaises(RuntimeError):
+                BootstrapJournal.run_stage(stage, run_inner_stages, directory, 11)
+            assert not BootstrapJournal.is_stage_complete(stage)
+            assert BootstrapJournal.is_stage_complete(f"{stage}/first")
+            assert not BootstrapJournal.is_stage_complete(f"{stage}/second")
+            assert BootstrapJournal.completed_count(f"{stage}/second") == 20
+
+            BootstrapJournal.run_stage(stage, run_inner_stages, directory, None)
+            assert calls() == {
+                "first-1": 1,
+                "first-11": 1,
+                "first-21": 1,
+                "second-1": 1,
+                "second-11": 2,
+                "second-21": 1,
+            }
+            assert BootstrapJournal.is_stage_complete(stage)
+            query = BootstrapJournal.select().where(
+                BootstrapJournal.stage.startswith(f"{stage}/")
+            )
+            assert not query.exists()
+        BootstrapJournal.delete().where(BootstrapJournal.stage == stage).execute()
+
+    def test_05(self):
+        # Consecutive finished bootstraps with resume on each rerun every stage.
+        where_clause = (SqliteEntity.entity_type == EntityType.ARTIST) & (
+            SqliteEntity.entity_id == 3
+        )
+        entity = SqliteEntity.get(where_clause)
+        try:
+            for _ in range(2):
+                SqliteEntity.update(name="Wrong Name").where(where_clause).execute()
+                self.resume_bootstrap()
+                assert SqliteEntity.get(where_clause).name == entity.name
+                assert not BootstrapJournal.select().exists()
+        finally:
+            SqliteEntity.update(name=entity.name).where(where_clause).execute()
@@ -0,0 +1,47 @@
+from discograph import database  # noqa: F401
+from discograph.library.bootstrap_pool import BootstrapPool
+from discograph.library.sqlite.sqlite_release import SqliteRelease
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+def count_releases(release_ids):
+    return SqliteRelease.select().where(SqliteRelease.id.in_(release_ids)).count()
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class TestSqliteBootstrapPool(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteBootstrapPool, self).setUp()
+
+    def test_01(self):
+        # Tasks are spread over the workers, which query on their own connection.
+        release_ids = SqliteRelease.get_ids()
+        with BootstrapPool(processes=2) as pool:
+            assert pool.tasks._maxsize == 2 * BootstrapPool.QUEUE_DEPTH
+            for i in range(0, len(release_ids), 3):
+                pool.submit(count_releases, release_ids[i : i + 3])
+            assert sum(pool.wait()) == len(release_ids)
+            # The pool stays usable after a wait.
+            pool.submit(count_releases, release_ids)
+            assert pool.wait() == [len(release_ids)]
+
+    def test_02(self):
+        # A failed task is reported once every task has finished.
+        with BootstrapPool(processes=2) as pool:
+            pool.submit(fail, "broken")
+            pool.submit(count_releases, [])
+            with self.assertRaisesRegex(RuntimeError, "broken"):
+                pool.wait()
+            assert pool.wait() == []
+
+    def test_03(self):
+        # Nested acquires share the open pool.
+        assert BootstrapPool.current is None
+        with BootstrapPool.acquire() as pool:
+            with BootstrapPool.acquire() as nested:
+                assert nested is pool
+        assert BootstrapPool.current is None
+        assert not pool.workers
@@ -1,5 +1,7 @@
 from discograph import utils
+from discograph.library import EntityType
 from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.name_corpus import NameCorpus
 from discograph.library.sqlite.sqlite_entity import SqliteEntity
 from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
 
@@ -134,3 +136,87 @@ class TestSqliteEntity(SqliteTestCase):
             """
         )
         assert actual == expected
+
+    def test_name_corpus_01(self):
+        corpus = NameCorpus.from_entities(SqliteEntity)
+        assert len(corpus) > 0
+        for entity in SqliteEntity.select():
+            key = (entity.entity_type, entity.name)
+            queried = {}
+            SqliteEntity.update_corpus(queried, key)
+            assert key in corpus
+            assert (entity.entity_type.value, entity.name) in corpus
+            # Duplicate names resolve to the lowest entity id.
+            duplicates = SqliteEntity.select().where(
+                SqliteEntity.entity_type == entity.entity_type,
+                SqliteEntity.name == entity.name,
+            )
+            if duplicates.count() == 1:
+                assert corpus[key] == queried[key] == entity.entity_id
+            else:
+                assert corpus[key] == min(_.entity_id for _ in duplicates)
+        assert (EntityType.ARTIST, "No Such Artist Name") not in corpus
+
+    def test_bootstrap_pass_three_bulk_01(self):
+        relation_class = SqliteEntity.relation_class()
+        SqliteEntity.update(relation_counts=None).execute()
+        for entity in SqliteEntity.select(
+            SqliteEntity.entity_type, SqliteEntity.entity_id
+        ):
+            SqliteEntity.bootstrap_pass_three_single(
+                relation_class,
+                entity_type=entity.entity_type,
+                entity_id=entity.entity_id,
+                progress=0,
+            )
+        expected = {_.entity_key: _.relation_counts for _ in SqliteEntity.select()}
+        SqliteEntity.update(relation_counts=None).execute()
+        SqliteEntity.bootstrap_pass_three_bulk()
+        actual = {_.entity_key: _.relation_counts for _ in SqliteEntity.select()}
+        assert any(expected.values())
+        assert actual == expected
+
+    def test_role_counts_01(self):
+        # Stored role counts vectors count as the relation counts and
+        # entities they are built from.
+        def expected_count(entity, roles):
+            count = 0
+            for role in roles:
+                if role == "Alias":
+                    count += len(entity.entities.get("aliases", {}))
+                elif role == "Member Of":
+                    count += len(entity.entities.get("groups", {}))
+                    count += len(entity.entities.get("members", {}))
+                elif role == "Sublabel Of":
+                    count += len(entity.entities.get("parent_label", {}))
+                    count += len(entity.entities.get("sublabels", {}))
+                else:
+                    count += (entity.relation_counts or {}).get(role, 0)
+            return count
+
+        entities = list(SqliteEntity.select().limit(200))
+        assert all(_.role_counts is not None for _ in entities)
+        all_roles = {"Alias", "Member Of", "Sublabel Of"}
+        for entity in entities:
+            all_roles.update(entity.relation_counts or {})
+        all_roles = sorted(all_roles)
+        for roles in (all_roles, ["Alias"], ["Released On", "Member Of"], []):
+            actual = SqliteEntity.roles_to_relation_counts(entities, roles)
+            assert list(actual) == [expected_count(_, roles) for _ in entities]
+        assert any(SqliteEntity.roles_to_relation_counts(entities, all_roles))
+        # Entities without a vector build it from their JSON.
+        for entity in entities[:20]:
+            count = entity.roles_to_relation_count(all_roles)
+            entity.role_counts = None
+            assert entity.roles_to_relation_count(all_roles) == count
+
+    def test_role_counts_02(self):
+        # Role counts vectors are rewritten in batches.
+        expected = {_.entity_key: _.role_counts for _ in SqliteEntity.select()}
+        SqliteEntity.update(role_counts=None).execute()
+        for entity_type in (EntityType.ARTIST, EntityType.LABEL):
+            entity_ids = [_[1] for _ in expected if _[0] == entity_type]
+            SqliteEntity.update_role_counts(entity_type, entity_ids)
+        actual = {_.entity_key: _.role_counts for _ in SqliteEntity.select()}
+        assert any(expected.values())
+        assert actual == expected
@@ -0,0 +1,46 @@
+import gzip
+import logging
+import unittest
+
+from discograph import database
+from discograph.config import SqliteTestConfiguration
+from discograph.library.bootstrapper import Bootstrapper
+from discograph.library.discogs_model import DiscogsModel
+from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from discograph.logging_config import setup_logging, shutdown_logging
+
+log = logging.getLogger(__name__)
+
+
+class TestSqliteEntityBootstrap(unittest.TestCase):
+    def setUp(self):
+        setup_logging(is_testing=True)
+        log.info("setup temp sqlite DB")
+        database.setup_database(vars(SqliteTestConfiguration), bootstrap=False)
+
+    def tearDown(self):
+        log.info("cleanup temp sqlite DB")
+        database.shutdown_database()
+        shutdown_logging()
+
+    def test_bootstrap_pass_one_sharded_01(self):
+        expected = 0
+        file_path = Bootstrapper.get_xml_path("artist")
+        with gzip.GzipFile(file_path, "r") as file_pointer:
+            for element in Bootstrapper.iterparse(file_pointer, "artist"):
+                if SqliteEntity.tags_to_fields(element).get("name"):
+                    expected += 1
+
+        SqliteEntity.drop_table(True)
+        SqliteEntity.create_table(True)
+        shard_size = Bootstrapper.shard_size
+        Bootstrapper.shard_size = 256 * 1024
+        try:
+            DiscogsModel.bootstrap_pass_one_sharded(
+                SqliteEntity, "artist", "entity_id", skip_without=["name"]
+            )
+        finally:
+            Bootstrapper.shard_size = shard_size
+        assert len(SqliteEntity) == expected
+        entity = SqliteEntity.get(entity_id=3)
+        assert entity.name == "Josh Wink"
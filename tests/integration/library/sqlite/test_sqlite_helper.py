@@ -0,0 +1,56 @@
+import json
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.cache import cache_manager
+from discograph.library.database_helper import DatabaseHelper
+from discograph.library.sqlite.sqlite_helper import SqliteHelper
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+class TestSqliteHelper(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteHelper, self).setUp()
+
+    def test_get_network_page_01(self):
+        # Pages hold the nodes and links of the network on them.
+        roles = DatabaseHelper.DEFAULT_ROLES + ("Released On",)
+        network = SqliteHelper.get_network(
+            245, EntityType.LABEL, roles=roles, page_size=50
+        )
+        assert network["pages"] > 1
+        for page in (1, network["pages"]):
+            actual = SqliteHelper.get_network_page(
+                245, EntityType.LABEL, page, roles=roles, page_size=50
+            )
+            assert actual["page"] == page
+            assert actual["pages"] == network["pages"]
+            assert actual["center"] == network["center"]
+            assert actual["nodes"] == [
+                _ for _ in network["nodes"] if page in _["pages"]
+            ]
+            assert actual["links"] == [
+                _ for _ in network["links"] if page in _["pages"]
+            ]
+            cache_key = DatabaseHelper.network_cache_key(
+                EntityType.LABEL, 245, roles=roles, page_size=50, page=page
+            )
+            expected = json.loads(json.dumps(actual))
+            assert json.loads(cache_manager.get_json(cache_key)) == expected
+        assert (
+            SqliteHelper.get_network_page(
+                245, EntityType.LABEL, network["pages"] + 1, roles=roles, page_size=50
+            )
+            is None
+        )
+
+    def test_page_size_01(self):
+        # Page sizes are clamped, and are not part of unpaged networks' keys.
+        assert DatabaseHelper.page_size(None) is None
+        assert DatabaseHelper.page_size(1) == DatabaseHelper.MIN_PAGE_SIZE
+        assert DatabaseHelper.page_size(50) == 50
+        assert DatabaseHelper.page_size(DatabaseHelper.MAX_NODES) is None
+        assert DatabaseHelper.page_size(50, on_mobile=True) is None
+        assert DatabaseHelper.network_cache_key(
+            EntityType.LABEL, 245, page_size=10000
+        ) == DatabaseHelper.network_cache_key(EntityType.LABEL, 245)
@@ -0,0 +1,90 @@
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.models.content_hash import ContentHash
+from discograph.library.sqlite.sqlite_bootstrapper import SqliteBootstrapper
+from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from discograph.library.sqlite.sqlite_relation import SqliteRelation
+from discograph.library.sqlite.sqlite_release import SqliteRelease
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+class TestSqliteIncrementalBootstrap(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteIncrementalBootstrap, self).setUp()
+
+    @staticmethod
+    def snapshot():
+        entities = {
+            _.entity_key: (_.name, _.entities, _.relation_counts)
+            for _ in SqliteEntity.select()
+        }
+        releases = {_.id: (_.title, _.labels) for _ in SqliteRelease.select()}
+        relations = {_.link_key: _.releases for _ in SqliteRelation.select()}
+        return entities, releases, relations
+
+    def test_01(self):
+        # Unchanged dumps touch nothing.
+        expected = self.snapshot()
+        stats = SqliteBootstrapper.update_models()
+        for xml_tag in ("artist", "label", "release"):
+            assert stats[xml_tag]["unchanged"] > 0
+            assert stats[xml_tag]["inserted"] == 0
+            assert stats[xml_tag]["updated"] == 0
+            assert stats[xml_tag]["deleted"] == 0
+        assert stats["relations"] == dict(removed=0, written=0)
+        assert self.snapshot() == expected
+
+    def test_02(self):
+        # Changed, missing and stale records are brought back in line.
+        expected = self.snapshot()
+        SqliteEntity.update(name="Wrong Name").where(
+            SqliteEntity.entity_type == EntityType.ARTIST,
+            SqliteEntity.entity_id == 3,
+        ).execute()
+        ContentHash.update(content_hash="stale").where(
+            ContentHash.kind == "artist", ContentHash.record_id == 3
+        ).execute()
+        release = SqliteRelease.select().order_by(SqliteRelease.id).first()
+        for relation in SqliteRelation.select():
+            releases = relation.releases or {}
+            if releases.pop(str(release.id), False) is not False:
+                if releases:
+                    relation.releases = releases
+                    relation.save()
+                else:
+                    relation.delete_instance()
+        release.delete_instance()
+        ContentHash.delete_hashes("release", [release.id])
+        SqliteRelease.create(
+            id=999999999,
+            title="Gone",
+            artists=[],
+            companies=[],
+            extra_artists=[],
+            formats=[],
+            labels=[],
+            tracklist=[],
+        )
+        ContentHash.upsert_hashes("release", [(999999999, "gone")])
+
+        stats = SqliteBootstrapper.update_models()
+        assert stats["artist"]["updated"] == 1
+        assert stats["release"]["inserted"] == 1
+        assert stats["release"]["deleted"] == 1
+        assert stats["relations"]["written"] > 0
+        assert self.snapshot() == expected
+
+    def test_03(self):
+        # Stored record ids page along the primary key in ascending chunks.
+        record_ids = [
+            _.record_id
+            for _ in ContentHash.select()
+            .where(ContentHash.kind == "release")
+            .order_by(ContentHash.record_id)
+        ]
+        chunks = list(ContentHash.iter_record_ids("release", chunk_size=2))
+        assert [_ for chunk in chunks for _ in chunk] == record_ids
+        assert all(len(_) <= 2 for _ in chunks)
+        assert ContentHash.get_hashes("release", record_ids[:2]).keys() == set(
+            record_ids[:2]
+        )
@@ -0,0 +1,78 @@
+import json
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.cache import cache_manager
+from discograph.library.database_helper import DatabaseHelper
+from discograph.library.models.precomputed_network import (
+    PrecomputedNetwork,
+    StagedPrecomputedNetwork,
+)
+from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from discograph.library.sqlite.sqlite_helper import SqliteHelper
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+class TestSqlitePrecomputedNetwork(SqliteTestCase):
+    def setUp(self):
+        super(TestSqlitePrecomputedNetwork, self).setUp()
+
+    def tearDown(self):
+        PrecomputedNetwork.precompute(SqliteHelper, SqliteEntity, 0)
+
+    def test_01(self):
+        # The most related entities are precomputed, on desktop and mobile.
+        entity_keys = PrecomputedNetwork.top_entity_keys(SqliteEntity, 3)
+        assert entity_keys[0] == (EntityType.LABEL, 245)
+        PrecomputedNetwork.precompute(SqliteHelper, SqliteEntity, 3)
+        assert PrecomputedNetwork.select().count() == 6
+        for entity_type, entity_id in entity_keys:
+            entity = SqliteHelper.get_entity(entity_type, entity_id)
+            for on_mobile in (False, True):
+                cache_key = DatabaseHelper.network_cache_key(
+                    entity_type,
+                    entity_id,
+                    on_mobile=on_mobile,
+                    roles=DatabaseHelper.DEFAULT_ROLES,
+                )
+                expected = SqliteHelper.compute_network(
+                    entity, on_mobile=on_mobile, roles=DatabaseHelper.DEFAULT_ROLES
+                )
+                expected = json.loads(json.dumps(expected))
+                assert PrecomputedNetwork.get_data(cache_key) == expected
+
+    def test_02(self):
+        # get_network serves a precomputed network on a cache miss.
+        PrecomputedNetwork.precompute(SqliteHelper, SqliteEntity, 1)
+        cache_key = DatabaseHelper.network_cache_key(
+            EntityType.LABEL, 245, roles=DatabaseHelper.DEFAULT_ROLES
+        )
+        row = PrecomputedNetwork.get(PrecomputedNetwork.cache_key == cache_key)
+        data = json.loads(row.data)
+        data["center"]["name"] = "Precomputed"
+        row.data = json.dumps(data)
+        row.save()
+        cache_manager.delete(cache_key)
+        network = SqliteHelper.get_network(
+            245, EntityType.LABEL, roles=DatabaseHelper.DEFAULT_ROLES
+        )
+        assert network["center"]["name"] == "Precomputed"
+        # Bootstrap runs replace the stored networks.
+        PrecomputedNetwork.precompute(SqliteHelper, SqliteEntity, 0)
+        assert PrecomputedNetwork.get_data(cache_key) is None
+
+    def test_03(self):
+        # Precomputing swaps the networks in and invalidates cached ones.
+        kwargs = dict(roles=DatabaseHelper.DEFAULT_ROLES)
+        network = SqliteHelper.get_network(245, EntityType.LABEL, **kwargs)
+        PrecomputedNetwork.precompute(SqliteHelper, SqliteEntity, 1)
+        assert not StagedPrecomputedNetwork.table_exists()
+        cache_key = DatabaseHelper.network_cache_key(EntityType.LABEL, 245, **kwargs)
+        row = PrecomputedNetwork.get(PrecomputedNetwork.cache_key == cache_key)
+        assert json.loads(row.data) == json.loads(json.dumps(network))
+        data = json.loads(row.data)
+        data["center"]["name"] = "Precomputed"
+        row.data = json.dumps(data)
+        row.save()
+        network = SqliteHelper.get_network(245, EntityType.LABEL, **kwargs)
+        assert network["center"]["name"] == "Precomputed"
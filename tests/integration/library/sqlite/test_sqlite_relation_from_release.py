@@ -1743,3 +1743,36 @@ class TestSqliteRelationFromRelease(SqliteTestCase):
             },
         ]
         assert actual == expected
+
+    def test_upsert_relations_01(self):
+        key = dict(
+            entity_one_type=EntityType.ARTIST,
+            entity_one_id=-100,
+            entity_two_type=EntityType.LABEL,
+            entity_two_id=-200,
+            role="Released On",
+        )
+        SqliteRelation.upsert_relations([dict(key, releases={1: 1999, 2: None})])
+        SqliteRelation.upsert_relations([dict(key, releases={2: None, 3: 2001})])
+        SqliteRelation.upsert_relations([dict(key, releases={})])
+        relation = SqliteRelation.get(**key)
+        assert relation.releases == {"1": 1999, "2": None, "3": 2001}
+        relation.delete_instance()
+
+    def test_bootstrap_pass_one_shuffled_01(self):
+        def snapshot():
+            query = SqliteRelation.select().order_by(
+                SqliteRelation.entity_one_type,
+                SqliteRelation.entity_one_id,
+                SqliteRelation.entity_two_type,
+                SqliteRelation.entity_two_id,
+                SqliteRelation.role,
+            )
+            return [(_.link_key, _.releases) for _ in query]
+
+        expected = snapshot()
+        SqliteRelation.delete().execute()
+        SqliteRelation.bootstrap_pass_one_shuffled()
+        actual = snapshot()
+        assert len(expected) > 0
+        assert actual == expected
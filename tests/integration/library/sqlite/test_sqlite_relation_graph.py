@@ -0,0 +1,106 @@
+import tempfile
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.relation_graph import RelationGraph
+from discograph.library.sqlite.sqlite_entity import SqliteEntity
+from discograph.library.sqlite.sqlite_relation import SqliteRelation
+from discograph.library.sqlite.sqlite_relation_grapher import SqliteRelationGrapher
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+class TestSqliteRelationGraph(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteRelationGraph, self).setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        RelationGraph.build(SqliteEntity, SqliteRelation, self.directory.name)
+        self.graph = RelationGraph.load(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_same_network(self, entity, **kwargs):
+        expected = SqliteRelationGrapher(entity, **kwargs)()
+        actual = SqliteRelationGrapher(entity, graph=self.graph, **kwargs)()
+        assert actual == expected
+        return actual
+
+    def test_01(self):
+        # Relations of a node, both ways round, filtered by role.
+        relation = SqliteRelation.select().where(SqliteRelation.role == "Recorded At")
+        relation = relation.first()
+        index = self.graph.index(relation.entity_two_key)
+        assert 0 <= index
+        assert self.graph.decode(self.graph.keys[index]) == relation.entity_two_key
+        edges = self.graph.edges(index, ["Recorded At"])
+        edge = (relation.entity_one_key, relation.entity_two_key, "Recorded At")
+        assert edge in edges
+        assert all(_[2] == "Recorded At" for _ in edges)
+        assert self.graph.edges(index, []) == []
+        assert self.graph.index((EntityType.LABEL, 999999999)) == -1
+
+    def test_02(self):
+        # Relation counts agree with the counts from entity pass three.
+        query = SqliteEntity.select().where(SqliteEntity.relation_counts.is_null(False))
+        for entity in query.limit(50):
+            roles = [_ for _ in entity.relation_counts if _ != "Alias"]
+            index = self.graph.index(entity.entity_key)
+            count = self.graph.relation_count(index, roles)
+            assert count == entity.roles_to_relation_count(roles)
+
+    def test_03(self):
+        artist = SqliteEntity.get(entity_type=EntityType.ARTIST, name="Seefeel")
+        network = self.assert_same_network(
+            artist, degree=1, roles=["Alias", "Member Of"]
+        )
+        assert network["links"]
+
+    def test_04(self):
+        artist = SqliteEntity.get(entity_type=EntityType.ARTIST, name="Justin Fletcher")
+        roles = ["Alias", "Member Of"]
+        self.assert_same_network(artist, degree=2, max_nodes=5, roles=roles)
+        self.assert_same_network(artist, degree=2, link_ratio=2, roles=roles)
+
+    def test_05(self):
+        artist = SqliteEntity.get(entity_type=EntityType.ARTIST, entity_id=489350)
+        self.assert_same_network(artist, degree=12, roles=["Alias", "Member Of"])
+
+    def test_06(self):
+        label = SqliteEntity.get(
+            entity_type=EntityType.LABEL, name="Lab Studio, Berlin"
+        )
+        network = self.assert_same_network(label, degree=2, roles=["Recorded At"])
+        assert network["links"]
+
+    def test_07(self):
+        # Batched counts and expansion agree with the per-node ones.
+        roles = ["Recorded At", "Mastered At", "Alias", "Member Of"]
+        role_mask = self.graph.role_mask(roles)
+        indices = range(min(len(self.graph), 200))
+        counts = self.graph.relation_counts(indices, role_mask)
+        for index, count in zip(indices, counts):
+            assert count == self.graph.relation_count(index, roles)
+        entity_one, entity_two, codes = self.graph.expand(indices, role_mask)
+        assert len(codes) == counts.sum()
+        assert all(role_mask[codes])
+        assert len(self.graph.expand([], role_mask)[2]) == 0
+
+    def test_08(self):
+        # Pre-pruning by relation count matches the database search.
+        artist = SqliteEntity.get(entity_type=EntityType.ARTIST, entity_id=3)
+        roles = ["Released On", "Manufactured By", "Marketed By"]
+        network = self.assert_same_network(artist, degree=2, link_ratio=1, roles=roles)
+        assert network["links"]
+
+    def test_09(self):
+        # Building in small chunks yields the same arrays.
+        chunk_size = RelationGraph.BUILD_CHUNK_SIZE
+        RelationGraph.BUILD_CHUNK_SIZE = 7
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                graph = RelationGraph.build(SqliteEntity, SqliteRelation, directory)
+        finally:
+            RelationGraph.BUILD_CHUNK_SIZE = chunk_size
+        assert graph.role_names == self.graph.role_names
+        for name in RelationGraph.ARRAY_NAMES:
+            assert (getattr(graph, name) == getattr(self.graph, name)).all()
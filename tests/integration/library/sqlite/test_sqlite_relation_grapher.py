@@ -1,5 +1,6 @@
 import json
 import logging
+import math
 
 from discograph import utils
 from discograph.library import EntityType
@@ -117,7 +118,7 @@ class TestSqliteRelationGrapher(SqliteTestCase):
                         "type": "artist"                
                     },                
                     {                
-                        "cluster": 2,                
+                        "cluster": 1,                
                         "distance": 1,                
                         "id": 41103,                
                         "key": "artist-41103",                
@@ -133,7 +134,7 @@ class TestSqliteRelationGrapher(SqliteTestCase):
                         "type": "artist"                
                     },                
                     {                
-                        "cluster": 1,                
+                        "cluster": 2,                
                         "distance": 1,                
                         "id": 51674,                
                         "key": "artist-51674",                
@@ -216,157 +217,164 @@ class TestSqliteRelationGrapher(SqliteTestCase):
 
         expected = utils.normalize(
             """
-            {            
-                "center": {                
-                    "key": "artist-489350",                
-                    "name": "Justin Fletcher"                
-                },                
-                "links": [                
-                    {                
-                        "key": "artist-115880-member-of-artist-2239",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "role": "Member Of",                
-                        "source": "artist-115880",                
-                        "target": "artist-2239"                
-                    },                
-                    {                
-                        "key": "artist-41103-member-of-artist-2239",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "role": "Member Of",                
-                        "source": "artist-41103",                
-                        "target": "artist-2239"                
-                    },                
-                    {                
-                        "key": "artist-489350-member-of-artist-2239",                
-                        "pages": [                
-                            1              
-                        ],                
-                        "role": "Member Of",                
-                        "source": "artist-489350",                
-                        "target": "artist-2239"                
-                    },                
-                    {                
-                        "key": "artist-51674-member-of-artist-2239",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "role": "Member Of",                
-                        "source": "artist-51674",                
-                        "target": "artist-2239"                
-                    },                
-                    {                
-                        "key": "artist-66803-member-of-artist-2239",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "role": "Member Of",                
-                        "source": "artist-66803",                
-                        "target": "artist-2239"                
-                    }                
-                ],                
-                "nodes": [                
-                    {                
-                        "distance": 1,                
-                        "id": 2239,                
-                        "key": "artist-2239",                
-                        "links": [                
-                            "artist-115880-member-of-artist-2239",                
-                            "artist-41103-member-of-artist-2239",                
-                            "artist-489350-member-of-artist-2239",                
-                            "artist-51674-member-of-artist-2239",                
-                            "artist-66803-member-of-artist-2239"                
-                        ],                
-                        "missing": 0,           
-                        "name": "Seefeel",                
-                        "pages": [                
-                            1              
-                        ],                
-                        "size": 5,                
-                        "type": "artist"                
-                    },                
-                    {                
-                        "cluster": 2,                
-                        "distance": 2,                
-                        "id": 41103,                
-                        "key": "artist-41103",                
-                        "links": [                
-                            "artist-41103-member-of-artist-2239"                
-                        ],                
-                        "missing": 1,                
-                        "name": "Mark Van Hoen",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "size": 0,                
-                        "type": "artist"                
-                    },                
-                    {                
-                        "cluster": 1,                
-                        "distance": 2,                
-                        "id": 51674,                
-                        "key": "artist-51674",                
-                        "links": [                
-                            "artist-51674-member-of-artist-2239"                
-                        ],                
-                        "missing": 3,                
-                        "name": "Mark Clifford",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "size": 0,                
-                        "type": "artist"                
-                    },                
-                    {                
-                        "distance": 2,                
-                        "id": 66803,                
-                        "key": "artist-66803",                
-                        "links": [                
-                            "artist-66803-member-of-artist-2239"                
-                        ],                
-                        "missing": 0,                
-                        "name": "Daren Seymour",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "size": 0,                
-                        "type": "artist"                
-                    },                
-                    {                
-                        "distance": 2,                
-                        "id": 115880,                
-                        "key": "artist-115880",                
-                        "links": [                
-                            "artist-115880-member-of-artist-2239"                
-                        ],                
-                        "missing": 0,                
-                        "name": "Sarah Peacock",                
-                        "pages": [                
-                            1                
-                        ],                
-                        "size": 0,                
-                        "type": "artist"                
-                    },                
-                    {                
-                        "distance": 0,                
-                        "id": 489350,                
-                        "key": "artist-489350",                
-                        "links": [                
-                            "artist-489350-member-of-artist-2239"                
-                        ],                
-                        "missing": 0,                
-                        "name": "Justin Fletcher",                
-                        "pages": [                
-                            1              
-                        ],                
-                        "size": 0,                
-                        "type": "artist"                
-                    }                
-                ],                
-                "pages": 1                
+            {
+                "center": {
+                    "key": "artist-489350",
+                    "name": "Justin Fletcher"
+                },
+                "links": [
+                    {
+                        "key": "artist-115880-member-of-artist-2239",
+                        "pages": [
+                            2
+                        ],
+                        "role": "Member Of",
+                        "source": "artist-115880",
+                        "target": "artist-2239"
+                    },
+                    {
+                        "key": "artist-41103-member-of-artist-2239",
+                        "pages": [
+                            1
+                        ],
+                        "role": "Member Of",
+                        "source": "artist-41103",
+                        "target": "artist-2239"
+                    },
+                    {
+                        "key": "artist-489350-member-of-artist-2239",
+                        "pages": [
+                            1,
+                            2
+                        ],
+                        "role": "Member Of",
+                        "source": "artist-489350",
+                        "target": "artist-2239"
+                    },
+                    {
+                        "key": "artist-51674-member-of-artist-2239",
+                        "pages": [
+                            2
+                        ],
+                        "role": "Member Of",
+                        "source": "artist-51674",
+                        "target": "artist-2239"
+                    },
+                    {
+                        "key": "artist-66803-member-of-artist-2239",
+                        "pages": [
+                            1
+                        ],
+                        "role": "Member Of",
+                        "source": "artist-66803",
+                        "target": "artist-2239"
+                    }
+                ],
+                "nodes": [
+                    {
+                        "distance": 1,
+                        "id": 2239,
+                        "key": "artist-2239",
+                        "links": [
+                            "artist-115880-member-of-artist-2239",
+                            "artist-41103-member-of-artist-2239",
+                            "artist-489350-member-of-artist-2239",
+                            "artist-51674-member-of-artist-2239",
+                            "artist-66803-member-of-artist-2239"
+                        ],
+                        "missing": 0,
+                        "missingByPage": {
+                            "1": 2,
+                            "2": 2
+                        },
+                        "name": "Seefeel",
+                        "pages": [
+                            1,
+                            2
+                        ],
+                        "size": 5,
+                        "type": "artist"
+                    },
+                    {
+                        "cluster": 1,
+                        "distance": 2,
+                        "id": 41103,
+                        "key": "artist-41103",
+                        "links": [
+                            "artist-41103-member-of-artist-2239"
+                        ],
+                        "missing": 1,
+                        "name": "Mark Van Hoen",
+                        "pages": [
+                            1
+                        ],
+                        "size": 0,
+                        "type": "artist"
+                    },
+                    {
+                        "cluster": 2,
+                        "distance": 2,
+                        "id": 51674,
+                        "key": "artist-51674",
+                        "links": [
+                            "artist-51674-member-of-artist-2239"
+                        ],
+                        "missing": 3,
+                        "name": "Mark Clifford",
+                        "pages": [
+                            2
+                        ],
+                        "size": 0,
+                        "type": "artist"
+                    },
+                    {
+                        "distance": 2,
+                        "id": 66803,
+                        "key": "artist-66803",
+                        "links": [
+                            "artist-66803-member-of-artist-2239"
+                        ],
+                        "missing": 0,
+                        "name": "Daren Seymour",
+                        "pages": [
+                            1
+                        ],
+                        "size": 0,
+                        "type": "artist"
+                    },
+                    {
+                        "distance": 2,
+                        "id": 115880,
+                        "key": "artist-115880",
+                        "links": [
+                            "artist-115880-member-of-artist-2239"
+                        ],
+                        "missing": 0,
+                        "name": "Sarah Peacock",
+                        "pages": [
+                            2
+                        ],
+                        "size": 0,
+                        "type": "artist"
+                    },
+                    {
+                        "distance": 0,
+                        "id": 489350,
+                        "key": "artist-489350",
+                        "links": [
+                            "artist-489350-member-of-artist-2239"
+                        ],
+                        "missing": 0,
+                        "name": "Justin Fletcher",
+                        "pages": [
+                            1,
+                            2
+                        ],
+                        "size": 0,
+                        "type": "artist"
+                    }
+                ],
+                "pages": 2
             }
         """
         )
@@ -458,7 +466,7 @@ class TestSqliteRelationGrapher(SqliteTestCase):
                         "type": "artist"
                     },
                     {
-                        "cluster": 2,
+                        "cluster": 1,
                         "distance": 2,
                         "id": 41103,
                         "key": "artist-41103",
@@ -474,7 +482,7 @@ class TestSqliteRelationGrapher(SqliteTestCase):
                         "type": "artist"
                     },
                     {
-                        "cluster": 1,
+                        "cluster": 2,
                         "distance": 2,
                         "id": 51674,
                         "key": "artist-51674",
@@ -843,3 +851,25 @@ class TestSqliteRelationGrapher(SqliteTestCase):
         )
         network = grapher.__call__()  # Should not error.
         assert network is not None
+
+    def test___call___06(self):
+        # Networks are paged into the page size.
+        label = SqliteEntity.get(entity_type=EntityType.LABEL, entity_id=245)
+        roles = ["Alias", "Member Of", "Released On"]
+        grapher = SqliteRelationGrapher(
+            label,
+            degree=12,
+            roles=roles,
+            page_size=50,
+        )
+        network = grapher.__call__()
+        assert network["pages"] == math.ceil(len(network["nodes"]) / 50)
+        assert network["pages"] > 1
+        pages = set(range(1, network["pages"] + 1))
+        for page in pages:
+            assert any(page in _["pages"] for _ in network["nodes"])
+        for node in network["nodes"]:
+            assert node["pages"] and set(node["pages"]) <= pages
+        # Links across pages are on none.
+        for link in network["links"]:
+            assert set(link["pages"]) <= pages
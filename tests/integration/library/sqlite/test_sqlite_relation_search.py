@@ -0,0 +1,66 @@
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.sqlite.sqlite_relation import SqliteRelation
+from tests.integration.library.sqlite.sqlite_test_case import SqliteTestCase
+
+
+class TestSqliteRelationSearch(SqliteTestCase):
+    def setUp(self):
+        super(TestSqliteRelationSearch, self).setUp()
+
+    @staticmethod
+    def query_plan(query):
+        sql, params = query.sql()
+        cursor = SqliteRelation._meta.database.execute_sql(
+            f"EXPLAIN QUERY PLAN {sql}", params
+        )
+        return [row[-1] for row in cursor.fetchall()]
+
+    def assert_uses_indexes(self, query, count):
+        plan = self.query_plan(query)
+        steps = [_ for _ in plan if _.startswith(("SCAN", "SEARCH"))]
+        assert len(steps) == count, plan
+        assert all(_.startswith("SEARCH") and "USING INDEX" in _ for _ in steps), plan
+        assert any("entity_two_type=? AND entity_two_id=?" in _ for _ in steps), plan
+
+    def test_01(self):
+        # Each direction of a search is an index search.
+        keys = [(EntityType.ARTIST, 2239), (EntityType.LABEL, 245)]
+        self.assert_uses_indexes(SqliteRelation.search(2239, query_only=True), 2)
+        query = SqliteRelation.search_multi_query(keys[:1], roles=["Member Of"])
+        self.assert_uses_indexes(query, 2)
+        self.assert_uses_indexes(SqliteRelation.search_multi_query(keys), 4)
+
+    def test_02(self):
+        # The UNION ALL queries find what the OR queries found.
+        keys = [(EntityType.ARTIST, 2239), (EntityType.LABEL, 245)]
+        for roles in (None, ["Member Of", "Released On"]):
+            relations = SqliteRelation.search_multi(keys, roles=roles)
+            where_clause = (
+                (SqliteRelation.entity_one_type == EntityType.ARTIST)
+                & (SqliteRelation.entity_one_id == 2239)
+            ) | (
+                (SqliteRelation.entity_two_type == EntityType.ARTIST)
+                & (SqliteRelation.entity_two_id == 2239)
+            )
+            where_clause |= (
+                (SqliteRelation.entity_one_type == EntityType.LABEL)
+                & (SqliteRelation.entity_one_id == 245)
+            ) | (
+                (SqliteRelation.entity_two_type == EntityType.LABEL)
+                & (SqliteRelation.entity_two_id == 245)
+            )
+            if roles:
+                where_clause &= SqliteRelation.role.in_(roles)
+            expected = SqliteRelation.select().where(where_clause)
+            assert sorted(relations) == sorted(_.link_key for _ in expected)
+            assert relations
+        found = SqliteRelation.search(245, entity_type=EntityType.LABEL)
+        assert sorted(_.link_key for _ in found) == sorted(
+            _.link_key for _ in SqliteRelation.search_multi(keys[1:]).values()
+        )
+        lh = [_ for _ in relations.values() if _.role == "Member Of"]
+        lh_keys = [_.entity_one_key for _ in lh]
+        rh_keys = [_.entity_two_key for _ in lh]
+        found = SqliteRelation.search_bimulti(lh_keys, rh_keys, roles=["Member Of"])
+        assert set(_.link_key for _ in lh) <= set(found)
@@ -1,5 +1,8 @@
+import gzip
 import json
 
+import brotli
+
 from discograph.app import app
 from tests.integration.app_test_case import AppTestCase
 
@@ -28,6 +31,38 @@ class TestAPI(AppTestCase):
         response = self.app.get("/api/label/network/1")
         assert response.status == "200 OK"
 
+    def test_network_04(self):
+        # Cached networks are sent in the encoding accepted, with an ETag.
+        path = "/api/artist/network/2239"
+        response = self.app.get(path)
+        expected = json.loads(response.data.decode("utf-8"))
+        etag = response.headers["ETag"]
+        response = self.app.get(path, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.data)) == expected
+        response = self.app.get(path, headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["Content-Encoding"] == "br"
+        assert json.loads(brotli.decompress(response.data)) == expected
+        assert response.headers["ETag"] == etag
+        response = self.app.get(path, headers={"If-None-Match": etag})
+        assert response.status == "304 NOT MODIFIED"
+
+    def test_network_05(self):
+        # Pages of a network are served on their own.
+        path = "/api/artist/network/2239"
+        response = self.app.get(f"{path}?page_size=10")
+        network = json.loads(response.data.decode("utf-8"))
+        response = self.app.get(f"{path}/page/1?page_size=10")
+        assert response.status == "200 OK"
+        page = json.loads(response.data.decode("utf-8"))
+        assert page["page"] == 1
+        assert page["pages"] == network["pages"]
+        assert page["nodes"] == [_ for _ in network["nodes"] if 1 in _["pages"]]
+        response = self.app.get(f"{path}/page/{network['pages'] + 1}?page_size=10")
+        assert response.status == "404 NOT FOUND"
+        response = self.app.get(f"{path}/page/1?page_size=0")
+        assert response.status == "400 BAD REQUEST"
+
     def test_search_01(self):
         response = self.app.get("/api/search/Morris")
         assert response.status == "200 OK"
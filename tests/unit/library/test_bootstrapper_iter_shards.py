@@ -0,0 +1,65 @@
+import gzip
+import io
+import unittest
+
+from discograph.config import XmlParserType
+from discograph.library.bootstrapper import Bootstrapper
+
+
+class TestBootstrapperIterShards(unittest.TestCase):
+    @staticmethod
+    def element_to_tuple(element):
+        return (
+            element.tag,
+            dict(element.attrib),
+            element.text,
+            tuple(TestBootstrapperIterShards.element_to_tuple(_) for _ in element),
+        )
+
+    def assert_shards_agree(self, tag):
+        file_path = Bootstrapper.get_xml_path(tag, test=True)
+        with gzip.GzipFile(file_path, "r") as file_pointer:
+            iterator = Bootstrapper.iterparse(
+                file_pointer, tag, XmlParserType.ELEMENTTREE
+            )
+            expected = [self.element_to_tuple(_) for _ in iterator]
+        with gzip.GzipFile(file_path, "r") as file_pointer:
+            # Small blocks split tags across reads.
+            shards = list(
+                Bootstrapper.iter_shards(
+                    file_pointer, tag, shard_size=64 * 1024, block_size=997
+                )
+            )
+        assert len(shards) > 1
+        actual = []
+        for shard in shards:
+            assert shard.startswith(f"<{tag}".encode())
+            assert shard.endswith(f"</{tag}>".encode())
+            iterator = Bootstrapper.iterparse_shard(shard, tag, XmlParserType.LXML)
+            actual.extend(self.element_to_tuple(_) for _ in iterator)
+        assert len(actual) == len(expected)
+        assert actual == expected
+
+    def test_artists(self):
+        self.assert_shards_agree("artist")
+
+    def test_labels(self):
+        self.assert_shards_agree("label")
+
+    def test_releases(self):
+        self.assert_shards_agree("release")
+
+    def test_nested_and_self_closing(self):
+        source = io.BytesIO(
+            b"<labels>\n"
+            b'<label><id>1</id><sublabels><label id="2">A</label></sublabels></label>\n'
+            b'<label id="3"/>\n'
+            b"<label ><id>4</id></label >\n"
+            b"</labels>\n"
+        )
+        shards = list(Bootstrapper.iter_shards(source, "label", shard_size=1))
+        assert shards == [
+            b'<label><id>1</id><sublabels><label id="2">A</label></sublabels></label>',
+            b'<label id="3"/>',
+            b"<label ><id>4</id></label >",
+        ]
@@ -0,0 +1,44 @@
+import gzip
+import unittest
+
+from discograph.config import XmlParserType
+from discograph.library.bootstrapper import Bootstrapper
+
+
+class TestBootstrapperIterparse(unittest.TestCase):
+    @staticmethod
+    def element_to_tuple(element):
+        return (
+            element.tag,
+            dict(element.attrib),
+            element.text,
+            tuple(TestBootstrapperIterparse.element_to_tuple(_) for _ in element),
+        )
+
+    def parse(self, tag, xml_parser):
+        file_path = Bootstrapper.get_xml_path(tag, test=True)
+        with gzip.GzipFile(file_path, "r") as file_pointer:
+            iterator = Bootstrapper.iterparse(file_pointer, tag, xml_parser)
+            iterator = Bootstrapper.clean_elements(iterator)
+            return [self.element_to_tuple(_) for _ in iterator]
+
+    def assert_parsers_agree(self, tag):
+        expected = self.parse(tag, XmlParserType.ELEMENTTREE)
+        actual = self.parse(tag, XmlParserType.LXML)
+        assert len(expected) > 0
+        assert len(actual) == len(expected)
+        assert actual == expected
+
+    def test_artists(self):
+        self.assert_parsers_agree("artist")
+
+    def test_labels(self):
+        # Labels nest <label> elements inside <sublabels>.
+        self.assert_parsers_agree("label")
+
+    def test_releases(self):
+        self.assert_parsers_agree("release")
+
+    def test_invalid_parser(self):
+        with self.assertRaises(ValueError):
+            Bootstrapper.iterparse(None, "artist", "sax")
@@ -0,0 +1,34 @@
+import unittest
+from unittest import mock
+
+from discograph.library import EntityType
+from discograph.library.name_corpus import NameCorpus
+
+
+class TestNameCorpus(unittest.TestCase):
+    def test_01(self):
+        corpus = NameCorpus()
+        corpus.add(EntityType.ARTIST, "Josh Wink", 3)
+        corpus.add(EntityType.ARTIST, "Josh Wink", 7)
+        corpus.add(EntityType.LABEL, "Josh Wink", 11)
+        assert len(corpus) == 2
+        assert corpus[(EntityType.ARTIST, "Josh Wink")] == 3
+        assert corpus[(1, "Josh Wink")] == 3
+        assert corpus[(2, "Josh Wink")] == 11
+        assert (EntityType.ARTIST, "Ovum") not in corpus
+        assert corpus.get((EntityType.ARTIST, "Ovum")) is None
+
+    def test_02(self):
+        corpus = NameCorpus()
+        corpus[(2, "Ovum")] = -1
+        assert corpus[(EntityType.LABEL, "Ovum")] == -1
+
+    def test_03(self):
+        # Workers forked inside sharing() find the parent's corpus.
+        corpus = NameCorpus()
+        with mock.patch.object(NameCorpus, "from_entities", return_value=corpus):
+            with NameCorpus.sharing(object, "pass two") as shared:
+                assert shared is corpus
+                assert NameCorpus.shared(object, "pass two") is corpus
+                assert NameCorpus.from_entities.call_count == 1
+        assert NameCorpus._shared is None
@@ -0,0 +1,73 @@
+import datetime
+import unittest
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.postgres.postgres_copy_loader import PostgresCopyLoader
+from discograph.library.postgres.postgres_entity import PostgresEntity
+from discograph.library.postgres.postgres_relation import PostgresRelation
+from discograph.library.postgres.postgres_release import PostgresRelease
+
+
+class TestPostgresCopyLoader(unittest.TestCase):
+    def rows(self, loader):
+        return [_.split("\t") for _ in loader._buffer.getvalue().splitlines()]
+
+    def test_entity_row(self):
+        loader = PostgresCopyLoader(PostgresEntity)
+        loader.add(
+            dict(
+                entity_id=3,
+                entity_type=EntityType.ARTIST,
+                name="Josh\tWink\\",
+                search_content=PostgresEntity.string_to_tsvector("Josh Wink"),
+                metadata={"profile": "a\nb"},
+                random=0.5,
+            )
+        )
+        row = dict(zip([_.column_name for _ in loader.fields], *self.rows(loader)))
+        assert loader.uses_staging_table
+        assert row["entity_id"] == "3"
+        assert row["entity_type"] == "1"
+        assert row["name"] == "Josh\\tWink\\\\"
+        assert row["search_content"] == "josh wink"
+        assert row["metadata"] == '{"profile": "a\\\\nb"}'
+        assert row["relation_counts"] == "\\N"
+        assert row["random"] == "0.5"
+
+    def test_release_row(self):
+        loader = PostgresCopyLoader(PostgresRelease)
+        loader.add(
+            dict(
+                id=1,
+                title="Title",
+                genres=["Rock", 'Pop "Indie"'],
+                release_date=datetime.datetime(1999, 1, 2),
+            )
+        )
+        row = dict(zip([_.column_name for _ in loader.fields], *self.rows(loader)))
+        assert not loader.uses_staging_table
+        assert row["genres"] == '{"Rock","Pop \\\\"Indie\\\\""}'
+        assert row["release_date"] == "1999-01-02T00:00:00"
+        assert row["styles"] == "\\N"
+
+    def test_relation_upsert_sql(self):
+        loader = PostgresRelation.bulk_loader()
+        sql = loader._insert_staged_sql()
+        key = (
+            '"entity_one_type", "entity_one_id", "entity_two_type", '
+            '"entity_two_id", "role"'
+        )
+        assert loader.uses_staging_table
+        assert f'FROM "postgresrelation_copy" ORDER BY {key} ' in sql
+        assert f"ON CONFLICT ({key}) DO UPDATE SET" in sql
+
+    def test_extras(self):
+        flushed = []
+        loader = PostgresCopyLoader(PostgresRelease, on_flush=flushed.extend)
+        loader.add(dict(id=1, title="One"), extra=(1, "a"))
+        loader.add(dict(id=2, title="Two"))
+        loader.add(dict(id=3, title="Three"), extra=(3, "c"))
+        assert loader._pending == 3
+        assert loader._extras == [(1, "a"), (3, "c")]
+        assert flushed == []
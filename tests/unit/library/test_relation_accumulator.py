@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from discograph.library import EntityType
+from discograph.library.relation_accumulator import RelationAccumulator
+
+
+class TestRelationAccumulator(unittest.TestCase):
+    @staticmethod
+    def relation(entity_one_id, entity_two_id, release_id=None, year=None):
+        relation = dict(
+            entity_one_type=EntityType.ARTIST,
+            entity_one_id=entity_one_id,
+            entity_two_type=EntityType.LABEL,
+            entity_two_id=entity_two_id,
+            role="Released On",
+        )
+        if release_id is not None:
+            relation["release_id"] = release_id
+            relation["year"] = year
+        return relation
+
+    def test_01(self):
+        with RelationAccumulator() as accumulator:
+            accumulator.add(self.relation(1, 2, 10, 1999))
+            accumulator.add(self.relation(1, 2, 11))
+            accumulator.add(self.relation(1, 3))
+            assert len(accumulator) == 2
+            actual = list(RelationAccumulator.to_rows(accumulator.items()))
+        assert actual == [
+            dict(
+                entity_one_type=EntityType.ARTIST,
+                entity_one_id=1,
+                entity_two_type=EntityType.LABEL,
+                entity_two_id=2,
+                role="Released On",
+                releases={10: 1999, 11: None},
+            ),
+            dict(
+                entity_one_type=EntityType.ARTIST,
+                entity_one_id=1,
+                entity_two_type=EntityType.LABEL,
+                entity_two_id=3,
+                role="Released On",
+                releases={},
+            ),
+        ]
+
+    def test_02(self):
+        # Spilled runs merge back into one sorted stream, one entry per key.
+        expected = {}
+        with RelationAccumulator(max_entries=7) as accumulator:
+            for release_id in range(100):
+                for entity_one_id in range(release_id % 5, 20, 3):
+                    relation = self.relation(entity_one_id, 2, release_id, 2000)
+                    accumulator.add(relation)
+                    key = tuple(relation[_] for _ in RelationAccumulator.KEY_FIELDS)
+                    expected.setdefault(key, {})[release_id] = 2000
+            assert len(accumulator.runs) > 1
+            actual = list(accumulator.items())
+        assert [_[0] for _ in actual] == sorted(expected)
+        assert dict(actual) == expected
+        assert not accumulator.runs
+
+    def test_03(self):
+        # Partitions are stable and every key lands in exactly one file.
+        expected = {}
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, str(_)) for _ in range(4)]
+            with RelationAccumulator() as accumulator:
+                for entity_one_id in range(50):
+                    relation = self.relation(entity_one_id, 2, entity_one_id, 1999)
+                    accumulator.add(relation)
+                    key = tuple(relation[_] for _ in RelationAccumulator.KEY_FIELDS)
+                    expected[key] = {entity_one_id: 1999}
+                RelationAccumulator.write_items(accumulator.items(), paths)
+            partitions = [list(RelationAccumulator.read_items(_)) for _ in paths]
+        assert all(partitions)
+        for i, partition in enumerate(partitions):
+            for key, _ in partition:
+                assert RelationAccumulator.partition(key, len(paths)) == i
+        actual = list(RelationAccumulator.merge(iter(_) for _ in partitions))
+        assert dict(actual) == expected
+        assert RelationAccumulator.partition(
+            (EntityType.ARTIST, 1, EntityType.LABEL, 2, "Released On"), 8
+        ) == RelationAccumulator.partition((1, 1, 2, 2, "Released On"), 8)
@@ -0,0 +1,44 @@
+import collections
+import types
+import unittest
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.relation_grapher import RelationGrapher
+from discograph.library.trellis_node import TrellisNode
+
+Entity = collections.namedtuple("Entity", ["entity_key", "entities"])
+Link = collections.namedtuple("Link", ["entity_one_key", "entity_two_key", "role"])
+
+
+class TestRelationGrapherFindClusters(unittest.TestCase):
+    @staticmethod
+    def find_clusters(aliases, links):
+        nodes = collections.OrderedDict()
+        for entity_id, alias_ids in aliases.items():
+            entity_key = (EntityType.ARTIST, entity_id)
+            entities = {"aliases": {str(_): _ for _ in alias_ids}}
+            nodes[entity_key] = TrellisNode(Entity(entity_key, entities))
+        links = {
+            i: Link((EntityType.ARTIST, one), (EntityType.ARTIST, two), role)
+            for i, (one, two, role) in enumerate(links)
+        }
+        RelationGrapher._find_clusters(types.SimpleNamespace(nodes=nodes, links=links))
+        return {
+            entity_key[1]: node.cluster
+            for entity_key, node in nodes.items()
+            if node.cluster
+        }
+
+    def test_01(self):
+        # Chained aliases share a cluster, numbered by smallest entity key.
+        aliases = {5: [1], 1: [5, 9], 9: [1], 3: [8], 4: [], 7: []}
+        links = [
+            (1, 5, "Alias"),
+            (1, 9, "Alias"),
+            (4, 7, "Alias"),
+            (3, 4, "Member Of"),
+        ]
+        expected = {1: 1, 5: 1, 9: 1, 3: 2, 4: 3, 7: 3}
+        assert self.find_clusters(aliases, links) == expected
+        assert self.find_clusters(aliases, links[::-1]) == expected
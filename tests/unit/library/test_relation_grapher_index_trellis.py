@@ -0,0 +1,52 @@
+import collections
+import sys
+import unittest
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.relation_grapher import RelationGrapher
+from discograph.library.trellis_node import TrellisNode
+
+Entity = collections.namedtuple("Entity", ["entity_key"])
+
+
+class TestRelationGrapherIndexTrellis(unittest.TestCase):
+    def setUp(self):
+        self.nodes = {}
+
+    def node(self, entity_id, distance, *parents):
+        node = TrellisNode(Entity((EntityType.ARTIST, entity_id)), distance)
+        for parent in parents:
+            node.parents.add(self.nodes[parent])
+            self.nodes[parent].children.add(node)
+        self.nodes[entity_id] = node
+        return node
+
+    def test_01(self):
+        # Shared descendants count once; unreachable nodes are left out.
+        center = self.node(1, 0)
+        self.node(2, 1, 1)
+        self.node(3, 1, 1)
+        self.node(4, 2, 2, 3)
+        self.node(5, 3, 4)
+        self.node(6, 1)
+        self.node(7, 2, 6)
+        actual = RelationGrapher._index_trellis(list(self.nodes.values()), center)
+        assert actual == {self.nodes[_] for _ in (1, 2, 3, 4, 5)}
+        sizes = {_.entity_key[1]: _.subgraph_size for _ in actual}
+        assert sizes == {1: 5, 2: 3, 3: 3, 4: 2, 5: 1}
+        assert self.nodes[6].subgraph_size is None
+        parentage = {_.entity_key[1] for _ in self.nodes[5].parentage}
+        assert parentage == {1, 2, 3, 4, 5}
+        assert self.nodes[1].parentage == {center}
+
+    def test_02(self):
+        # Chains deeper than the recursion limit are indexed.
+        center = self.node(0, 0)
+        depth = sys.getrecursionlimit() + 100
+        for entity_id in range(1, depth):
+            self.node(entity_id, entity_id, entity_id - 1)
+        actual = RelationGrapher._index_trellis(list(self.nodes.values()), center)
+        assert len(actual) == depth
+        assert center.subgraph_size == depth
+        assert len(self.nodes[depth - 1].parentage) == depth
@@ -0,0 +1,49 @@
+import collections
+import unittest
+
+from discograph import database  # noqa: F401
+from discograph.library import EntityType
+from discograph.library.relation_grapher import RelationGrapher
+from discograph.library.trellis_node import TrellisNode
+
+Entity = collections.namedtuple("Entity", ["entity_key"])
+
+
+class TestRelationGrapherPageGreedily(unittest.TestCase):
+    def setUp(self):
+        self.nodes = {}
+
+    def node(self, entity_id, *parents):
+        node = TrellisNode(Entity((EntityType.ARTIST, entity_id)), len(parents))
+        for parent in parents:
+            node.parents.add(self.nodes[parent])
+            self.nodes[parent].children.add(node)
+        self.nodes[entity_id] = node
+        return node
+
+    def test_01(self):
+        # Parentages join the page with the fewest nodes outside of them,
+        # then the smallest page, then the first.
+        center = self.node(1)
+        trellis_nodes = [
+            self.node(2, 1),
+            self.node(3, 1),
+            self.node(4, 2),
+            self.node(5, 3),
+            self.node(6, 2),
+            self.node(7, 4, 5),
+        ]
+        pages = [{center}, {center}]
+        RelationGrapher._index_trellis(list(self.nodes.values()), center)
+        RelationGrapher._page_greedily(pages, trellis_nodes)
+        actual = [sorted(_.entity_key[1] for _ in page) for page in pages]
+        assert actual == [[1, 2, 4, 6], [1, 2, 3, 4, 5, 7]]
+
+    def test_02(self):
+        # A single page takes every parentage.
+        center = self.node(1)
+        trellis_nodes = [self.node(2, 1), self.node(3, 2)]
+        pages = [{center}]
+        RelationGrapher._index_trellis(list(self.nodes.values()), center)
+        RelationGrapher._page_greedily(pages, trellis_nodes)
+        assert pages == [{center, *trellis_nodes}]